@@ -0,0 +1,48 @@
+# balance_biogas: núcleo de cálculo del balance energético de plantas de biogás.
+# No depende de Streamlit. Las funciones escalares se cargan al importar el paquete;
+# el resto (NumPy, exportaciones) se carga solo cuando se accede al nombre.
+import importlib
+
+from balance_biogas.calculos import calcular_dimensiones_digestor, fraccion_degradada_cinetica, realizar_calculos_balance
+
+_CARGA_DIFERIDA = {
+    'calcular_dimensiones_digestor_lote': 'balance_biogas.lote',
+    'realizar_calculos_balance_lote': 'balance_biogas.lote',
+    'calcular_escenarios_lote': 'balance_biogas.lote',
+    'fraccion_degradada_cinetica_lote': 'balance_biogas.lote',
+    'iterar_barrido_rejilla': 'balance_biogas.barrido',
+    'evaluar_barrido_rejilla': 'balance_biogas.barrido',
+    'muestreo_hipercubo_latino': 'balance_biogas.barrido',
+    'evaluar_muestras': 'balance_biogas.barrido',
+    'analisis_tornado': 'balance_biogas.barrido',
+    'analisis_arana': 'balance_biogas.barrido',
+    'simular_montecarlo': 'balance_biogas.montecarlo',
+    'simular_serie': 'balance_biogas.serie_temporal',
+    'leer_series_por_bloques': 'balance_biogas.serie_temporal',
+    'BibliotecaSustratos': 'balance_biogas.sustratos',
+    'MezclaSustratos': 'balance_biogas.sustratos',
+    'optimizar_mezcla': 'balance_biogas.optimizacion',
+    'sanitize_text_for_fpdf': 'balance_biogas.exportacion',
+    'generar_excel_bytes': 'balance_biogas.exportacion',
+    'generar_pdf_bytes': 'balance_biogas.exportacion',
+    'generar_informes': 'balance_biogas.informes',
+    'exportar_informes_zip': 'balance_biogas.informes',
+    'hash_entradas': 'balance_biogas.canonico',
+    'ServicioBalance': 'balance_biogas.servicio',
+    'AlmacenEscenarios': 'balance_biogas.almacen',
+    'CarteraPlantas': 'balance_biogas.cartera',
+}
+
+__all__ = ['calcular_dimensiones_digestor', 'fraccion_degradada_cinetica', 'realizar_calculos_balance', *_CARGA_DIFERIDA]
+
+
+def __getattr__(nombre):
+    if nombre in _CARGA_DIFERIDA:
+        valor = getattr(importlib.import_module(_CARGA_DIFERIDA[nombre]), nombre)
+        globals()[nombre] = valor
+        return valor
+    raise AttributeError(f"module 'balance_biogas' has no attribute '{nombre}'")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_CARGA_DIFERIDA))
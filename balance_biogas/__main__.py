@@ -0,0 +1,5 @@
+# balance_biogas/__main__.py
+# Permite ejecutar la evaluación masiva con: python -m balance_biogas entrada salida
+from balance_biogas.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,289 @@
+# balance_biogas/almacen.py
+# Almacén local de escenarios en SQLite (biblioteca estándar), direccionado por contenido: la
+# clave de cada escenario es el hash canónico de sus entradas (canonico.hash_entradas), así que
+# volver a abrir o exportar un escenario conocido lee los resultados o el informe ya generado en
+# vez de recalcularlo y volver a renderizarlo. Las claves incluyen calculos.VERSION_MODELO (y las
+# de los informes, exportacion.VERSION_INFORMES): al cambiar el modelo o los informes, lo guardado
+# con la versión anterior deja de reutilizarse.
+#
+# - escenarios: entradas canónicas, resultados y dimensiones, una fila por hash.
+# - guardados: escenarios guardados por los analistas (proyecto, analista, fecha), con índices
+#   para buscar por cualquiera de los tres.
+# - informes: PDF/XLSX ya renderizados, por escenario, formato y datos del proyecto. El total de
+#   bytes está acotado: al superarlo se borran los informes usados hace más tiempo.
+# - plantas: plantas de cada cartera (cartera.CarteraPlantas), cada una apuntando al escenario
+#   con sus entradas actuales.
+#
+# El fichero se puede compartir entre procesos (modo WAL); dentro de un proceso, el objeto se
+# puede usar desde varios hilos (p. ej. las sesiones de Streamlit).
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from balance_biogas.calculos import VERSION_MODELO
+from balance_biogas.canonico import hash_entradas, serializar_canonico
+from balance_biogas.exportacion import VERSION_INFORMES
+from balance_biogas.informes import FORMATOS_INFORME, preparar_escenario
+from balance_biogas.instrumentacion import contar, medir
+
+RUTA_POR_DEFECTO = os.environ.get(
+    "BALANCE_BIOGAS_ALMACEN", os.path.join(os.path.expanduser("~"), ".balance_biogas", "escenarios.sqlite"))
+MAX_BYTES_INFORMES = 256 * 2**20
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS escenarios (
+    hash TEXT PRIMARY KEY,
+    entradas TEXT NOT NULL,
+    resultados TEXT NOT NULL,
+    dimensiones TEXT NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guardados (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES escenarios(hash),
+    proyecto TEXT NOT NULL,
+    analista TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    creado REAL NOT NULL,
+    UNIQUE (hash, proyecto, analista, fecha)
+);
+CREATE INDEX IF NOT EXISTS guardados_proyecto ON guardados(proyecto, fecha);
+CREATE INDEX IF NOT EXISTS guardados_analista ON guardados(analista, fecha);
+CREATE INDEX IF NOT EXISTS guardados_fecha ON guardados(fecha);
+CREATE TABLE IF NOT EXISTS informes (
+    clave TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    formato TEXT NOT NULL,
+    contenido BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    accedido REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS informes_accedido ON informes(accedido);
+CREATE TABLE IF NOT EXISTS plantas (
+    cartera TEXT NOT NULL,
+    planta TEXT NOT NULL,
+    grupo TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES escenarios(hash),
+    actualizado REAL NOT NULL,
+    PRIMARY KEY (cartera, planta)
+);
+"""
+
+
+def _proyecto(project_info):
+    project_info = project_info or {}
+    return {clave: str(project_info.get(clave, "")) for clave in ('nombre', 'analista', 'fecha')}
+
+
+def huella_escenario(entradas):
+    """Clave del escenario en el almacén: hash canónico de las entradas y de la versión del modelo."""
+    return hash_entradas(dict(entradas, **{'version.modelo': VERSION_MODELO}))
+
+
+class AlmacenEscenarios:
+    def __init__(self, ruta=RUTA_POR_DEFECTO, max_bytes_informes=MAX_BYTES_INFORMES):
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self.ruta = ruta
+        self.max_bytes_informes = max_bytes_informes
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        if ruta != ":memory:":
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(_ESQUEMA)
+        self._bytes_informes = self._conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM informes").fetchone()[0]
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+        return False
+
+    # --- RESULTADOS ---
+    @medir("almacen.resultados")
+    def resultados(self, entradas, resultados=None, dimensiones=None):
+        """(hash, resultados, dimensiones) del escenario: los guardados si el hash ya está en el
+        almacén; si no, los dados o calculados con el motor escalar, que quedan guardados."""
+        huella = huella_escenario(entradas)
+        with self._bloqueo:
+            fila = self._conexion.execute("SELECT resultados, dimensiones FROM escenarios WHERE hash = ?", (huella,)).fetchone()
+        if fila is not None:
+            contar("almacen_aciertos", tipo="resultados")
+            return huella, json.loads(fila[0]), json.loads(fila[1])
+        contar("almacen_fallos", tipo="resultados")
+        if resultados is None or dimensiones is None:
+            _, resultados, dimensiones = preparar_escenario(entradas)
+        with self._bloqueo, self._conexion:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO escenarios (hash, entradas, resultados, dimensiones, creado) VALUES (?, ?, ?, ?, ?)",
+                (huella, serializar_canonico(entradas), json.dumps(resultados), json.dumps(dimensiones), time.time()))
+        return huella, resultados, dimensiones
+
+    def guardar(self, entradas, project_info=None, resultados=None, dimensiones=None):
+        """Guarda el escenario con los datos del proyecto ('nombre', 'analista', 'fecha') y
+        devuelve su hash. Guardar dos veces lo mismo no duplica la fila."""
+        huella, _, _ = self.resultados(entradas, resultados, dimensiones)
+        proyecto = _proyecto(project_info)
+        with self._bloqueo, self._conexion:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO guardados (hash, proyecto, analista, fecha, creado) VALUES (?, ?, ?, ?, ?)",
+                (huella, proyecto['nombre'], proyecto['analista'], proyecto['fecha'], time.time()))
+        return huella
+
+    def cargar(self, huella):
+        """{'hash', 'entradas', 'resultados', 'dimensiones'} de un escenario; KeyError si no está."""
+        with self._bloqueo:
+            fila = self._conexion.execute(
+                "SELECT entradas, resultados, dimensiones FROM escenarios WHERE hash = ?", (huella,)).fetchone()
+        if fila is None:
+            raise KeyError(huella)
+        return {'hash': huella, 'entradas': json.loads(fila[0]), 'resultados': json.loads(fila[1]), 'dimensiones': json.loads(fila[2])}
+
+    def buscar(self, proyecto=None, analista=None, desde=None, hasta=None, limite=1000):
+        """Escenarios guardados, del más reciente al más antiguo; los filtros son opcionales
+        (fechas en formato ISO, ambos extremos incluidos)."""
+        condiciones, parametros = [], []
+        for condicion, valor in (("proyecto = ?", proyecto), ("analista = ?", analista), ("fecha >= ?", desde), ("fecha <= ?", hasta)):
+            if valor is not None:
+                condiciones.append(condicion)
+                parametros.append(valor)
+        consulta = "SELECT hash, proyecto, analista, fecha, creado FROM guardados"
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY fecha DESC, creado DESC LIMIT ?"
+        with self._bloqueo:
+            filas = self._conexion.execute(consulta, (*parametros, limite)).fetchall()
+        return [dict(zip(('hash', 'proyecto', 'analista', 'fecha', 'creado'), fila)) for fila in filas]
+
+    def comparar(self, huellas, claves=None):
+        """Resultados y dimensiones de varios escenarios lado a lado: {clave: [valor por escenario]},
+        en el orden de huellas (una sola consulta)."""
+        huellas = list(huellas)
+        if not huellas:
+            return {}
+        with self._bloqueo:
+            filas = dict((fila[0], fila[1:]) for fila in self._conexion.execute(
+                f"SELECT hash, resultados, dimensiones FROM escenarios WHERE hash IN ({','.join('?' * len(huellas))})", huellas))
+        faltan = [huella for huella in huellas if huella not in filas]
+        if faltan:
+            raise KeyError(faltan[0])
+        escenarios = [dict(json.loads(filas[huella][0]), **json.loads(filas[huella][1])) for huella in huellas]
+        if claves is None:
+            claves = list(escenarios[0])
+        return {clave: [escenario.get(clave) for escenario in escenarios] for clave in claves}
+
+    # --- CARTERAS DE PLANTAS ---
+    def guardar_planta(self, cartera, planta, entradas, grupo="", resultados=None, dimensiones=None):
+        """Asigna a la planta de la cartera el escenario de sus entradas (crea o sustituye)."""
+        return self.guardar_plantas(cartera, [(planta, grupo, entradas, resultados, dimensiones)])[0]
+
+    def guardar_plantas(self, cartera, plantas):
+        """Varias plantas (planta, grupo, entradas, resultados, dimensiones) en una transacción.
+        Si faltan resultados o dimensiones se calculan con el motor escalar. Devuelve los hashes."""
+        ahora = time.time()
+        filas_escenarios, filas_plantas = [], []
+        for planta, grupo, entradas, resultados, dimensiones in plantas:
+            if resultados is None or dimensiones is None:
+                _, resultados, dimensiones = preparar_escenario(entradas)
+            huella = huella_escenario(entradas)
+            filas_escenarios.append((huella, serializar_canonico(entradas), json.dumps(resultados), json.dumps(dimensiones), ahora))
+            filas_plantas.append((cartera, planta, grupo, huella, ahora))
+        with self._bloqueo, self._conexion:
+            self._conexion.executemany(
+                "INSERT OR IGNORE INTO escenarios (hash, entradas, resultados, dimensiones, creado) VALUES (?, ?, ?, ?, ?)", filas_escenarios)
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO plantas (cartera, planta, grupo, hash, actualizado) VALUES (?, ?, ?, ?, ?)", filas_plantas)
+        return [fila[3] for fila in filas_plantas]
+
+    def eliminar_planta(self, cartera, planta):
+        with self._bloqueo, self._conexion:
+            self._conexion.execute("DELETE FROM plantas WHERE cartera = ? AND planta = ?", (cartera, planta))
+
+    def plantas(self, cartera):
+        """Plantas de la cartera con sus entradas, resultados y dimensiones guardados (una consulta).
+        'vigente' es False si los resultados se guardaron con otra versión del modelo."""
+        with self._bloqueo:
+            filas = self._conexion.execute(
+                "SELECT p.planta, p.grupo, p.hash, e.entradas, e.resultados, e.dimensiones FROM plantas p "
+                "JOIN escenarios e ON e.hash = p.hash WHERE p.cartera = ? ORDER BY p.planta", (cartera,)).fetchall()
+        plantas = []
+        for planta, grupo, huella, entradas, resultados, dimensiones in filas:
+            entradas = json.loads(entradas)
+            plantas.append({'planta': planta, 'grupo': grupo, 'entradas': entradas, 'resultados': json.loads(resultados),
+                            'dimensiones': json.loads(dimensiones), 'vigente': huella == huella_escenario(entradas)})
+        return plantas
+
+    def carteras(self):
+        with self._bloqueo:
+            return [fila[0] for fila in self._conexion.execute("SELECT DISTINCT cartera FROM plantas ORDER BY cartera")]
+
+    # --- INFORMES ---
+    @medir("almacen.informe")
+    def informe(self, entradas, project_info, formato, resultados=None, dimensiones=None):
+        """Informe 'pdf' o 'xlsx' del escenario: el guardado si ya se generó con las mismas
+        entradas y datos del proyecto; si no, se renderiza y se guarda."""
+        if formato not in FORMATOS_INFORME:
+            raise ValueError(f"Formato de informe no válido: {formato}")
+        proyecto = _proyecto(project_info)
+        huella = huella_escenario(entradas)
+        clave = hash_entradas(dict(entradas, formato=formato, **{f"proyecto.{campo}": valor for campo, valor in proyecto.items()},
+                                   **{'version.modelo': VERSION_MODELO, 'version.informes': VERSION_INFORMES}))
+        with self._bloqueo, self._conexion:
+            fila = self._conexion.execute("SELECT contenido FROM informes WHERE clave = ?", (clave,)).fetchone()
+            if fila is not None:
+                self._conexion.execute("UPDATE informes SET accedido = ? WHERE clave = ?", (time.time(), clave))
+        if fila is not None:
+            contar("almacen_aciertos", tipo=formato)
+            return bytes(fila[0])
+        contar("almacen_fallos", tipo=formato)
+        _, resultados, dimensiones = self.resultados(entradas, resultados, dimensiones)
+        entradas_informe, _, _ = preparar_escenario(entradas)
+        contenido = FORMATOS_INFORME[formato](entradas_informe, resultados, dimensiones, proyecto)
+        if contenido is None:
+            raise ImportError(f"Falta la librería para exportar en formato '{formato}'")
+        if len(contenido) <= self.max_bytes_informes:
+            with self._bloqueo, self._conexion:
+                anterior = self._conexion.execute("SELECT bytes FROM informes WHERE clave = ?", (clave,)).fetchone()
+                self._conexion.execute(
+                    "INSERT OR REPLACE INTO informes (clave, hash, formato, contenido, bytes, accedido) VALUES (?, ?, ?, ?, ?, ?)",
+                    (clave, huella, formato, contenido, len(contenido), time.time()))
+                self._bytes_informes += len(contenido) - (anterior[0] if anterior else 0)
+            if self._bytes_informes > self.max_bytes_informes:
+                self.podar_informes()
+        return contenido
+
+    def podar_informes(self, max_bytes=None):
+        """Borra los informes usados hace más tiempo hasta que el total quede por debajo de
+        max_bytes (por defecto, el límite del almacén). Devuelve el número de informes borrados."""
+        max_bytes = self.max_bytes_informes if max_bytes is None else max_bytes
+        with self._bloqueo, self._conexion:
+            # Otro proceso puede haber añadido o borrado informes: se parte del total real.
+            total = self._conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM informes").fetchone()[0]
+            borrar = []
+            if total > max_bytes:
+                for clave, n_bytes in self._conexion.execute("SELECT clave, bytes FROM informes ORDER BY accedido"):
+                    borrar.append((clave,))
+                    total -= n_bytes
+                    if total <= max_bytes:
+                        break
+                self._conexion.executemany("DELETE FROM informes WHERE clave = ?", borrar)
+            self._bytes_informes = total
+        contar("almacen_informes_podados", len(borrar))
+        return len(borrar)
+
+    def estadisticas(self):
+        with self._bloqueo:
+            n_escenarios, n_guardados, (n_informes, n_bytes) = (
+                self._conexion.execute("SELECT COUNT(*) FROM escenarios").fetchone()[0],
+                self._conexion.execute("SELECT COUNT(*) FROM guardados").fetchone()[0],
+                self._conexion.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM informes").fetchone())
+        return {'escenarios': n_escenarios, 'guardados': n_guardados, 'informes': n_informes,
+                'bytes_informes': n_bytes, 'max_bytes_informes': self.max_bytes_informes}
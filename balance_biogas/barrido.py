@@ -0,0 +1,194 @@
+# balance_biogas/barrido.py
+# Barridos de parámetros (rejilla cartesiana o hipercubo latino) y análisis de sensibilidad
+# (tornado y araña) sobre el motor vectorizado. Los escenarios se generan y evalúan por bloques
+# a partir del índice plano, de modo que nunca se construye un dict de resultados por punto:
+# solo se conservan las salidas pedidas, como arrays.
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from balance_biogas.instrumentacion import medir
+from balance_biogas.lote import CLAVES_BALANCE_OBLIGATORIAS, CLAVES_BALANCE_OPCIONALES, calcular_escenarios_lote
+
+PARAMETROS_BARRIBLES = tuple(
+    clave for clave in CLAVES_BALANCE_OBLIGATORIAS + CLAVES_BALANCE_OPCIONALES
+    if clave != 'area_superficial_digestor_m2'
+) + ('densidad_sustrato_kg_m3',)
+
+SALIDAS_PRINCIPALES = ('electricidad_neta_exportable_kwh_dia', 'calor_neto_disponible_mj_dia')
+
+TAMANO_BLOQUE = 65536
+
+
+def _entradas_base(base):
+    """Copia numérica del escenario base. El área superficial se descarta para que se recalcule
+    con el TRH y el caudal de cada punto del barrido."""
+    return {clave: float(base[clave]) for clave in PARAMETROS_BARRIBLES if clave in base}
+
+
+def _validar_parametros(nombres):
+    desconocidos = [nombre for nombre in nombres if nombre not in PARAMETROS_BARRIBLES]
+    if desconocidos:
+        raise ValueError(f"Parámetros no barribles: {', '.join(desconocidos)}")
+
+
+def _puntos_rejilla(nombres, valores, forma, inicio, fin):
+    """Valores de los parámetros barridos en los puntos [inicio, fin) de la rejilla aplanada."""
+    coordenadas = np.unravel_index(np.arange(inicio, fin), forma)
+    return {nombre: valores_eje[coordenada] for nombre, valores_eje, coordenada in zip(nombres, valores, coordenadas)}
+
+
+def _evaluar_bloque_rejilla(base, nombres, valores, forma, inicio, fin, salidas, barridas=None):
+    if barridas is None:
+        barridas = _puntos_rejilla(nombres, valores, forma, inicio, fin)
+    results = calcular_escenarios_lote({**base, **barridas})
+    return inicio, {salida: results[salida] for salida in salidas}
+
+
+def _evaluar_bloque_muestras(base, muestras, inicio, fin, salidas):
+    entradas = dict(base)
+    entradas.update({nombre: valores[inicio:fin] for nombre, valores in muestras.items()})
+    results = calcular_escenarios_lote(entradas)
+    return inicio, {salida: results[salida] for salida in salidas}
+
+
+def _ejecutar_bloques(funcion, argumentos_comunes, total, salidas, procesos, tamano_bloque):
+    salida_arrays = {salida: np.empty(total) for salida in salidas}
+    rangos = [(inicio, min(inicio + tamano_bloque, total)) for inicio in range(0, total, tamano_bloque)]
+    if procesos and procesos > 1 and len(rangos) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(funcion, *argumentos_comunes, inicio, fin, salidas) for inicio, fin in rangos]
+            for futuro in futuros:
+                inicio, valores = futuro.result()
+                for salida, array in valores.items():
+                    salida_arrays[salida][inicio:inicio + len(array)] = array
+    else:
+        for inicio, fin in rangos:
+            _, valores = funcion(*argumentos_comunes, inicio, fin, salidas)
+            for salida, array in valores.items():
+                salida_arrays[salida][inicio:fin] = array
+    return salida_arrays
+
+
+def iterar_barrido_rejilla(base, rejilla, salidas=SALIDAS_PRINCIPALES, tamano_bloque=TAMANO_BLOQUE):
+    """Recorre el producto cartesiano de la rejilla por bloques.
+
+    Genera tuplas (inicio, entradas_barridas, salidas) con arrays de como mucho tamano_bloque
+    puntos, para procesar barridos arbitrariamente grandes con memoria acotada.
+    """
+    _validar_parametros(rejilla)
+    base = _entradas_base(base)
+    nombres = tuple(rejilla)
+    valores = tuple(np.asarray(v, dtype=float) for v in rejilla.values())
+    forma = tuple(len(v) for v in valores)
+    total = math.prod(forma)
+    for inicio in range(0, total, tamano_bloque):
+        fin = min(inicio + tamano_bloque, total)
+        barridas = _puntos_rejilla(nombres, valores, forma, inicio, fin)
+        _, resultados = _evaluar_bloque_rejilla(base, nombres, valores, forma, inicio, fin, salidas, barridas)
+        yield inicio, barridas, resultados
+
+
+@medir("barrido.rejilla")
+def evaluar_barrido_rejilla(base, rejilla, salidas=SALIDAS_PRINCIPALES, procesos=None, tamano_bloque=TAMANO_BLOQUE):
+    """Evalúa el producto cartesiano completo de la rejilla {parámetro: valores}.
+
+    Devuelve {salida: array} con la forma de la rejilla (un eje por parámetro, en el orden del
+    dict). Con procesos > 1 los bloques se reparten en un ProcessPoolExecutor.
+    """
+    _validar_parametros(rejilla)
+    nombres = tuple(rejilla)
+    valores = tuple(np.asarray(v, dtype=float) for v in rejilla.values())
+    forma = tuple(len(v) for v in valores)
+    resultados = _ejecutar_bloques(
+        _evaluar_bloque_rejilla, (_entradas_base(base), nombres, valores, forma),
+        math.prod(forma), salidas, procesos, tamano_bloque)
+    return {salida: array.reshape(forma) for salida, array in resultados.items()}
+
+
+def muestreo_hipercubo_latino(rangos, n, semilla=None):
+    """Muestra de n puntos por hipercubo latino sobre {parámetro: (mínimo, máximo)}."""
+    _validar_parametros(rangos)
+    rng = np.random.default_rng(semilla)
+    muestras = {}
+    for nombre, (minimo, maximo) in rangos.items():
+        estratos = (rng.permutation(n) + rng.random(n)) / n
+        muestras[nombre] = minimo + estratos * (maximo - minimo)
+    return muestras
+
+
+@medir("barrido.muestras")
+def evaluar_muestras(base, muestras, salidas=SALIDAS_PRINCIPALES, procesos=None, tamano_bloque=TAMANO_BLOQUE):
+    """Evalúa una muestra {parámetro: array} (p. ej. de muestreo_hipercubo_latino)."""
+    _validar_parametros(muestras)
+    muestras = {nombre: np.asarray(valores, dtype=float) for nombre, valores in muestras.items()}
+    total = len(next(iter(muestras.values()))) if muestras else 0
+    return _ejecutar_bloques(
+        _evaluar_bloque_muestras, (_entradas_base(base), muestras), total, salidas, procesos, tamano_bloque)
+
+
+def resumir_salidas(salidas):
+    """Mínimo, P10, P50, P90, máximo y fracción de casos con déficit (valor negativo) de cada
+    salida de un barrido {salida: array}."""
+    resumen = {}
+    for salida, valores in salidas.items():
+        valores = np.ravel(valores)
+        p10, p50, p90 = np.percentile(valores, (10, 50, 90))
+        resumen[salida] = {'minimo': float(valores.min()), 'P10': float(p10), 'P50': float(p50), 'P90': float(p90),
+                           'maximo': float(valores.max()), 'fraccion_deficit': float(np.mean(valores < 0))}
+    return resumen
+
+
+def variaciones_simetricas(base, parametros, fraccion):
+    """{parámetro: (bajo, alto)} a ± fraccion del valor del caso base, para analisis_tornado."""
+    return {nombre: (base[nombre] * (1 - fraccion), base[nombre] * (1 + fraccion)) for nombre in parametros}
+
+
+@medir("barrido.tornado")
+def analisis_tornado(base, variaciones, salida=SALIDAS_PRINCIPALES[0]):
+    """Sensibilidad de una salida a cada parámetro movido por separado a sus valores
+    {parámetro: (bajo, alto)}, con el resto en el caso base.
+
+    Devuelve una lista de dicts ordenada de mayor a menor amplitud, lista para un gráfico tornado.
+    """
+    _validar_parametros(variaciones)
+    base = _entradas_base(base)
+    nombres = list(variaciones)
+    n = 1 + 2 * len(nombres)
+    entradas = {clave: np.full(n, valor) for clave, valor in base.items()}
+    for i, nombre in enumerate(nombres):
+        bajo, alto = variaciones[nombre]
+        entradas.setdefault(nombre, np.full(n, base.get(nombre, 0.0)))
+        entradas[nombre][1 + 2 * i] = bajo
+        entradas[nombre][2 + 2 * i] = alto
+    valores = calcular_escenarios_lote(entradas)[salida]
+    filas = []
+    for i, nombre in enumerate(nombres):
+        filas.append({
+            'parametro': nombre,
+            'valor_bajo': variaciones[nombre][0],
+            'valor_alto': variaciones[nombre][1],
+            'salida_base': float(valores[0]),
+            'salida_bajo': float(valores[1 + 2 * i]),
+            'salida_alto': float(valores[2 + 2 * i]),
+        })
+    filas.sort(key=lambda fila: abs(fila['salida_alto'] - fila['salida_bajo']), reverse=True)
+    return filas
+
+
+@medir("barrido.arana")
+def analisis_arana(base, parametros, variaciones_relativas=np.linspace(-0.2, 0.2, 9), salida=SALIDAS_PRINCIPALES[0]):
+    """Curvas de un gráfico araña: la salida al multiplicar cada parámetro por (1 + variación),
+    de uno en uno. Devuelve {parámetro: array} alineado con variaciones_relativas."""
+    _validar_parametros(parametros)
+    base = _entradas_base(base)
+    variaciones_relativas = np.asarray(variaciones_relativas, dtype=float)
+    m = len(variaciones_relativas)
+    n = m * len(parametros)
+    entradas = {clave: np.full(n, valor) for clave, valor in base.items()}
+    for i, nombre in enumerate(parametros):
+        entradas.setdefault(nombre, np.full(n, base.get(nombre, 0.0)))
+        entradas[nombre][i * m:(i + 1) * m] = base.get(nombre, 0.0) * (1 + variaciones_relativas)
+    valores = calcular_escenarios_lote(entradas)[salida]
+    return {nombre: valores[i * m:(i + 1) * m] for i, nombre in enumerate(parametros)}
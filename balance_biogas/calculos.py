@@ -0,0 +1,162 @@
+# balance_biogas/calculos.py
+# Núcleo de cálculo escalar: un escenario (dict de entradas) -> dict de resultados.
+import math
+
+from balance_biogas.instrumentacion import medir
+
+# Versión de los resultados del modelo. Forma parte de la clave con que el almacén de escenarios
+# guarda los resultados: hay que incrementarla con cualquier cambio de calculos.py o lote.py que
+# cambie algún resultado para las mismas entradas.
+VERSION_MODELO = 1
+
+# --- TECNOLOGÍAS DE UPGRADING A BIOMETANO ---
+# Valores orientativos de literatura por Nm³ de biogás bruto tratado. Deben sustituirse por los
+# datos garantizados del proveedor.
+# (nombre, pérdida de CH₄ %, consumo eléctrico kWh/Nm³, demanda de calor kWh/Nm³,
+#  CH₄ en el biometano %, presión de salida bar(a))
+TECNOLOGIAS_UPGRADING = (
+    ("Membranas", 0.5, 0.25, 0.0, 97.0, 10.0),
+    ("Lavado con agua", 1.0, 0.25, 0.0, 97.0, 7.0),
+    ("PSA", 2.0, 0.25, 0.0, 97.0, 5.0),
+    ("Aminas", 0.1, 0.12, 0.55, 99.0, 1.1),
+)
+PRESION_INYECCION_RED_POR_DEFECTO_BAR = 16.0
+# Compresión del biometano hasta la red: politrópica en una etapa equivalente.
+KAPPA_BIOMETANO = 1.3
+EFICIENCIA_COMPRESOR = 0.70
+PRESION_NORMAL_PA = 101325
+
+# --- MODELO CINÉTICO DEL DIGESTOR ---
+# Con modelo_cinetico_idx distinto de 0 la eficiencia de digestión deja de ser una entrada y se
+# calcula como la fracción del BMP degradada en el TRH, con el digestor dividido en
+# n_etapas_digestor reactores de mezcla completa iguales en serie (TRH/n cada uno).
+MODELOS_CINETICOS = ("Eficiencia fija", "Primer orden", "Chen-Hashimoto")
+# Primer orden: constante de hidrólisis a 35 °C corregida con la temperatura (Arrhenius
+# simplificado, k(T) = k35 · θ^(T - 35)).
+CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA = 0.15
+THETA_TEMPERATURA_HIDROLISIS = 1.035
+TEMP_REFERENCIA_CINETICA_C = 35.0
+# Chen-Hashimoto: K adimensional del sustrato y tasa máxima de crecimiento
+# μm = 0.013·T - 0.129 (1/día, Hashimoto, válida entre 20 y 60 °C).
+CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO = 0.8
+
+# --- FUNCIONES DE CÁLCULO ---
+@medir("calculos.dimensiones")
+def calcular_dimensiones_digestor(caudal_sustrato_kg_dia, trh_dias, densidad_sustrato_kg_m3=1000):
+    volumen_sustrato_diario_m3 = caudal_sustrato_kg_dia / densidad_sustrato_kg_m3
+    volumen_digestor_m3 = volumen_sustrato_diario_m3 * trh_dias
+    diametro_digestor_m = altura_digestor_m = area_superficial_digestor_m2 = 0.0
+    if volumen_digestor_m3 > 0:
+        diametro_digestor_m = (4 * volumen_digestor_m3 / math.pi)**(1/3)
+        altura_digestor_m = diametro_digestor_m
+        area_superficial_digestor_m2 = 1.5 * math.pi * (diametro_digestor_m**2)
+    return {
+        "volumen_digestor_m3": volumen_digestor_m3,
+        "diametro_digestor_m": diametro_digestor_m,
+        "altura_digestor_m": altura_digestor_m,
+        "area_superficial_digestor_m2": area_superficial_digestor_m2
+    }
+
+def fraccion_degradada_cinetica(modelo_cinetico_idx, trh_dias, temp_op_digestor_c,
+                                constante_hidrolisis_1_dia=CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA,
+                                constante_chen_hashimoto=CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO, n_etapas_digestor=1):
+    """Fracción (0-1) del BMP que se degrada en el TRH según el modelo cinético, en forma cerrada."""
+    if modelo_cinetico_idx not in range(1, len(MODELOS_CINETICOS)):
+        raise ValueError(f"Modelo cinético no válido: {modelo_cinetico_idx}")
+    if n_etapas_digestor not in range(1, 1000):
+        raise ValueError(f"Número de etapas del digestor no válido: {n_etapas_digestor}")
+    trh_etapa_dias = trh_dias / n_etapas_digestor
+    if modelo_cinetico_idx == 1: # Primer orden: S/S0 = 1/(1 + k·θ) por etapa
+        k_1_dia = constante_hidrolisis_1_dia * THETA_TEMPERATURA_HIDROLISIS**(temp_op_digestor_c - TEMP_REFERENCIA_CINETICA_C)
+        return 1 - (1 + k_1_dia * trh_etapa_dias)**(-n_etapas_digestor)
+    # Chen-Hashimoto: S/S0 = K/(μm·θ - 1 + K) por etapa; sin degradación si μm·θ <= 1 (lavado).
+    mu_max_1_dia = 0.013 * temp_op_digestor_c - 0.129
+    if mu_max_1_dia * trh_etapa_dias <= 1:
+        return 0.0
+    return 1 - (constante_chen_hashimoto / (mu_max_1_dia * trh_etapa_dias - 1 + constante_chen_hashimoto))**n_etapas_digestor
+
+@medir("calculos.balance")
+def realizar_calculos_balance(inputs_calc):
+    results = {}
+    caudal_sustrato_kg_dia = inputs_calc['caudal_sustrato_kg_dia']
+    st_porcentaje = inputs_calc['st_porcentaje']
+    sv_de_st_porcentaje = inputs_calc['sv_de_st_porcentaje']
+    bmp_nm3_ch4_kg_sv = inputs_calc['bmp_nm3_ch4_kg_sv']
+    eficiencia_digestion_porcentaje = inputs_calc['eficiencia_digestion_porcentaje']
+    ch4_en_biogas_porcentaje = inputs_calc['ch4_en_biogas_porcentaje']
+    cp_sustrato_kj_kg_c = inputs_calc['cp_sustrato_kj_kg_c']
+    temp_op_digestor_c = inputs_calc['temp_op_digestor_c']
+    temp_sustrato_entrada_c = inputs_calc['temp_sustrato_entrada_c']
+    u_digestor_w_m2_k = inputs_calc['u_digestor_w_m2_k']
+    area_superficial_digestor_m2 = inputs_calc['area_superficial_digestor_m2']
+    temp_ambiente_promedio_c = inputs_calc['temp_ambiente_promedio_c']
+    uso_biogas_opcion_idx = inputs_calc['uso_biogas_opcion_idx']
+    chp_eficiencia_electrica_porcentaje = inputs_calc.get('chp_eficiencia_electrica_porcentaje', 0)
+    chp_eficiencia_termica_porcentaje = inputs_calc.get('chp_eficiencia_termica_porcentaje', 0)
+    caldera_eficiencia_porcentaje = inputs_calc.get('caldera_eficiencia_porcentaje', 0)
+    consumo_electrico_aux_kwh_ton_sustrato = inputs_calc['consumo_electrico_aux_kwh_ton_sustrato']
+    upgrading_tecnologia_idx = inputs_calc.get('upgrading_tecnologia_idx', 0)
+    presion_inyeccion_red_bar = inputs_calc.get('presion_inyeccion_red_bar', PRESION_INYECCION_RED_POR_DEFECTO_BAR)
+    modelo_cinetico_idx = inputs_calc.get('modelo_cinetico_idx', 0)
+
+    results['sv_alimentado_kg_dia'] = caudal_sustrato_kg_dia * (st_porcentaje / 100) * (sv_de_st_porcentaje / 100)
+    if modelo_cinetico_idx != 0:
+        eficiencia_digestion_porcentaje = 100 * fraccion_degradada_cinetica(
+            modelo_cinetico_idx, inputs_calc['trh_dias'], temp_op_digestor_c,
+            inputs_calc.get('constante_hidrolisis_1_dia', CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA),
+            inputs_calc.get('constante_chen_hashimoto', CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO),
+            inputs_calc.get('n_etapas_digestor', 1))
+    results['eficiencia_digestion_efectiva_porcentaje'] = eficiencia_digestion_porcentaje
+    results['ch4_producido_nm3_dia'] = results['sv_alimentado_kg_dia'] * bmp_nm3_ch4_kg_sv * (eficiencia_digestion_porcentaje / 100)
+    results['biogas_producido_nm3_dia'] = 0
+    if ch4_en_biogas_porcentaje > 0:
+        results['biogas_producido_nm3_dia'] = results['ch4_producido_nm3_dia'] / (ch4_en_biogas_porcentaje / 100)
+    pci_ch4_mj_nm3 = 35.8
+    results['pci_biogas_mj_nm3'] = pci_ch4_mj_nm3 * (ch4_en_biogas_porcentaje / 100)
+    results['energia_bruta_biogas_mj_dia'] = results['biogas_producido_nm3_dia'] * results['pci_biogas_mj_nm3']
+    results['energia_bruta_biogas_kwh_dia'] = results['energia_bruta_biogas_mj_dia'] / 3.6
+    results['calor_calentar_sustrato_mj_dia'] = (caudal_sustrato_kg_dia * cp_sustrato_kj_kg_c * (temp_op_digestor_c - temp_sustrato_entrada_c)) / 1000
+    delta_t_digestor_ambiente = temp_op_digestor_c - temp_ambiente_promedio_c
+    results['perdidas_calor_digestor_mj_dia'] = 0.0
+    if delta_t_digestor_ambiente > 0 and area_superficial_digestor_m2 > 0:
+        results['perdidas_calor_digestor_mj_dia'] = (u_digestor_w_m2_k * area_superficial_digestor_m2 * delta_t_digestor_ambiente * 3600 * 24) / 1000000
+    results['demanda_termica_total_digestor_mj_dia'] = results['calor_calentar_sustrato_mj_dia'] + results['perdidas_calor_digestor_mj_dia']
+    results['demanda_termica_total_digestor_kwh_dia'] = results['demanda_termica_total_digestor_mj_dia'] / 3.6
+    results['electricidad_generada_bruta_kwh_dia'] = 0.0
+    results['calor_util_generado_mj_dia'] = 0.0
+    if uso_biogas_opcion_idx == 0: # CHP
+        results['electricidad_generada_bruta_kwh_dia'] = results['energia_bruta_biogas_kwh_dia'] * (chp_eficiencia_electrica_porcentaje / 100)
+        results['calor_util_generado_mj_dia'] = results['energia_bruta_biogas_mj_dia'] * (chp_eficiencia_termica_porcentaje / 100)
+    elif uso_biogas_opcion_idx == 1: # Caldera
+        results['calor_util_generado_mj_dia'] = results['energia_bruta_biogas_mj_dia'] * (caldera_eficiencia_porcentaje / 100)
+    results['recuperacion_ch4_porcentaje'] = 0.0
+    results['ch4_perdido_upgrading_nm3_dia'] = 0.0
+    results['biometano_producido_nm3_dia'] = 0.0
+    results['energia_biometano_mj_dia'] = 0.0
+    results['consumo_electrico_upgrading_kwh_dia'] = 0.0
+    results['consumo_electrico_compresion_kwh_dia'] = 0.0
+    results['demanda_calor_upgrading_mj_dia'] = 0.0
+    if uso_biogas_opcion_idx == 2: # Upgrading a biometano
+        if upgrading_tecnologia_idx not in range(len(TECNOLOGIAS_UPGRADING)):
+            raise ValueError(f"Tecnología de upgrading no válida: {upgrading_tecnologia_idx}")
+        _, perdida_ch4_porcentaje, consumo_kwh_nm3, calor_kwh_nm3, pureza_porcentaje, presion_salida_bar = TECNOLOGIAS_UPGRADING[int(upgrading_tecnologia_idx)]
+        results['recuperacion_ch4_porcentaje'] = 100 - perdida_ch4_porcentaje
+        results['ch4_perdido_upgrading_nm3_dia'] = results['ch4_producido_nm3_dia'] * (perdida_ch4_porcentaje / 100)
+        ch4_biometano_nm3_dia = results['ch4_producido_nm3_dia'] - results['ch4_perdido_upgrading_nm3_dia']
+        results['biometano_producido_nm3_dia'] = ch4_biometano_nm3_dia / (pureza_porcentaje / 100)
+        results['energia_biometano_mj_dia'] = ch4_biometano_nm3_dia * pci_ch4_mj_nm3
+        results['consumo_electrico_upgrading_kwh_dia'] = results['biogas_producido_nm3_dia'] * consumo_kwh_nm3
+        results['demanda_calor_upgrading_mj_dia'] = results['biogas_producido_nm3_dia'] * calor_kwh_nm3 * 3.6
+        if presion_inyeccion_red_bar > presion_salida_bar:
+            exponente = (KAPPA_BIOMETANO - 1) / KAPPA_BIOMETANO
+            trabajo_compresion_kwh_nm3 = (PRESION_NORMAL_PA * ((presion_inyeccion_red_bar / presion_salida_bar)**exponente - 1)
+                                          / exponente / EFICIENCIA_COMPRESOR / 3600000)
+            results['consumo_electrico_compresion_kwh_dia'] = results['biometano_producido_nm3_dia'] * trabajo_compresion_kwh_nm3
+    results['energia_biometano_kwh_dia'] = results['energia_biometano_mj_dia'] / 3.6
+    results['consumo_electrico_aux_total_kwh_dia'] = (caudal_sustrato_kg_dia / 1000) * consumo_electrico_aux_kwh_ton_sustrato
+    results['electricidad_neta_exportable_kwh_dia'] = (results['electricidad_generada_bruta_kwh_dia'] - results['consumo_electrico_aux_total_kwh_dia']
+                                                       - results['consumo_electrico_upgrading_kwh_dia'] - results['consumo_electrico_compresion_kwh_dia'])
+    results['calor_neto_disponible_mj_dia'] = (results['calor_util_generado_mj_dia'] - results['demanda_termica_total_digestor_mj_dia']
+                                               - results['demanda_calor_upgrading_mj_dia'])
+    results['calor_neto_disponible_kwh_dia'] = results['calor_neto_disponible_mj_dia'] / 3.6
+    return results
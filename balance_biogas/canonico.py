@@ -0,0 +1,32 @@
+# balance_biogas/canonico.py
+# Forma canónica y hash de un dict de entradas: la misma entrada da siempre el mismo hash,
+# independientemente del orden de las claves o de si un número llega como 30, 30.0 o np.float64.
+# Es la clave de la caché de respuestas del servicio HTTP.
+import hashlib
+import json
+import numbers
+
+
+def entradas_canonicas(entradas):
+    """Copia de las entradas con las claves ordenadas y los números como float (sin -0.0).
+    Los textos y None se conservan; cualquier otro tipo de valor es un error."""
+    canonicas = {}
+    for clave in sorted(entradas):
+        valor = entradas[clave]
+        # float/int primero: isinstance con la ABC numbers.Real es bastante más lenta.
+        if isinstance(valor, (float, int)) or isinstance(valor, numbers.Real):
+            valor = float(valor) + 0.0
+        elif valor is not None and not isinstance(valor, str):
+            raise TypeError(f"Valor no admitido para '{clave}': {valor!r}")
+        canonicas[str(clave)] = valor
+    return canonicas
+
+
+def serializar_canonico(entradas):
+    """JSON compacto y determinista de las entradas canónicas (repr de float: ida y vuelta exacta)."""
+    return json.dumps(entradas_canonicas(entradas), separators=(',', ':'), ensure_ascii=False)
+
+
+def hash_entradas(entradas):
+    """SHA-256 hexadecimal de la forma canónica de las entradas."""
+    return hashlib.sha256(serializar_canonico(entradas).encode('utf-8')).hexdigest()
@@ -0,0 +1,354 @@
+# balance_biogas/cartera.py
+# Cartera de plantas (flota de digestores): cada planta es un conjunto de entradas del balance y
+# la cartera mantiene los totales de la flota. Al cambiar los parámetros de una planta solo se
+# recalcula esa planta (motor escalar) y los agregados se corrigen con la diferencia entre su
+# contribución nueva y la anterior; la carga inicial de muchas plantas usa el motor vectorizado,
+# que da los mismos números que el escalar.
+#
+# Los resultados de cada planta son una fila de una matriz (una columna por resultado), así que
+# la tabla del panel de la flota sale de la matriz sin recorrer diccionarios. Con un almacén de
+# escenarios (almacen.AlmacenEscenarios) cada cambio se guarda y la cartera se vuelve a abrir
+# con los resultados guardados, sin recalcular.
+import threading
+
+import numpy as np
+
+from balance_biogas.ficheros import leer_tabla_por_bloques
+from balance_biogas.informes import VALORES_POR_DEFECTO, preparar_escenario
+from balance_biogas.instrumentacion import contar, medir
+from balance_biogas.lote import (
+    CLAVES_BALANCE_OBLIGATORIAS, CLAVES_BALANCE_OPCIONALES, VALORES_BALANCE_POR_DEFECTO,
+    calcular_dimensiones_digestor_lote, calcular_escenarios_lote,
+)
+
+COLUMNAS_NUMERICAS = CLAVES_BALANCE_OBLIGATORIAS + CLAVES_BALANCE_OPCIONALES + ('densidad_sustrato_kg_m3',)
+CLAVES_DIMENSIONES = ('volumen_digestor_m3', 'diametro_digestor_m', 'altura_digestor_m', 'area_superficial_digestor_m2')
+# Entradas de las que depende el área del digestor (calculos.calcular_dimensiones_digestor).
+CLAVES_GEOMETRIA = ('caudal_sustrato_kg_dia', 'trh_dias', 'densidad_sustrato_kg_m3')
+FILAS_POR_BLOQUE = 5000
+
+# Agregados de la flota, en el orden de las columnas de contribuciones().
+AGREGADOS = (
+    'biogas_producido_nm3_dia', 'ch4_producido_nm3_dia', 'biometano_producido_nm3_dia',
+    'electricidad_generada_bruta_kwh_dia', 'consumo_electrico_aux_total_kwh_dia',
+    'electricidad_neta_exportable_kwh_dia', 'electricidad_exportada_kwh_dia', 'deficit_electrico_kwh_dia',
+    'calor_neto_disponible_mj_dia', 'deficit_termico_mj_dia',
+    'plantas_deficit_electrico', 'plantas_deficit_termico', 'volumen_digestor_m3',
+)
+
+
+def contribuciones(results, uso_biogas_opcion_idx):
+    """Contribución de una planta (resultados escalares) o de varias (arrays) a cada agregado:
+    la electricidad exportada y los déficits solo cuentan la parte positiva de cada planta. El
+    déficit eléctrico solo lo tienen las plantas de cogeneración (uso 0): en caldera o upgrading
+    la electricidad neta negativa es el consumo auxiliar, que ya se suma aparte."""
+    neta = np.asarray(results['electricidad_neta_exportable_kwh_dia'], dtype=float)
+    cogeneracion = np.asarray(uso_biogas_opcion_idx) == 0
+    calor = np.asarray(results['calor_neto_disponible_mj_dia'], dtype=float)
+    return np.stack([
+        np.asarray(results['biogas_producido_nm3_dia'], dtype=float), np.asarray(results['ch4_producido_nm3_dia'], dtype=float),
+        np.asarray(results['biometano_producido_nm3_dia'], dtype=float), np.asarray(results['electricidad_generada_bruta_kwh_dia'], dtype=float),
+        np.asarray(results['consumo_electrico_aux_total_kwh_dia'], dtype=float),
+        neta, np.maximum(neta, 0.0), np.where(cogeneracion, np.maximum(-neta, 0.0), 0.0),
+        calor, np.maximum(-calor, 0.0),
+        ((neta < 0) & cogeneracion).astype(float), (calor < 0).astype(float), np.asarray(results['volumen_digestor_m3'], dtype=float),
+    ], axis=-1)
+
+
+def _evaluar_planta(planta, entradas):
+    """Resultados (con las dimensiones) de una planta con el motor escalar."""
+    try:
+        _, results, dim_digestor = preparar_escenario(entradas)
+    except (ValueError, KeyError, ZeroDivisionError) as error:
+        raise ValueError(f"Planta '{planta}' no evaluable: {error!r}") from None
+    return dict(results, **dim_digestor)
+
+
+def _evaluar_plantas(plantas, lista_entradas):
+    """Resultados de varias plantas con el motor vectorizado: {clave: array}. Las entradas que
+    falten en algunas plantas toman su valor por defecto; el área del digestor, la calculada."""
+    claves = [clave for clave in COLUMNAS_NUMERICAS if any(clave in entradas for entradas in lista_entradas)]
+    valores_por_defecto = dict(VALORES_POR_DEFECTO, **VALORES_BALANCE_POR_DEFECTO)
+    columnas = {clave: np.array([entradas.get(clave, valores_por_defecto.get(clave, 0.0)) for entradas in lista_entradas], dtype=float)
+                for clave in claves if clave != 'area_superficial_digestor_m2'}
+    try:
+        if 'area_superficial_digestor_m2' in claves:
+            area = np.array([entradas.get('area_superficial_digestor_m2', np.nan) for entradas in lista_entradas], dtype=float)
+            area_calculada = calcular_dimensiones_digestor_lote(
+                columnas['caudal_sustrato_kg_dia'], columnas['trh_dias'], columnas.get('densidad_sustrato_kg_m3', 1000))['area_superficial_digestor_m2']
+            columnas['area_superficial_digestor_m2'] = np.where(np.isnan(area), area_calculada, area)
+        with np.errstate(all='ignore'):
+            return calcular_escenarios_lote(columnas)
+    except (ValueError, KeyError, ZeroDivisionError):
+        # Se repite planta a planta para señalar cuál no se puede evaluar.
+        filas = [_evaluar_planta(planta, entradas) for planta, entradas in zip(plantas, lista_entradas)]
+        return {clave: np.array([fila[clave] for fila in filas]) for clave in filas[0]}
+
+
+def combinar_entradas(base, cambios):
+    """Entradas base con los cambios aplicados. Si cambian el caudal, el TRH o la densidad, el
+    área del digestor de base deja de valer y se quita (se recalcula al evaluar la planta), salvo
+    que los cambios traigan su propia área."""
+    entradas = dict(base, **cambios)
+    if 'area_superficial_digestor_m2' not in cambios and any(
+            clave in cambios and cambios[clave] != base.get(clave, VALORES_POR_DEFECTO.get(clave)) for clave in CLAVES_GEOMETRIA):
+        entradas.pop('area_superficial_digestor_m2', None)
+    return entradas
+
+
+def leer_plantas(origen, entradas_base, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera, bloque a bloque, listas de plantas (planta, entradas, grupo) de un fichero CSV o
+    Parquet con una fila por planta: la columna 'planta', opcionalmente 'grupo', y las entradas
+    numéricas que cambian respecto a entradas_base (el resto de columnas se ignora; una celda
+    vacía mantiene el valor de entradas_base). Cada bloque se pasa a cargar_plantas sin tener
+    el fichero entero en memoria."""
+    for tabla in leer_tabla_por_bloques(origen, filas_por_bloque):
+        if 'planta' not in tabla.columns:
+            raise KeyError("Falta la columna 'planta'")
+        columnas = [columna for columna in tabla.columns if columna in COLUMNAS_NUMERICAS]
+        grupos = tabla['grupo'].fillna("").astype(str) if 'grupo' in tabla.columns else [""] * len(tabla)
+        plantas = []
+        for planta, grupo, valores in zip(tabla['planta'].astype(str), grupos, tabla[columnas].to_numpy(dtype=float).tolist()):
+            cambios = {columna: valor for columna, valor in zip(columnas, valores) if not np.isnan(valor)}
+            plantas.append((planta, combinar_entradas(entradas_base, cambios), grupo))
+        yield plantas
+
+
+class CarteraPlantas:
+    """Plantas con sus entradas, resultados y contribuciones a los agregados de la flota (y de
+    cada grupo: región, titular...). Se puede usar desde varios hilos."""
+
+    def __init__(self, nombre="Cartera", almacen=None):
+        self.nombre = nombre
+        self.almacen = almacen
+        self.claves_resultados = None
+        self.n_plantas_recalculadas = 0
+        self._bloqueo = threading.RLock()
+        self._fila = {}
+        self._plantas = []
+        self._grupos = []
+        self._entradas = []
+        self._resultados = np.empty((0, 0))
+        self._contribuciones = np.empty((0, len(AGREGADOS)))
+        self._totales = np.zeros(len(AGREGADOS))
+        self._totales_grupo = {}
+
+    @classmethod
+    def abrir(cls, almacen, nombre="Cartera"):
+        """Cartera guardada en el almacén, con los resultados guardados (sin recalcular). Solo se
+        recalculan, y se vuelven a guardar, las plantas guardadas con otra versión del modelo."""
+        cartera = cls(nombre, almacen)
+        guardadas = almacen.plantas(nombre)
+        vigentes = [fila for fila in guardadas if fila['vigente']]
+        if vigentes:
+            cartera._insertar([fila['planta'] for fila in vigentes], [fila['grupo'] for fila in vigentes],
+                              [fila['entradas'] for fila in vigentes],
+                              [dict(fila['resultados'], **fila['dimensiones']) for fila in vigentes])
+        cartera.cargar_plantas([(fila['planta'], fila['entradas'], fila['grupo']) for fila in guardadas if not fila['vigente']])
+        return cartera
+
+    def __len__(self):
+        return len(self._plantas)
+
+    def __contains__(self, planta):
+        return planta in self._fila
+
+    @property
+    def plantas(self):
+        return list(self._plantas)
+
+    def entradas(self, planta):
+        return dict(self._entradas[self._fila[planta]])
+
+    def resultados(self, planta):
+        return dict(zip(self.claves_resultados, self._resultados[self._fila[planta]].tolist()))
+
+    # --- ALTAS, CAMBIOS Y BAJAS ---
+    def _insertar(self, plantas, grupos, lista_entradas, filas_resultados):
+        """Añade plantas nuevas; filas_resultados es una lista de dicts o un dict de arrays."""
+        if self.claves_resultados is None:
+            self.claves_resultados = tuple(filas_resultados if isinstance(filas_resultados, dict) else filas_resultados[0])
+        if isinstance(filas_resultados, dict):
+            matriz = np.column_stack([np.broadcast_to(filas_resultados[clave], (len(plantas),)) for clave in self.claves_resultados])
+        else:
+            matriz = np.array([[fila[clave] for clave in self.claves_resultados] for fila in filas_resultados], dtype=float)
+        nuevas = contribuciones(dict(zip(self.claves_resultados, matriz.T)),
+                               [entradas['uso_biogas_opcion_idx'] for entradas in lista_entradas])
+        inicio = len(self._plantas)
+        self._reservar(inicio + len(plantas), matriz.shape[1])
+        self._resultados[inicio:inicio + len(plantas)] = matriz
+        self._contribuciones[inicio:inicio + len(plantas)] = nuevas
+        for desplazamiento, (planta, grupo, entradas) in enumerate(zip(plantas, grupos, lista_entradas)):
+            self._fila[planta] = inicio + desplazamiento
+            self._plantas.append(planta)
+            self._grupos.append(grupo)
+            self._entradas.append(entradas)
+            totales_grupo = self._totales_grupo.setdefault(grupo, [0, np.zeros(len(AGREGADOS))])
+            totales_grupo[0] += 1
+            totales_grupo[1] += nuevas[desplazamiento]
+        self._totales += nuevas.sum(axis=0)
+
+    def _reservar(self, n, n_columnas):
+        """Amplía las matrices (al doble) cuando no caben n plantas."""
+        if n <= self._resultados.shape[0] and self._resultados.shape[1] == n_columnas:
+            return
+        capacidad = max(n, 2 * self._resultados.shape[0], 64)
+        resultados = np.empty((capacidad, n_columnas))
+        contribuciones_ampliadas = np.empty((capacidad, len(AGREGADOS)))
+        usadas = len(self._plantas)
+        if usadas:
+            resultados[:usadas] = self._resultados[:usadas]
+            contribuciones_ampliadas[:usadas] = self._contribuciones[:usadas]
+        self._resultados, self._contribuciones = resultados, contribuciones_ampliadas
+
+    def _persistir(self, filas):
+        if self.almacen is None:
+            return
+        guardar = []
+        for fila in filas:
+            results = dict(zip(self.claves_resultados, self._resultados[fila].tolist()))
+            guardar.append((self._plantas[fila], self._grupos[fila], self._entradas[fila],
+                            {clave: valor for clave, valor in results.items() if clave not in CLAVES_DIMENSIONES},
+                            {clave: results[clave] for clave in CLAVES_DIMENSIONES}))
+        self.almacen.guardar_plantas(self.nombre, guardar)
+
+    @medir("cartera.anadir")
+    def anadir(self, planta, entradas, grupo=""):
+        """Añade una planta (ValueError si ya existe) y suma su contribución a los agregados."""
+        with self._bloqueo:
+            if planta in self._fila:
+                raise ValueError(f"La planta '{planta}' ya está en la cartera")
+            entradas = dict(entradas)
+            self._insertar([planta], [grupo], [entradas], [_evaluar_planta(planta, entradas)])
+            self.n_plantas_recalculadas += 1
+            self._persistir([self._fila[planta]])
+
+    def fijar(self, planta, entradas, grupo=""):
+        """Añade la planta o, si ya está, le asigna estas entradas y grupo (actualizar)."""
+        with self._bloqueo:
+            if planta in self._fila:
+                self.actualizar(planta, entradas, grupo=grupo)
+            else:
+                self.anadir(planta, entradas, grupo)
+
+    @medir("cartera.cargar")
+    def cargar_plantas(self, plantas):
+        """Añade muchas plantas de una vez, (planta, entradas, grupo), con el motor vectorizado."""
+        plantas = [(planta, dict(entradas), grupo) for planta, entradas, grupo in plantas]
+        if not plantas:
+            return
+        nombres = [planta for planta, _, _ in plantas]
+        lista_entradas = [entradas for _, entradas, _ in plantas]
+        results = _evaluar_plantas(nombres, lista_entradas)
+        with self._bloqueo:
+            vistas = set()
+            repetidas = []
+            for planta in nombres:
+                if planta in vistas or planta in self._fila:
+                    repetidas.append(str(planta))
+                vistas.add(planta)
+            if repetidas:
+                raise ValueError(f"Plantas repetidas en la cartera: {', '.join(repetidas[:10])}")
+            inicio = len(self._plantas)
+            self._insertar(nombres, [grupo for _, _, grupo in plantas], lista_entradas, results)
+            self.n_plantas_recalculadas += len(plantas)
+            self._persistir(range(inicio, len(self._plantas)))
+        contar("cartera_plantas_cargadas", len(plantas))
+
+    @medir("cartera.actualizar")
+    def actualizar(self, planta, entradas=None, grupo=None, **cambios):
+        """Cambia las entradas de una planta (todas, con entradas, o solo algunas, como argumentos
+        con nombre) y/o su grupo. Solo se recalcula esa planta; los agregados se corrigen con la
+        diferencia entre su contribución nueva y la anterior. El área del digestor se recalcula si
+        cambian el caudal, el TRH o la densidad y no se da una nueva (combinar_entradas)."""
+        with self._bloqueo:
+            fila = self._fila[planta]
+            nuevas_entradas = combinar_entradas(self._entradas[fila] if entradas is None else entradas, cambios)
+            if nuevas_entradas != self._entradas[fila]:
+                results = _evaluar_planta(planta, nuevas_entradas)
+                self.n_plantas_recalculadas += 1
+                fila_resultados = np.array([results[clave] for clave in self.claves_resultados], dtype=float)
+                nueva = contribuciones(results, nuevas_entradas['uso_biogas_opcion_idx'])
+                self._entradas[fila] = nuevas_entradas
+                self._resultados[fila] = fila_resultados
+            else:
+                nueva = self._contribuciones[fila]
+            anterior = self._contribuciones[fila].copy()
+            grupo_anterior = self._grupos[fila]
+            grupo = grupo_anterior if grupo is None else grupo
+            self._totales += nueva - anterior
+            self._totales_grupo[grupo_anterior][0] -= 1
+            self._totales_grupo[grupo_anterior][1] -= anterior
+            totales_grupo = self._totales_grupo.setdefault(grupo, [0, np.zeros(len(AGREGADOS))])
+            totales_grupo[0] += 1
+            totales_grupo[1] += nueva
+            if not self._totales_grupo[grupo_anterior][0]:
+                del self._totales_grupo[grupo_anterior]
+            self._contribuciones[fila] = nueva
+            self._grupos[fila] = grupo
+            self._persistir([fila])
+
+    def eliminar(self, planta):
+        """Quita la planta y resta su contribución (la última fila pasa a ocupar su lugar)."""
+        with self._bloqueo:
+            fila = self._fila.pop(planta)
+            contribucion = self._contribuciones[fila].copy()
+            grupo = self._grupos[fila]
+            self._totales -= contribucion
+            self._totales_grupo[grupo][0] -= 1
+            self._totales_grupo[grupo][1] -= contribucion
+            if not self._totales_grupo[grupo][0]:
+                del self._totales_grupo[grupo]
+            ultima = len(self._plantas) - 1
+            if fila != ultima:
+                self._resultados[fila] = self._resultados[ultima]
+                self._contribuciones[fila] = self._contribuciones[ultima]
+                for lista in (self._plantas, self._grupos, self._entradas):
+                    lista[fila] = lista[ultima]
+                self._fila[self._plantas[fila]] = fila
+            for lista in (self._plantas, self._grupos, self._entradas):
+                lista.pop()
+            if self.almacen is not None:
+                self.almacen.eliminar_planta(self.nombre, planta)
+
+    # --- AGREGADOS Y TABLAS ---
+    def agregados(self, grupo=None):
+        """Totales de la flota (o de un grupo) y número de plantas: se leen, no se recalculan."""
+        with self._bloqueo:
+            if grupo is None:
+                n, totales = len(self._plantas), self._totales
+            else:
+                n, totales = self._totales_grupo.get(grupo, (0, np.zeros(len(AGREGADOS))))
+            return dict(zip(AGREGADOS, totales.tolist()), plantas=n)
+
+    def agregados_por_grupo(self):
+        with self._bloqueo:
+            return {grupo: dict(zip(AGREGADOS, totales.tolist()), plantas=n) for grupo, (n, totales) in sorted(self._totales_grupo.items())}
+
+    def tabla(self, claves=None):
+        """Columnas de la tabla de plantas: {'planta': [...], 'grupo': [...], clave: array}."""
+        with self._bloqueo:
+            n = len(self._plantas)
+            indices = {clave: i for i, clave in enumerate(self.claves_resultados or ())}
+            columnas = {'planta': list(self._plantas), 'grupo': list(self._grupos)}
+            for clave in indices if claves is None else claves:
+                columnas[clave] = self._resultados[:n, indices[clave]].copy()
+            return columnas
+
+    @medir("cartera.recalcular")
+    def recalcular(self):
+        """Recalcula todas las plantas con el motor vectorizado y suma los agregados desde cero
+        (elimina el error de redondeo acumulado por muchas actualizaciones incrementales)."""
+        with self._bloqueo:
+            if not self._plantas:
+                return
+            n = len(self._plantas)
+            results = _evaluar_plantas(self._plantas, self._entradas)
+            self._resultados[:n] = np.column_stack([np.broadcast_to(results[clave], (n,)) for clave in self.claves_resultados])
+            self._contribuciones[:n] = contribuciones(dict(zip(self.claves_resultados, self._resultados[:n].T)),
+                                                      [entradas['uso_biogas_opcion_idx'] for entradas in self._entradas])
+            self.n_plantas_recalculadas += n
+            self._totales = self._contribuciones[:n].sum(axis=0)
+            grupos = np.array(self._grupos, dtype=object)
+            self._totales_grupo = {grupo: [int(np.count_nonzero(grupos == grupo)), self._contribuciones[:n][grupos == grupo].sum(axis=0)]
+                                   for grupo in set(self._grupos)}
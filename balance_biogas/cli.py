@@ -0,0 +1,142 @@
+# balance_biogas/cli.py
+# Evaluación masiva de escenarios desde la línea de comandos: una fila por escenario en CSV o
+# Parquet, procesada por bloques con el motor vectorizado y escrita de forma incremental en
+# CSV, Parquet o XLSX (openpyxl en modo write-only). La memoria depende del tamaño de bloque,
+# no del tamaño del fichero.
+#
+# Uso: python -m balance_biogas entrada.csv salida.parquet [--procesos 4] [--columna caudal=caudal_sustrato_kg_dia]
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from balance_biogas import instrumentacion
+from balance_biogas.ficheros import FORMATOS_ESCRITURA, FORMATOS_LECTURA, abrir_escritor, leer_tabla_por_bloques
+from balance_biogas.instrumentacion import contar, medir, tramo
+from balance_biogas.lote import CLAVES_BALANCE_OBLIGATORIAS, CLAVES_BALANCE_OPCIONALES, calcular_escenarios_lote
+
+FILAS_POR_BLOQUE = 50000
+
+# Entradas con valor por defecto cuando el fichero no trae la columna (los mismos que la interfaz).
+VALORES_POR_DEFECTO = {'cp_sustrato_kj_kg_c': 4.186, 'densidad_sustrato_kg_m3': 1000.0}
+
+COLUMNAS_OBLIGATORIAS = tuple(
+    clave for clave in CLAVES_BALANCE_OBLIGATORIAS
+    if clave != 'area_superficial_digestor_m2' and clave not in VALORES_POR_DEFECTO
+) + ('trh_dias',)
+COLUMNAS_NUMERICAS = CLAVES_BALANCE_OBLIGATORIAS + CLAVES_BALANCE_OPCIONALES + ('densidad_sustrato_kg_m3',)
+
+
+def comprobar_columnas(columnas):
+    faltan = [clave for clave in COLUMNAS_OBLIGATORIAS if clave not in columnas]
+    if faltan:
+        raise ValueError(f"Faltan columnas obligatorias en el fichero de entrada: {', '.join(faltan)}")
+
+
+@medir("cli.bloque")
+def procesar_bloque(tabla):
+    """Añade a la tabla de escenarios las dimensiones del digestor y los resultados del balance."""
+    entradas = {clave: tabla[clave].to_numpy(dtype=float) for clave in COLUMNAS_NUMERICAS if clave in tabla.columns}
+    for clave, valor in VALORES_POR_DEFECTO.items():
+        entradas.setdefault(clave, valor)
+    results = calcular_escenarios_lote(entradas)
+    salida = tabla.copy()
+    for clave, valores in results.items():
+        if clave not in salida.columns:
+            salida[clave] = np.broadcast_to(valores, (len(tabla),))
+    return salida
+
+
+def _bloques_procesados(bloques, procesos):
+    """Procesa los bloques en orden; con varios procesos mantiene como mucho 2 bloques por proceso
+    en vuelo para que la memoria siga acotada."""
+    if procesos <= 1:
+        for tabla in bloques:
+            yield procesar_bloque(tabla)
+        return
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for tabla in bloques:
+            pendientes.append(pool.submit(procesar_bloque, tabla))
+            if len(pendientes) >= 2 * procesos:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+def _validar_primero(bloques):
+    for i, tabla in enumerate(bloques):
+        if i == 0:
+            comprobar_columnas(tabla.columns)
+        yield tabla
+
+
+@medir("cli.fichero")
+def procesar_fichero(entrada, salida, filas_por_bloque=FILAS_POR_BLOQUE, procesos=1, columnas=None,
+                     formato_entrada=None, formato_salida=None):
+    """Procesa el fichero de escenarios completo y devuelve un resumen con filas, segundos y filas/s."""
+    t0 = time.perf_counter()
+    escritor = abrir_escritor(salida, formato_salida)
+    n_filas = 0
+    bloques = _validar_primero(leer_tabla_por_bloques(entrada, filas_por_bloque, formato_entrada, columnas))
+    for tabla in _bloques_procesados(bloques, procesos):
+        with tramo("cli.escritura"):
+            escritor.escribir(tabla)
+        contar("filas_procesadas", len(tabla))
+        n_filas += len(tabla)
+    segundos = time.perf_counter() - t0
+    resumen = {
+        'filas': n_filas,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(n_filas / segundos, 1) if segundos > 0 else 0.0,
+        'procesos': procesos,
+        'filas_por_bloque': filas_por_bloque,
+    }
+    escritor.cerrar(resumen)
+    return resumen
+
+
+def _mapa_columnas(asignaciones):
+    columnas = {}
+    for asignacion in asignaciones or []:
+        origen, separador, destino = asignacion.partition('=')
+        if not separador or not origen or not destino:
+            raise argparse.ArgumentTypeError(f"Asignación de columna no válida: '{asignacion}' (use COLUMNA=clave)")
+        columnas[origen] = destino
+    return columnas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m balance_biogas",
+        description="Calcula dimensiones del digestor y balance energético para cada fila (escenario) de un fichero.")
+    parser.add_argument("entrada", help="Fichero de escenarios (CSV o Parquet)")
+    parser.add_argument("salida", help="Fichero de resultados (CSV, Parquet o XLSX)")
+    parser.add_argument("--formato-entrada", choices=FORMATOS_LECTURA, help="Por defecto se deduce de la extensión")
+    parser.add_argument("--formato-salida", choices=FORMATOS_ESCRITURA, help="Por defecto se deduce de la extensión")
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE, help=f"Filas por bloque (por defecto {FILAS_POR_BLOQUE})")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos de trabajo (por defecto 1)")
+    parser.add_argument("--columna", action="append", metavar="COLUMNA=clave",
+                        help="Asigna una columna del fichero a una clave de entrada del balance (repetible)")
+    parser.add_argument("--metricas", metavar="RUTA",
+                        help="Guarda tiempos por tramo y contadores al terminar: texto de Prometheus si RUTA "
+                             "termina en .prom, si no añade una línea JSON")
+    args = parser.parse_args(argv)
+    if args.metricas:
+        instrumentacion.activar()
+
+    try:
+        columnas = _mapa_columnas(args.columna)
+        resumen = procesar_fichero(args.entrada, args.salida, args.filas_por_bloque, args.procesos, columnas,
+                                   args.formato_entrada, args.formato_salida)
+    except (ValueError, argparse.ArgumentTypeError, OSError, ImportError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    if args.metricas:
+        instrumentacion.exportar(args.metricas)
+    print(f"Filas procesadas: {resumen['filas']:,} en {resumen['segundos']:.2f} s "
+          f"({resumen['filas_por_segundo']:,.0f} filas/s, {args.procesos} proceso(s))", file=sys.stderr)
+    return 0
@@ -0,0 +1,342 @@
+# balance_biogas/exportacion.py
+# Generación de los informes Excel y PDF. openpyxl y fpdf2 son opcionales y solo se
+# importan cuando se pide una exportación, para que el núcleo cargue sin ellos.
+#
+# La disposición de los informes está descrita como datos (plantillas) y se compila una sola
+# vez por proceso: etiquetas ya saneadas y justificadas para el PDF y, para Excel, el paquete
+# XLSX que genera openpyxl en modo write-only con la hoja sin filas (estilos, anchos y celdas
+# combinadas). Por informe solo se formatean y escriben en flujo las filas de la hoja.
+import datetime
+import importlib.util
+import math
+import numbers
+import re
+import zipfile
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from balance_biogas.instrumentacion import contar, medir
+
+
+# --- LIBRERÍAS DE EXPORTACIÓN (carga diferida) ---
+def openpyxl_disponible():
+    return importlib.util.find_spec("openpyxl") is not None
+
+
+def fpdf_disponible():
+    return importlib.util.find_spec("fpdf") is not None
+
+
+# --- SANEADO DE TEXTO PARA FPDF ---
+# Caracteres a reemplazar y sus reemplazos
+# Esta lista puede necesitar ser extendida
+REEMPLAZOS_FPDF = {
+    '€': 'EUR', 'ñ': 'n', 'Ñ': 'N', 'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+    'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U', 'ü': 'u', 'Ü': 'U', '¿': '', '¡': '',
+    '°': 'deg', '%': 'porc', '(': '', ')': '', ':': '', '/': '-', # Evitar caracteres que FPDF podría interpretar mal
+    # Es importante que no queden caracteres que no sean latin-1 o cp1252
+}
+# Tabla de traducción: una sola pasada por el texto en lugar de un str.replace por carácter.
+# Equivale al bucle de reemplazos porque ningún reemplazo contiene caracteres de la tabla.
+_TABLA_FPDF = str.maketrans(REEMPLAZOS_FPDF)
+
+
+def sanitize_text_for_fpdf(text):
+    if not isinstance(text, str): text = str(text)
+    text = text.translate(_TABLA_FPDF)
+    # Forzar codificación a 'latin-1' (o 'cp1252'), reemplazando caracteres no soportados
+    try:
+        return text.encode('latin-1', 'replace').decode('latin-1')
+    except Exception: # Si la sanitización falla, devolver algo seguro
+        return "Texto_No_Soportado"
+
+
+# --- PLANTILLAS DE LOS INFORMES ---
+# Parámetros de entrada: (etiqueta, clave[, clave del texto añadido entre paréntesis])
+FILAS_ENTRADA_EXCEL = (
+    ("Sustrato:", 'sustrato_nombre'), ("Caudal Sustrato (kg/día):", 'caudal_sustrato_kg_dia'),
+    ("ST (%):", 'st_porcentaje'), ("SV (% de ST):", 'sv_de_st_porcentaje'),
+    ("Fuente BMP:", 'bmp_fuente_texto'), ("BMP (Nm³ CH₄/kg SV):", 'bmp_nm3_ch4_kg_sv'),
+    ("Temp. Op. Digestor (°C):", 'temp_op_digestor_c', 'temp_op_digestor_texto'),
+    ("Modelo de Degradación:", 'modelo_cinetico_texto'),
+    ("Eficiencia Digestión (%):", 'eficiencia_digestion_porcentaje'),
+    ("TRH (días):", 'trh_dias'),
+    ("%CH₄ en biogás:", 'ch4_en_biogas_porcentaje'),
+    ("Uso Principal Biogás:", 'uso_biogas_texto'),
+)
+# Filas adicionales según uso_biogas_opcion_idx (0 = CHP, 1 = caldera)
+FILAS_ENTRADA_EXCEL_USO = {
+    0: (("Eficiencia Eléctrica CHP (%):", 'chp_eficiencia_electrica_porcentaje'),
+        ("Eficiencia Térmica CHP (%):", 'chp_eficiencia_termica_porcentaje')),
+    1: (("Eficiencia Caldera (%):", 'caldera_eficiencia_porcentaje'),),
+    2: (("Tecnología de Upgrading:", 'upgrading_tecnologia_texto'),
+        ("Presión Inyección Red (bar a):", 'presion_inyeccion_red_bar')),
+}
+FILAS_DIGESTION_EXCEL = (
+    ("  Eficiencia de Digestión Efectiva (%):", 'eficiencia_digestion_efectiva_porcentaje'),
+    ("  Metano Producido (Nm³/día):", 'ch4_producido_nm3_dia'),
+)
+FILAS_UPGRADING_EXCEL = (
+    ("  Biometano Producido (Nm³/día):", 'biometano_producido_nm3_dia'),
+    ("  Energía en Biometano (kWh/día):", 'energia_biometano_kwh_dia'),
+    ("  Recuperación de CH₄ (%):", 'recuperacion_ch4_porcentaje'),
+    ("  CH₄ Perdido en Upgrading (Nm³/día):", 'ch4_perdido_upgrading_nm3_dia'),
+    ("  Consumo Eléctrico Upgrading (kWh/día):", 'consumo_electrico_upgrading_kwh_dia'),
+    ("  Consumo Eléctrico Compresión (kWh/día):", 'consumo_electrico_compresion_kwh_dia'),
+    ("  Demanda de Calor Upgrading (MJ/día):", 'demanda_calor_upgrading_mj_dia'),
+)
+FILAS_BALANCE_NETO_EXCEL = (
+    ("  Electricidad Neta Exportable (kWh/día):", 'electricidad_neta_exportable_kwh_dia'),
+    ("  Calor Neto Disponible/Déficit (MJ/día):", 'calor_neto_disponible_mj_dia'),
+)
+
+FILAS_ENTRADA_PDF = (
+    ("Sustrato", 'sustrato_nombre', 'N/A'),
+    ("Caudal Sustrato (kg/día)", 'caudal_sustrato_kg_dia', 0),
+)
+
+
+def _electricidad_neta_pdf(all_inputs, results_dict, dim_digestor_dict):
+    if all_inputs.get('uso_biogas_opcion_idx') == 0:
+        return f"{results_dict.get('electricidad_neta_exportable_kwh_dia',0):.2f}"
+    return f"{results_dict.get('electricidad_neta_exportable_kwh_dia',0):.2f} (Consumo)"
+
+
+def _resultado_pdf(clave):
+    return lambda e, r, d: f"{r.get(clave,0):.2f}"
+
+
+# Resultados: (título de sección, ((etiqueta, función (entradas, resultados, dimensiones) -> texto), ...),
+# uso_biogas_opcion_idx al que se limita la sección o None si se incluye siempre)
+SECCIONES_RESULTADOS_PDF = (
+    ("Dimensiones Digestor:", (
+        ("Volumen Estimado (m³)", lambda e, r, d: f"{d.get('volumen_digestor_m3',0):.2f}"),
+        ("Diámetro Estimado (m)", lambda e, r, d: f"{d.get('diametro_digestor_m',0):.2f}"),
+    ), None),
+    ("Digestión:", (
+        ("Modelo de Degradación", lambda e, r, d: e.get('modelo_cinetico_texto', 'N/A')),
+        ("Eficiencia de Digestión Efectiva (%)", _resultado_pdf('eficiencia_digestion_efectiva_porcentaje')),
+        ("Metano Producido (Nm³ CH4/día)", _resultado_pdf('ch4_producido_nm3_dia')),
+    ), None),
+    ("Upgrading a Biometano:", (
+        ("Tecnología", lambda e, r, d: e.get('upgrading_tecnologia_texto', 'N/A')),
+        ("Biometano Producido (Nm³/día)", _resultado_pdf('biometano_producido_nm3_dia')),
+        ("Recuperación de CH4 (%)", _resultado_pdf('recuperacion_ch4_porcentaje')),
+        ("Consumo Eléctrico Upgrading + Compresión (kWh/día)",
+         lambda e, r, d: f"{r.get('consumo_electrico_upgrading_kwh_dia',0) + r.get('consumo_electrico_compresion_kwh_dia',0):.2f}"),
+        ("Demanda de Calor Upgrading (MJ/día)", _resultado_pdf('demanda_calor_upgrading_mj_dia')),
+    ), 2),
+    ("BALANCE NETO:", (
+        ("ELECTRICIDAD NETA EXPORTABLE (kWh/día)", _electricidad_neta_pdf),
+        ("CALOR NETO DISPONIBLE/DÉFICIT (MJ/día)", _resultado_pdf('calor_neto_disponible_mj_dia')),
+    ), None),
+)
+NOTAS_PDF = (
+    "- Este es un balance PRELIMINAR basado en estimaciones y supuestos.\n"
+    "- Los valores de BMP, eficiencias y pérdidas pueden variar significativamente.\n"
+    "- Se recomienda un análisis detallado con datos específicos del proyecto y de proveedores."
+)
+
+
+# Versión del contenido de los informes. Forma parte de la clave de los informes guardados en el
+# almacén de escenarios: hay que incrementarla al cambiar la disposición, los textos o el formato
+# de los informes PDF o Excel.
+VERSION_INFORMES = 1
+
+TITULO_HOJA_EXCEL = "Resumen Balance Energético"
+ANCHOS_COLUMNA_EXCEL = {'A': 35, 'B': 15, 'C': 15}
+
+
+_MARCA_FECHA = "__FECHA_W3CDTF__"
+_CARACTERES_ILEGALES_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+@lru_cache(maxsize=None)
+def _estilos_excel():
+    """Fuentes y alineaciones de las filas con estilo, creadas una vez por proceso:
+    {estilo: (fuente, alineación o None)}."""
+    from openpyxl.styles import Font, Alignment
+    return {
+        'titulo': (Font(bold=True, size=14), Alignment(horizontal="center")),
+        'cabecera': (Font(bold=True, size=12, color="00FFFFFF"), None),
+        'negrita': (Font(bold=True), None),
+    }
+
+
+@lru_cache(maxsize=None)
+@medir("exportacion.xlsx.plantilla")
+def _plantilla_excel(celdas_combinadas):
+    """Paquete XLSX generado una vez con openpyxl en modo write-only con la hoja sin filas: estilos,
+    tema, anchos de columna, celdas combinadas y resto de partes. Hay una plantilla por disposición
+    de celdas combinadas (una por uso del biogás). Devuelve (partes {nombre: bytes}, ruta de la
+    hoja, XML de la hoja antes y después de las filas, {estilo: índice de estilo de celda})."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(TITULO_HOJA_EXCEL)
+    for col_letter, ancho in ANCHOS_COLUMNA_EXCEL.items(): ws.column_dimensions[col_letter].width = ancho
+    estilos = {}
+    for nombre, (fuente, alineacion) in _estilos_excel().items():
+        cell = WriteOnlyCell(ws)
+        cell.font = fuente
+        if alineacion is not None: cell.alignment = alineacion
+        estilos[nombre] = cell.style_id
+    for rango in celdas_combinadas: ws.merged_cells.add(rango)
+    excel_stream = BytesIO()
+    wb.save(excel_stream)
+    with zipfile.ZipFile(excel_stream) as paquete:
+        partes = {nombre: paquete.read(nombre) for nombre in paquete.namelist()}
+    ruta_hoja = next(nombre for nombre in partes if nombre.startswith("xl/worksheets/"))
+    antes, despues = partes.pop(ruta_hoja).decode("utf-8").split("<sheetData></sheetData>")
+    partes["docProps/core.xml"] = re.sub(rb'\d{4}-\d\d-\d\dT[\d:]+Z', _MARCA_FECHA.encode(), partes["docProps/core.xml"])
+    return partes, ruta_hoja, antes, despues, estilos
+
+
+def _celda_xml(referencia, valor, estilo):
+    # Los números finitos quedan como celdas numéricas; NaN/inf y los textos, como texto
+    # sin los caracteres de control que el XML no admite.
+    atributo_estilo = f' s="{estilo}"' if estilo else ''
+    if isinstance(valor, bool):
+        return f'<c r="{referencia}"{atributo_estilo} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, numbers.Real) and (isinstance(valor, numbers.Integral) or math.isfinite(valor)):
+        texto = str(int(valor)) if isinstance(valor, numbers.Integral) else repr(float(valor))
+        return f'<c r="{referencia}"{atributo_estilo}><v>{texto}</v></c>'
+    texto = escape(_CARACTERES_ILEGALES_XML.sub('', str(valor)))
+    return f'<c r="{referencia}"{atributo_estilo} t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _filas_excel(all_inputs, results_dict, project_info):
+    """Contenido de la hoja del informe Excel: ([(valores de la fila, estilo o None), ...],
+    rangos de celdas combinadas)."""
+    filas = []
+    celdas_combinadas = ["A1:D1"]
+
+    def add_excel_row(data, estilo=None):
+        filas.append((data, estilo))
+        return len(filas)
+
+    add_excel_row([f"Balance Energético Preliminar: {project_info['nombre']}"], 'titulo')
+    add_excel_row([f"Fecha: {project_info['fecha']}"]); add_excel_row([f"Analista: {project_info['analista']}"]); add_excel_row([])
+
+    fila_cabecera = add_excel_row(["PARÁMETROS DE ENTRADA"], 'cabecera')
+    celdas_combinadas.append(f"A{fila_cabecera}:C{fila_cabecera}")
+    for label, key, *extra in FILAS_ENTRADA_EXCEL + FILAS_ENTRADA_EXCEL_USO.get(all_inputs.get('uso_biogas_opcion_idx'), ()):
+        row_data = [label, all_inputs.get(key, 'N/A')]
+        if extra: row_data.append(f"({all_inputs.get(extra[0],'N/A')})")
+        add_excel_row(row_data)
+
+    add_excel_row([])
+    fila_cabecera = add_excel_row(["RESULTADOS DEL BALANCE (por día)"], 'cabecera')
+    celdas_combinadas.append(f"A{fila_cabecera}:C{fila_cabecera}")
+    add_excel_row(["DIGESTIÓN:"], 'negrita')
+    for label, key in FILAS_DIGESTION_EXCEL:
+        add_excel_row([label, results_dict.get(key, 0)])
+    if all_inputs.get('uso_biogas_opcion_idx') == 2:
+        add_excel_row(["UPGRADING A BIOMETANO:"], 'negrita')
+        for label, key in FILAS_UPGRADING_EXCEL:
+            add_excel_row([label, results_dict.get(key, 0)])
+    add_excel_row(["BALANCE NETO:"], 'negrita')
+    for label, key in FILAS_BALANCE_NETO_EXCEL:
+        add_excel_row([label, results_dict.get(key, 0)], 'negrita')
+    return filas, tuple(celdas_combinadas)
+
+
+@lru_cache(maxsize=None)
+@medir("exportacion.pdf.plantilla")
+def _plantilla_pdf():
+    """Operaciones de dibujo del PDF con los textos fijos ya saneados. Las operaciones 'linea'
+    llevan el prefijo (etiqueta justificada) y la función que da el valor de cada informe."""
+    operaciones = [('fuente', "B", 16), ('titulo', 10), ('fuente', "", 10), ('subtitulo', 6), ('salto', 5),
+                   ('fuente', "B", 12), ('celda', 8, sanitize_text_for_fpdf("PARÁMETROS DE ENTRADA")), ('fuente', "", 9)]
+    for etiqueta, clave, por_defecto in FILAS_ENTRADA_PDF:
+        operaciones.append(('linea', f"  {sanitize_text_for_fpdf(etiqueta).ljust(45)}: ",
+                            lambda e, r, d, clave=clave, por_defecto=por_defecto: e.get(clave, por_defecto)))
+    operaciones += [('salto', 3), ('fuente', "B", 12), ('celda', 10, sanitize_text_for_fpdf("RESULTADOS DEL BALANCE (por día)"))]
+    for titulo, filas, uso in SECCIONES_RESULTADOS_PDF:
+        seccion = [('fuente', "BU", 10), ('celda', 6, sanitize_text_for_fpdf(titulo)), ('fuente', "", 9)]
+        seccion += [('linea', f"  {sanitize_text_for_fpdf(etiqueta).ljust(50)}: ", valor) for etiqueta, valor in filas]
+        seccion.append(('salto', 2))
+        # 'si_uso' salta las operaciones de la sección cuando el uso del biogás no coincide.
+        operaciones += ([('si_uso', uso, len(seccion))] if uso is not None else []) + seccion
+    operaciones += [('salto', 5), ('fuente', "B", 10), ('celda', 6, sanitize_text_for_fpdf("Notas Importantes:")),
+                    ('fuente', "I", 9)]
+    operaciones += [('texto', 5, sanitize_text_for_fpdf(linea)) for linea in NOTAS_PDF.split("\n")]
+    return tuple(operaciones)
+
+
+# --- FUNCIONES DE EXPORTACIÓN ---
+@medir("exportacion.xlsx")
+def generar_excel_bytes(all_inputs, results_dict, dim_digestor_dict, project_info):
+    """Informe Excel sobre la plantilla compilada con openpyxl (write-only): por informe solo se
+    escriben en flujo las filas de la hoja, y los valores numéricos quedan como celdas numéricas."""
+    if not openpyxl_disponible():
+        return None
+    filas, celdas_combinadas = _filas_excel(all_inputs, results_dict, project_info)
+    partes, ruta_hoja, antes, despues, estilos = _plantilla_excel(celdas_combinadas)
+    hoja = [antes, "<sheetData>"]
+    for numero, (data, estilo) in enumerate(filas, 1):
+        indice_estilo = estilos[estilo] if estilo is not None else None
+        hoja.append(f'<row r="{numero}">' + "".join(
+            _celda_xml(f"{columna}{numero}", valor, indice_estilo) for columna, valor in zip("ABCD", data) if valor is not None) + "</row>")
+    hoja += ["</sheetData>", despues]
+    fecha = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ").encode()
+    excel_stream = BytesIO()
+    with zipfile.ZipFile(excel_stream, "w", compression=zipfile.ZIP_DEFLATED) as paquete:
+        for nombre, contenido in partes.items():
+            paquete.writestr(nombre, contenido.replace(_MARCA_FECHA.encode(), fecha) if nombre == "docProps/core.xml" else contenido)
+        paquete.writestr(ruta_hoja, "".join(hoja).encode("utf-8"))
+    contenido = excel_stream.getvalue()
+    contar("bytes_exportados", len(contenido), formato="xlsx")
+    return contenido
+
+
+@medir("exportacion.pdf")
+def generar_pdf_bytes(all_inputs, results_dict, dim_digestor_dict, project_info):
+    """Informe PDF dibujado a partir de la plantilla compilada. Las líneas que caben en el ancho
+    útil se escriben con cell (sin el algoritmo de partición de líneas de multi_cell)."""
+    if not fpdf_disponible():
+        return None
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font("Helvetica", "", 10) # Establecer fuente base
+    ancho_util = pdf.epw
+
+    def escribir_linea(alto, texto):
+        if pdf.get_string_width(texto) <= ancho_util:
+            pdf.cell(0, alto, texto, 0, new_x="LMARGIN", new_y="NEXT", align="L")
+        else:
+            pdf.multi_cell(0, alto, texto, 0, "L", new_x="LMARGIN", new_y="NEXT")
+
+    operaciones = _plantilla_pdf()
+    i = 0
+    while i < len(operaciones):
+        operacion = operaciones[i]
+        i += 1
+        tipo = operacion[0]
+        if tipo == 'si_uso':
+            if all_inputs.get('uso_biogas_opcion_idx') != operacion[1]:
+                i += operacion[2]
+        elif tipo == 'linea':
+            escribir_linea(5, operacion[1] + sanitize_text_for_fpdf(operacion[2](all_inputs, results_dict, dim_digestor_dict)))
+        elif tipo == 'fuente':
+            pdf.set_font("Helvetica", operacion[1], operacion[2])
+        elif tipo == 'celda':
+            pdf.cell(0, operacion[1], operacion[2], 0, new_x="LMARGIN", new_y="NEXT", align="L")
+        elif tipo == 'salto':
+            pdf.ln(operacion[1])
+        elif tipo == 'titulo':
+            pdf.cell(0, operacion[1], sanitize_text_for_fpdf(f"Balance Energético Preliminar: {project_info['nombre']}"),
+                     0, new_x="LMARGIN", new_y="NEXT", align="C")
+        elif tipo == 'subtitulo':
+            pdf.cell(0, operacion[1], sanitize_text_for_fpdf(f"Fecha: {project_info['fecha']} | Analista: {project_info['analista']}"),
+                     0, new_x="LMARGIN", new_y="NEXT", align="C")
+        elif tipo == 'texto':
+            escribir_linea(operacion[1], operacion[2])
+
+    # fpdf2 devuelve bytearray; download_button exige bytes
+    contenido = bytes(pdf.output())
+    contar("bytes_exportados", len(contenido), formato="pdf")
+    return contenido
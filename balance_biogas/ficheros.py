@@ -0,0 +1,137 @@
+# balance_biogas/ficheros.py
+# Lectura y escritura de tablas por bloques (CSV, Parquet, XLSX) para los procesos masivos.
+# pandas, pyarrow y openpyxl son opcionales y solo se importan al usar el formato que los requiere.
+import os
+
+FORMATOS_LECTURA = ('csv', 'parquet')
+FORMATOS_ESCRITURA = ('csv', 'parquet', 'xlsx')
+
+# Límite de filas de una hoja de Excel (incluida la cabecera).
+MAX_FILAS_HOJA_XLSX = 1048576
+
+
+def deducir_formato(origen, formato=None):
+    """Formato explícito o, si no se indica, deducido de la extensión de la ruta o del fichero."""
+    if formato is not None:
+        return formato.lower()
+    nombre = origen if isinstance(origen, (str, os.PathLike)) else getattr(origen, 'name', '')
+    extension = os.path.splitext(str(nombre))[1].lower()
+    return {'.parquet': 'parquet', '.pq': 'parquet', '.xlsx': 'xlsx'}.get(extension, 'csv')
+
+
+def leer_tabla_por_bloques(origen, filas_por_bloque, formato=None, columnas=None):
+    """Genera DataFrames de como mucho filas_por_bloque filas sin cargar el fichero entero.
+
+    columnas renombra las columnas del fichero: {nombre_en_fichero: nombre_interno}.
+    """
+    formato = deducir_formato(origen, formato)
+    columnas = columnas or {}
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(origen).iter_batches(batch_size=filas_por_bloque):
+            yield lote.to_pandas().rename(columns=columnas)
+    elif formato == 'csv':
+        import pandas as pd
+        for tabla in pd.read_csv(origen, chunksize=filas_por_bloque, float_precision='round_trip'):
+            yield tabla.rename(columns=columnas)
+    else:
+        raise ValueError(f"Formato de lectura no soportado: '{formato}' (use {', '.join(FORMATOS_LECTURA)})")
+
+
+class _EscritorCsv:
+    """Usa el escritor CSV de pyarrow si está instalado (un orden de magnitud más rápido que
+    DataFrame.to_csv formateando floats) y, si no, pandas en modo anexar."""
+
+    def __init__(self, destino):
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pa_csv
+            self._pa, self._pa_csv = pa, pa_csv
+        except ImportError:
+            self._pa = self._pa_csv = None
+        self.destino = destino
+        self.escritor = None
+        self.esquema = None
+        self.cabecera_escrita = False
+
+    def escribir(self, tabla):
+        if self._pa is not None:
+            lote = self._pa.Table.from_pandas(tabla, preserve_index=False)
+            if self.escritor is None:
+                self.esquema = lote.schema
+                self.escritor = self._pa_csv.CSVWriter(self.destino, self.esquema)
+            self.escritor.write_table(lote.cast(self.esquema))
+        else:
+            tabla.to_csv(self.destino, mode='a' if self.cabecera_escrita else 'w', header=not self.cabecera_escrita, index=False)
+            self.cabecera_escrita = True
+
+    def cerrar(self, resumen=None):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+class _EscritorParquet:
+    def __init__(self, destino):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq = pa, pq
+        self.destino = destino
+        self.escritor = None
+
+    def escribir(self, tabla):
+        lote = self._pa.Table.from_pandas(tabla, preserve_index=False)
+        if self.escritor is None:
+            self.escritor = self._pq.ParquetWriter(self.destino, lote.schema)
+        self.escritor.write_table(lote.cast(self.escritor.schema))
+
+    def cerrar(self, resumen=None):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+class _EscritorXlsx:
+    """Libro en modo write-only de openpyxl: las filas se vuelcan a disco al añadirse. Los
+    resultados pasan a una hoja nueva al llenarse la anterior y, al cerrar, se añade una hoja
+    'Resumen' con los datos del proceso."""
+
+    def __init__(self, destino):
+        from openpyxl import Workbook
+        self.destino = destino
+        self.libro = Workbook(write_only=True)
+        self.hoja = None
+        self.n_hojas = 0
+        self.filas_hoja = 0
+        self.cabecera = None
+
+    def _nueva_hoja(self):
+        self.n_hojas += 1
+        self.hoja = self.libro.create_sheet("Resultados" if self.n_hojas == 1 else f"Resultados_{self.n_hojas}")
+        self.hoja.append(self.cabecera)
+        self.filas_hoja = 1
+
+    def escribir(self, tabla):
+        if self.cabecera is None:
+            self.cabecera = [str(columna) for columna in tabla.columns]
+        for fila in tabla.itertuples(index=False, name=None):
+            if self.hoja is None or self.filas_hoja >= MAX_FILAS_HOJA_XLSX:
+                self._nueva_hoja()
+            self.hoja.append(fila)
+            self.filas_hoja += 1
+
+    def cerrar(self, resumen=None):
+        if resumen:
+            hoja_resumen = self.libro.create_sheet("Resumen")
+            for clave, valor in resumen.items():
+                hoja_resumen.append([clave, valor])
+        if not self.libro.worksheets:
+            self.libro.create_sheet("Resultados")
+        self.libro.save(self.destino)
+
+
+def abrir_escritor(destino, formato=None):
+    """Escritor incremental con métodos escribir(DataFrame) y cerrar(resumen=None)."""
+    formato = deducir_formato(destino, formato)
+    escritores = {'csv': _EscritorCsv, 'parquet': _EscritorParquet, 'xlsx': _EscritorXlsx}
+    if formato not in escritores:
+        raise ValueError(f"Formato de escritura no soportado: '{formato}' (use {', '.join(FORMATOS_ESCRITURA)})")
+    return escritores[formato](destino)
@@ -0,0 +1,112 @@
+# balance_biogas/informes.py
+# Exportación masiva de informes por escenario (PDF y/o Excel) a un ZIP escrito en flujo.
+# Los escenarios se reparten en tareas de varios informes que se renderizan en procesos de
+# trabajo; el proceso principal solo escribe en el ZIP, en orden, y mantiene como mucho
+# 2 tareas por proceso en vuelo, así que la memoria no depende del número de escenarios.
+import re
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from balance_biogas.calculos import MODELOS_CINETICOS, TECNOLOGIAS_UPGRADING, calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.exportacion import generar_excel_bytes, generar_pdf_bytes
+from balance_biogas.instrumentacion import contar, medir
+
+FORMATOS_INFORME = {'pdf': generar_pdf_bytes, 'xlsx': generar_excel_bytes}
+INFORMES_POR_TAREA = 32
+
+# Textos por defecto de los escenarios que solo traen los valores numéricos (los de la interfaz).
+USOS_BIOGAS = ("Cogeneración (CHP)", "Caldera", "Upgrading a Biometano")
+VALORES_POR_DEFECTO = {'cp_sustrato_kj_kg_c': 4.186, 'densidad_sustrato_kg_m3': 1000.0}
+
+
+def nombre_fichero(texto):
+    """Texto apto como nombre de fichero dentro del ZIP."""
+    return re.sub(r'[^\w.-]+', '_', str(texto)).strip('_') or "informe"
+
+
+def preparar_escenario(entradas):
+    """Entradas completas, resultados y dimensiones de un escenario con las funciones escalares.
+    Si no trae el área del digestor se calcula a partir del caudal y el TRH."""
+    entradas = dict(VALORES_POR_DEFECTO, **entradas)
+    dim_digestor = calcular_dimensiones_digestor(entradas['caudal_sustrato_kg_dia'], entradas['trh_dias'], entradas['densidad_sustrato_kg_m3'])
+    entradas.setdefault('area_superficial_digestor_m2', dim_digestor['area_superficial_digestor_m2'])
+    uso = int(entradas['uso_biogas_opcion_idx'])
+    entradas.setdefault('uso_biogas_texto', USOS_BIOGAS[uso] if 0 <= uso < len(USOS_BIOGAS) else 'N/A')
+    tecnologia = int(entradas.get('upgrading_tecnologia_idx', 0))
+    entradas.setdefault('upgrading_tecnologia_texto', TECNOLOGIAS_UPGRADING[tecnologia][0] if 0 <= tecnologia < len(TECNOLOGIAS_UPGRADING) else 'N/A')
+    modelo = int(entradas.get('modelo_cinetico_idx', 0))
+    entradas.setdefault('modelo_cinetico_texto', MODELOS_CINETICOS[modelo] if 0 <= modelo < len(MODELOS_CINETICOS) else 'N/A')
+    return entradas, realizar_calculos_balance(entradas), dim_digestor
+
+
+def renderizar_tarea(escenarios, project_info, formatos):
+    """Renderiza una tarea: lista de (identificador, entradas) -> lista de (nombre en el ZIP, bytes)."""
+    informes = []
+    for identificador, entradas in escenarios:
+        entradas, results, dim_digestor = preparar_escenario(entradas)
+        info = dict(project_info, nombre=f"{project_info['nombre']} - {identificador}")
+        base = nombre_fichero(identificador)
+        for formato in formatos:
+            contenido = FORMATOS_INFORME[formato](entradas, results, dim_digestor, info)
+            if contenido is None:
+                raise ImportError(f"Falta la librería para exportar en formato '{formato}'")
+            informes.append((f"{base}.{formato}", contenido))
+    return informes
+
+
+def _tareas(escenarios, informes_por_tarea):
+    """Agrupa los escenarios en tareas. Cada escenario es un dict de entradas (se identifica con
+    'nombre_escenario' si lo trae o con su número de orden) o un par (identificador, entradas)."""
+    numerados = (
+        escenario if isinstance(escenario, tuple) else (escenario.get('nombre_escenario', f"escenario_{i:06d}"), escenario)
+        for i, escenario in enumerate(escenarios, start=1)
+    )
+    while tarea := list(islice(numerados, informes_por_tarea)):
+        yield tarea
+
+
+def generar_informes(escenarios, project_info, formatos=('pdf', 'xlsx'), procesos=1, informes_por_tarea=INFORMES_POR_TAREA):
+    """Genera (nombre, bytes) de los informes de cada escenario, en el orden de entrada."""
+    formatos = tuple(formatos)
+    desconocidos = [formato for formato in formatos if formato not in FORMATOS_INFORME]
+    if desconocidos:
+        raise ValueError(f"Formato de informe no soportado: {', '.join(desconocidos)} (use {', '.join(FORMATOS_INFORME)})")
+    if procesos <= 1:
+        for tarea in _tareas(escenarios, informes_por_tarea):
+            yield from renderizar_tarea(tarea, project_info, formatos)
+        return
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for tarea in _tareas(escenarios, informes_por_tarea):
+            pendientes.append(pool.submit(renderizar_tarea, tarea, project_info, formatos))
+            if len(pendientes) >= 2 * procesos:
+                yield from pendientes.popleft().result()
+        while pendientes:
+            yield from pendientes.popleft().result()
+
+
+@medir("informes.zip")
+def exportar_informes_zip(escenarios, destino, project_info, formatos=('pdf', 'xlsx'), procesos=1,
+                          informes_por_tarea=INFORMES_POR_TAREA):
+    """Escribe los informes de todos los escenarios en un ZIP (ruta o fichero abierto en binario,
+    también no posicionable, p. ej. una respuesta HTTP). Los PDF ya van comprimidos y los XLSX son
+    ZIP, así que se almacenan sin volver a comprimir. Devuelve un resumen del proceso."""
+    t0 = time.perf_counter()
+    n_informes = n_bytes = 0
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_STORED) as archivo:
+        for nombre, contenido in generar_informes(escenarios, project_info, formatos, procesos, informes_por_tarea):
+            archivo.writestr(nombre, contenido)
+            contar("informes_zip", formato=nombre.rsplit('.', 1)[-1])
+            n_informes += 1
+            n_bytes += len(contenido)
+    segundos = time.perf_counter() - t0
+    return {
+        'informes': n_informes,
+        'bytes': n_bytes,
+        'segundos': round(segundos, 3),
+        'informes_por_segundo': round(n_informes / segundos, 1) if segundos > 0 else 0.0,
+        'procesos': procesos,
+    }
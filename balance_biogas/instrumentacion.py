@@ -0,0 +1,226 @@
+# balance_biogas/instrumentacion.py
+# Tramos de tiempo y contadores para saber dónde se va el tiempo (interfaz, cálculo, exportación,
+# CLI y servicio). Desactivada por defecto: con la instrumentación apagada, tramo() devuelve un
+# contexto nulo compartido y medir()/contar() salen tras comprobar un booleano del módulo.
+#
+# - Agregados del proceso (número, tiempo total y máximo por tramo; contadores con etiquetas),
+#   exportables en formato de texto de Prometheus o como líneas JSON.
+# - Traza por hilo (una por ejecución del script de Streamlit): lista de tramos con su
+#   profundidad de anidamiento y contadores de esa ejecución, para el panel de desarrollo.
+#
+# Se activa con activar(), o con la variable de entorno BALANCE_BIOGAS_METRICAS=1. Los procesos de
+# trabajo (exportación masiva, CLI con --procesos) llevan sus propios agregados, que no se suman a
+# los del proceso principal.
+import functools
+import json
+import os
+import threading
+import time
+
+PREFIJO_METRICAS = "balance_biogas"
+MAX_EVENTOS_TRAZA = 10000
+
+ACTIVA_POR_ENTORNO = os.environ.get("BALANCE_BIOGAS_METRICAS", "") not in ("", "0")
+
+_activa = ACTIVA_POR_ENTORNO
+_bloqueo = threading.Lock()
+_tramos = {}
+_contadores = {}
+_local = threading.local()
+
+
+def activar(activa=True):
+    global _activa
+    _activa = bool(activa)
+
+
+def activa():
+    return _activa
+
+
+def reiniciar():
+    """Borra los agregados del proceso (no las trazas de los hilos)."""
+    with _bloqueo:
+        _tramos.clear()
+        _contadores.clear()
+
+
+# --- TRAZAS POR HILO ---
+class Traza:
+    """Tramos (nombre, inicio, duración en s, profundidad) y contadores de una ejecución."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.eventos = []
+        self.contadores = {}
+
+
+def nueva_traza():
+    """Empieza una traza en el hilo actual (p. ej. al comienzo de cada ejecución del script)."""
+    _local.traza = Traza()
+    _local.profundidad = 0
+    _local.etapa = None
+    return _local.traza
+
+
+def traza_actual():
+    return getattr(_local, 'traza', None)
+
+
+def _registrar(nombre, inicio, duracion, profundidad):
+    with _bloqueo:
+        estadistica = _tramos.get(nombre)
+        if estadistica is None:
+            _tramos[nombre] = [1, duracion, duracion]
+        else:
+            estadistica[0] += 1
+            estadistica[1] += duracion
+            if duracion > estadistica[2]:
+                estadistica[2] = duracion
+    traza = getattr(_local, 'traza', None)
+    if traza is not None and len(traza.eventos) < MAX_EVENTOS_TRAZA:
+        traza.eventos.append((nombre, inicio, duracion, profundidad))
+
+
+# --- TRAMOS Y CONTADORES ---
+class _TramoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+_TRAMO_NULO = _TramoNulo()
+
+
+class _Tramo:
+    __slots__ = ('nombre', 'inicio', 'profundidad')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.profundidad = getattr(_local, 'profundidad', 0)
+        _local.profundidad = self.profundidad + 1
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        duracion = time.perf_counter() - self.inicio
+        _local.profundidad = self.profundidad
+        _registrar(self.nombre, self.inicio, duracion, self.profundidad)
+        return False
+
+
+def tramo(nombre):
+    """Contexto que mide el bloque como el tramo 'nombre' (anidable)."""
+    if not _activa:
+        return _TRAMO_NULO
+    return _Tramo(nombre)
+
+
+def medir(nombre):
+    """Decorador: cada llamada a la función es un tramo 'nombre'."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activa:
+                return funcion(*args, **kwargs)
+            with _Tramo(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def observar(nombre, segundos):
+    """Registra como tramo 'nombre' una duración ya medida: para código asíncrono, donde varias
+    corrutinas se intercalan en el mismo hilo y el anidamiento de tramo() no tendría sentido."""
+    if _activa:
+        _registrar(nombre, time.perf_counter() - segundos, segundos, 0)
+
+
+def etapa(nombre=None):
+    """Cierra la etapa abierta en el hilo y, si se da nombre, abre otra: tramos consecutivos
+    sin anidar el código en bloques with (p. ej. las secciones del script de Streamlit)."""
+    anterior = getattr(_local, 'etapa', None)
+    if anterior is not None:
+        _local.etapa = None
+        anterior.__exit__(None, None, None)
+    if nombre is not None and _activa:
+        _local.etapa = _Tramo(nombre)
+        _local.etapa.__enter__()
+
+
+def contar(nombre, valor=1, **etiquetas):
+    """Suma valor al contador 'nombre' con las etiquetas dadas (p. ej. formato='pdf')."""
+    if not _activa:
+        return
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    with _bloqueo:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+    traza = getattr(_local, 'traza', None)
+    if traza is not None:
+        traza.contadores[clave] = traza.contadores.get(clave, 0) + valor
+
+
+# --- EXPORTACIÓN ---
+def instantanea():
+    """Copia de los agregados: {'tramos': {nombre: {n, total_s, max_s}}, 'contadores': [...]}."""
+    with _bloqueo:
+        tramos = {nombre: {'n': n, 'total_s': total, 'max_s': maximo} for nombre, (n, total, maximo) in sorted(_tramos.items())}
+        contadores = [{'nombre': nombre, 'etiquetas': dict(etiquetas), 'valor': valor}
+                      for (nombre, etiquetas), valor in sorted(_contadores.items())]
+    return {'tramos': tramos, 'contadores': contadores}
+
+
+def _etiquetas_prometheus(etiquetas):
+    if not etiquetas:
+        return ""
+    texto = ",".join('{}="{}"'.format(clave, str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                     for clave, valor in etiquetas.items())
+    return "{" + texto + "}"
+
+
+def texto_prometheus(prefijo=PREFIJO_METRICAS):
+    """Agregados en el formato de texto de exposición de Prometheus."""
+    datos = instantanea()
+    lineas = [f"# HELP {prefijo}_tramo_segundos Tiempo en cada tramo instrumentado.",
+              f"# TYPE {prefijo}_tramo_segundos summary"]
+    for nombre, estadistica in datos['tramos'].items():
+        etiquetas = _etiquetas_prometheus({'tramo': nombre})
+        lineas.append(f"{prefijo}_tramo_segundos_count{etiquetas} {estadistica['n']}")
+        lineas.append(f"{prefijo}_tramo_segundos_sum{etiquetas} {estadistica['total_s']!r}")
+    lineas += [f"# HELP {prefijo}_tramo_segundos_max Duración máxima de cada tramo instrumentado.",
+               f"# TYPE {prefijo}_tramo_segundos_max gauge"]
+    for nombre, estadistica in datos['tramos'].items():
+        lineas.append(f"{prefijo}_tramo_segundos_max{_etiquetas_prometheus({'tramo': nombre})} {estadistica['max_s']!r}")
+    nombres_contadores = []
+    for contador in datos['contadores']:
+        if contador['nombre'] not in nombres_contadores:
+            nombres_contadores.append(contador['nombre'])
+    for nombre in nombres_contadores:
+        lineas.append(f"# TYPE {prefijo}_{nombre}_total counter")
+        lineas += [f"{prefijo}_{nombre}_total{_etiquetas_prometheus(contador['etiquetas'])} {contador['valor']}"
+                   for contador in datos['contadores'] if contador['nombre'] == nombre]
+    return "\n".join(lineas) + "\n"
+
+
+def linea_json():
+    """Agregados como una línea JSON con marca de tiempo (para ficheros .jsonl)."""
+    return json.dumps(dict(instantanea(), marca_tiempo=time.time()), ensure_ascii=False) + "\n"
+
+
+def exportar(ruta):
+    """Escribe los agregados en ruta: formato Prometheus si termina en .prom (se sobrescribe,
+    como espera el recolector de ficheros de texto de node_exporter); si no, añade una línea JSON."""
+    if str(ruta).endswith(".prom"):
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as fichero:
+            fichero.write(texto_prometheus())
+        os.replace(temporal, ruta)
+    else:
+        with open(ruta, "a", encoding="utf-8") as fichero:
+            fichero.write(linea_json())
@@ -0,0 +1,223 @@
+# balance_biogas/lote.py
+# Motor vectorizado: evalúa miles de escenarios a la vez sobre arrays columnares.
+# Reproduce operación a operación (mismo orden de cálculo) las funciones escalares
+# de calculos.py, de modo que los resultados coinciden bit a bit con el camino escalar.
+import math
+
+import numpy as np
+
+from balance_biogas.calculos import (
+    CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO, CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA, EFICIENCIA_COMPRESOR, KAPPA_BIOMETANO,
+    MODELOS_CINETICOS, PRESION_INYECCION_RED_POR_DEFECTO_BAR, PRESION_NORMAL_PA, TECNOLOGIAS_UPGRADING,
+    TEMP_REFERENCIA_CINETICA_C, THETA_TEMPERATURA_HIDROLISIS,
+)
+from balance_biogas.instrumentacion import contar, medir
+
+# Claves de entrada leídas por realizar_calculos_balance (las opcionales valen 0 si faltan,
+# igual que los .get(..., 0) del camino escalar).
+CLAVES_BALANCE_OBLIGATORIAS = (
+    'caudal_sustrato_kg_dia', 'st_porcentaje', 'sv_de_st_porcentaje', 'bmp_nm3_ch4_kg_sv',
+    'eficiencia_digestion_porcentaje', 'ch4_en_biogas_porcentaje', 'cp_sustrato_kj_kg_c',
+    'temp_op_digestor_c', 'temp_sustrato_entrada_c', 'u_digestor_w_m2_k',
+    'area_superficial_digestor_m2', 'temp_ambiente_promedio_c', 'uso_biogas_opcion_idx',
+    'consumo_electrico_aux_kwh_ton_sustrato',
+)
+CLAVES_BALANCE_OPCIONALES = (
+    'chp_eficiencia_electrica_porcentaje', 'chp_eficiencia_termica_porcentaje',
+    'caldera_eficiencia_porcentaje', 'upgrading_tecnologia_idx', 'presion_inyeccion_red_bar',
+    'modelo_cinetico_idx', 'trh_dias', 'constante_hidrolisis_1_dia', 'constante_chen_hashimoto', 'n_etapas_digestor',
+)
+# Opcionales cuyo valor por defecto no es 0 (los mismos que en el camino escalar).
+VALORES_BALANCE_POR_DEFECTO = {
+    'presion_inyeccion_red_bar': PRESION_INYECCION_RED_POR_DEFECTO_BAR,
+    'constante_hidrolisis_1_dia': CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA,
+    'constante_chen_hashimoto': CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO,
+    'n_etapas_digestor': 1.0,
+}
+
+# Columnas de TECNOLOGIAS_UPGRADING sin el nombre: pérdida de CH₄, consumo eléctrico, calor,
+# pureza y presión de salida, una fila por tecnología.
+_DATOS_UPGRADING = np.array([tecnologia[1:] for tecnologia in TECNOLOGIAS_UPGRADING], dtype=float)
+
+PCI_CH4_MJ_NM3 = 35.8
+
+
+def _columnas(entradas, claves_obligatorias, claves_opcionales=(), valores_por_defecto=None):
+    """Extrae las columnas pedidas de un dict de arrays, DataFrame o array estructurado
+    y las difunde (broadcast) a una forma común. Las opcionales ausentes valen 0 salvo que
+    valores_por_defecto indique otro valor."""
+    valores_por_defecto = valores_por_defecto or {}
+    nombres_disponibles = entradas.dtype.names if isinstance(entradas, np.ndarray) else entradas
+    columnas = []
+    for clave in claves_obligatorias:
+        if clave not in nombres_disponibles:
+            raise KeyError(clave)
+        columnas.append(np.asarray(entradas[clave], dtype=float))
+    for clave in claves_opcionales:
+        if clave in nombres_disponibles:
+            columnas.append(np.asarray(entradas[clave], dtype=float))
+        else:
+            columnas.append(np.asarray(float(valores_por_defecto.get(clave, 0.0))))
+    columnas = np.broadcast_arrays(*columnas)
+    return dict(zip(tuple(claves_obligatorias) + tuple(claves_opcionales), columnas))
+
+
+def calcular_dimensiones_digestor_lote(caudal_sustrato_kg_dia, trh_dias, densidad_sustrato_kg_m3=1000):
+    caudal_sustrato_kg_dia, trh_dias, densidad_sustrato_kg_m3 = np.broadcast_arrays(
+        np.asarray(caudal_sustrato_kg_dia, dtype=float), np.asarray(trh_dias, dtype=float),
+        np.asarray(densidad_sustrato_kg_m3, dtype=float))
+    volumen_sustrato_diario_m3 = caudal_sustrato_kg_dia / densidad_sustrato_kg_m3
+    volumen_digestor_m3 = volumen_sustrato_diario_m3 * trh_dias
+    con_volumen = volumen_digestor_m3 > 0
+    diametro_digestor_m = np.zeros(volumen_digestor_m3.shape)
+    # float_power usa el pow() de libm, igual que el operador ** de Python; np.power usa
+    # rutinas SIMD que pueden diferir en el último bit.
+    np.float_power(4 * volumen_digestor_m3 / math.pi, 1/3, out=diametro_digestor_m, where=con_volumen)
+    area_superficial_digestor_m2 = np.where(con_volumen, 1.5 * math.pi * np.float_power(diametro_digestor_m, 2), 0.0)
+    return {
+        "volumen_digestor_m3": volumen_digestor_m3,
+        "diametro_digestor_m": diametro_digestor_m,
+        "altura_digestor_m": diametro_digestor_m.copy(),
+        "area_superficial_digestor_m2": area_superficial_digestor_m2
+    }
+
+
+@medir("lote.balance")
+def realizar_calculos_balance_lote(entradas):
+    """Versión columnar de realizar_calculos_balance: cada clave de entrada es un array
+    (o un escalar que se difunde) y cada clave de resultado es un array del mismo tamaño."""
+    e = _columnas(entradas, CLAVES_BALANCE_OBLIGATORIAS, CLAVES_BALANCE_OPCIONALES, VALORES_BALANCE_POR_DEFECTO)
+    caudal_sustrato_kg_dia = e['caudal_sustrato_kg_dia']
+    ch4_en_biogas_porcentaje = e['ch4_en_biogas_porcentaje']
+    temp_op_digestor_c = e['temp_op_digestor_c']
+    area_superficial_digestor_m2 = e['area_superficial_digestor_m2']
+    uso_biogas_opcion_idx = e['uso_biogas_opcion_idx']
+    forma = caudal_sustrato_kg_dia.shape
+    results = {}
+
+    results['sv_alimentado_kg_dia'] = caudal_sustrato_kg_dia * (e['st_porcentaje'] / 100) * (e['sv_de_st_porcentaje'] / 100)
+    results['eficiencia_digestion_efectiva_porcentaje'] = e['eficiencia_digestion_porcentaje']
+    es_cinetico = e['modelo_cinetico_idx'] != 0
+    if np.any(es_cinetico):
+        nombres_disponibles = entradas.dtype.names if isinstance(entradas, np.ndarray) else entradas
+        if 'trh_dias' not in nombres_disponibles:
+            raise KeyError('trh_dias')
+        results['eficiencia_digestion_efectiva_porcentaje'] = np.where(
+            es_cinetico, 100 * fraccion_degradada_cinetica_lote(
+                e['modelo_cinetico_idx'], e['trh_dias'], temp_op_digestor_c, e['constante_hidrolisis_1_dia'],
+                e['constante_chen_hashimoto'], e['n_etapas_digestor'], es_cinetico),
+            e['eficiencia_digestion_porcentaje'])
+    results['ch4_producido_nm3_dia'] = results['sv_alimentado_kg_dia'] * e['bmp_nm3_ch4_kg_sv'] * (results['eficiencia_digestion_efectiva_porcentaje'] / 100)
+    results['biogas_producido_nm3_dia'] = np.zeros(forma)
+    np.divide(results['ch4_producido_nm3_dia'], ch4_en_biogas_porcentaje / 100,
+              out=results['biogas_producido_nm3_dia'], where=ch4_en_biogas_porcentaje > 0)
+    results['pci_biogas_mj_nm3'] = PCI_CH4_MJ_NM3 * (ch4_en_biogas_porcentaje / 100)
+    results['energia_bruta_biogas_mj_dia'] = results['biogas_producido_nm3_dia'] * results['pci_biogas_mj_nm3']
+    results['energia_bruta_biogas_kwh_dia'] = results['energia_bruta_biogas_mj_dia'] / 3.6
+    results['calor_calentar_sustrato_mj_dia'] = (caudal_sustrato_kg_dia * e['cp_sustrato_kj_kg_c'] * (temp_op_digestor_c - e['temp_sustrato_entrada_c'])) / 1000
+    delta_t_digestor_ambiente = temp_op_digestor_c - e['temp_ambiente_promedio_c']
+    con_perdidas = (delta_t_digestor_ambiente > 0) & (area_superficial_digestor_m2 > 0)
+    results['perdidas_calor_digestor_mj_dia'] = np.where(
+        con_perdidas, (e['u_digestor_w_m2_k'] * area_superficial_digestor_m2 * delta_t_digestor_ambiente * 3600 * 24) / 1000000, 0.0)
+    results['demanda_termica_total_digestor_mj_dia'] = results['calor_calentar_sustrato_mj_dia'] + results['perdidas_calor_digestor_mj_dia']
+    results['demanda_termica_total_digestor_kwh_dia'] = results['demanda_termica_total_digestor_mj_dia'] / 3.6
+    es_chp = uso_biogas_opcion_idx == 0
+    es_caldera = uso_biogas_opcion_idx == 1
+    results['electricidad_generada_bruta_kwh_dia'] = np.where(
+        es_chp, results['energia_bruta_biogas_kwh_dia'] * (e['chp_eficiencia_electrica_porcentaje'] / 100), 0.0)
+    results['calor_util_generado_mj_dia'] = np.where(
+        es_chp, results['energia_bruta_biogas_mj_dia'] * (e['chp_eficiencia_termica_porcentaje'] / 100),
+        np.where(es_caldera, results['energia_bruta_biogas_mj_dia'] * (e['caldera_eficiencia_porcentaje'] / 100), 0.0))
+    results.update(_upgrading_lote(e, results, uso_biogas_opcion_idx == 2))
+    results['consumo_electrico_aux_total_kwh_dia'] = (caudal_sustrato_kg_dia / 1000) * e['consumo_electrico_aux_kwh_ton_sustrato']
+    results['electricidad_neta_exportable_kwh_dia'] = (results['electricidad_generada_bruta_kwh_dia'] - results['consumo_electrico_aux_total_kwh_dia']
+                                                       - results['consumo_electrico_upgrading_kwh_dia'] - results['consumo_electrico_compresion_kwh_dia'])
+    results['calor_neto_disponible_mj_dia'] = (results['calor_util_generado_mj_dia'] - results['demanda_termica_total_digestor_mj_dia']
+                                               - results['demanda_calor_upgrading_mj_dia'])
+    results['calor_neto_disponible_kwh_dia'] = results['calor_neto_disponible_mj_dia'] / 3.6
+    return results
+
+
+def fraccion_degradada_cinetica_lote(modelo_cinetico_idx, trh_dias, temp_op_digestor_c,
+                                     constante_hidrolisis_1_dia=CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA,
+                                     constante_chen_hashimoto=CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO, n_etapas_digestor=1,
+                                     validar=True):
+    """Versión vectorizada de fraccion_degradada_cinetica. validar indica (array booleano o
+    True para todos) los escenarios cuyo modelo y número de etapas deben ser válidos."""
+    modelo_cinetico_idx, trh_dias, temp_op_digestor_c, constante_hidrolisis_1_dia, constante_chen_hashimoto, n_etapas_digestor = (
+        np.broadcast_arrays(*(np.asarray(valor, dtype=float) for valor in (
+            modelo_cinetico_idx, trh_dias, temp_op_digestor_c, constante_hidrolisis_1_dia, constante_chen_hashimoto, n_etapas_digestor))))
+    modelo_valido = ((modelo_cinetico_idx == np.floor(modelo_cinetico_idx)) & (modelo_cinetico_idx >= 1)
+                     & (modelo_cinetico_idx < len(MODELOS_CINETICOS)))
+    if np.any(validar & ~modelo_valido):
+        raise ValueError(f"Modelo cinético no válido: {modelo_cinetico_idx[validar & ~modelo_valido].flat[0]}")
+    etapas_validas = (n_etapas_digestor == np.floor(n_etapas_digestor)) & (n_etapas_digestor >= 1) & (n_etapas_digestor < 1000)
+    if np.any(validar & ~etapas_validas):
+        raise ValueError(f"Número de etapas del digestor no válido: {n_etapas_digestor[validar & ~etapas_validas].flat[0]}")
+    n_etapas_digestor = np.where(etapas_validas, n_etapas_digestor, 1.0)
+    trh_etapa_dias = trh_dias / n_etapas_digestor
+    k_1_dia = constante_hidrolisis_1_dia * np.float_power(THETA_TEMPERATURA_HIDROLISIS, temp_op_digestor_c - TEMP_REFERENCIA_CINETICA_C)
+    primer_orden = 1 - np.float_power(1 + k_1_dia * trh_etapa_dias, -n_etapas_digestor)
+    mu_max_1_dia = 0.013 * temp_op_digestor_c - 0.129
+    sin_lavado = mu_max_1_dia * trh_etapa_dias > 1
+    # Fuera de sin_lavado el cociente puede no estar definido: se deja la fracción residual en 1.
+    residual = np.ones(primer_orden.shape)
+    np.divide(constante_chen_hashimoto, mu_max_1_dia * trh_etapa_dias - 1 + constante_chen_hashimoto, out=residual, where=sin_lavado)
+    chen_hashimoto = 1 - np.float_power(residual, n_etapas_digestor)
+    return np.where(modelo_cinetico_idx == 1, primer_orden, chen_hashimoto)
+
+
+def _upgrading_lote(e, results, es_upgrading):
+    """Rama de upgrading a biometano de realizar_calculos_balance_lote (ceros fuera de ella)."""
+    tecnologia = e['upgrading_tecnologia_idx']
+    valida = (tecnologia == np.floor(tecnologia)) & (tecnologia >= 0) & (tecnologia < len(TECNOLOGIAS_UPGRADING))
+    if np.any(es_upgrading & ~valida):
+        raise ValueError(f"Tecnología de upgrading no válida: {tecnologia[es_upgrading & ~valida].flat[0]}")
+    perdida_ch4_porcentaje, consumo_kwh_nm3, calor_kwh_nm3, pureza_porcentaje, presion_salida_bar = np.moveaxis(
+        _DATOS_UPGRADING[np.where(valida, tecnologia, 0).astype(int)], -1, 0)
+    ch4_perdido_nm3_dia = results['ch4_producido_nm3_dia'] * (perdida_ch4_porcentaje / 100)
+    ch4_biometano_nm3_dia = results['ch4_producido_nm3_dia'] - ch4_perdido_nm3_dia
+    biometano_nm3_dia = ch4_biometano_nm3_dia / (pureza_porcentaje / 100)
+    exponente = (KAPPA_BIOMETANO - 1) / KAPPA_BIOMETANO
+    trabajo_compresion_kwh_nm3 = (PRESION_NORMAL_PA * (np.float_power(e['presion_inyeccion_red_bar'] / presion_salida_bar, exponente) - 1)
+                                  / exponente / EFICIENCIA_COMPRESOR / 3600000)
+    upgrading = {
+        'recuperacion_ch4_porcentaje': np.where(es_upgrading, 100 - perdida_ch4_porcentaje, 0.0),
+        'ch4_perdido_upgrading_nm3_dia': np.where(es_upgrading, ch4_perdido_nm3_dia, 0.0),
+        'biometano_producido_nm3_dia': np.where(es_upgrading, biometano_nm3_dia, 0.0),
+        'energia_biometano_mj_dia': np.where(es_upgrading, ch4_biometano_nm3_dia * PCI_CH4_MJ_NM3, 0.0),
+        'consumo_electrico_upgrading_kwh_dia': np.where(es_upgrading, results['biogas_producido_nm3_dia'] * consumo_kwh_nm3, 0.0),
+        'consumo_electrico_compresion_kwh_dia': np.where(
+            es_upgrading & (e['presion_inyeccion_red_bar'] > presion_salida_bar), biometano_nm3_dia * trabajo_compresion_kwh_nm3, 0.0),
+        'demanda_calor_upgrading_mj_dia': np.where(es_upgrading, results['biogas_producido_nm3_dia'] * calor_kwh_nm3 * 3.6, 0.0),
+    }
+    upgrading['energia_biometano_kwh_dia'] = upgrading['energia_biometano_mj_dia'] / 3.6
+    return upgrading
+
+
+@medir("lote.escenarios")
+def calcular_escenarios_lote(entradas):
+    """Dimensiona el digestor y calcula el balance para un lote de escenarios.
+
+    Requiere 'trh_dias' además de las entradas del balance; 'densidad_sustrato_kg_m3' es
+    opcional (1000 por defecto). El área superficial se toma de las dimensiones calculadas,
+    como hace la interfaz, salvo que venga explícitamente en las entradas.
+    """
+    nombres_disponibles = entradas.dtype.names if isinstance(entradas, np.ndarray) else entradas
+    densidad = entradas['densidad_sustrato_kg_m3'] if 'densidad_sustrato_kg_m3' in nombres_disponibles else 1000
+    dim_digestor = calcular_dimensiones_digestor_lote(entradas['caudal_sustrato_kg_dia'], entradas['trh_dias'], densidad)
+    entradas_balance = {clave: entradas[clave] for clave in CLAVES_BALANCE_OBLIGATORIAS + CLAVES_BALANCE_OPCIONALES
+                        if clave in nombres_disponibles}
+    entradas_balance.setdefault('area_superficial_digestor_m2', dim_digestor['area_superficial_digestor_m2'])
+    results = realizar_calculos_balance_lote(entradas_balance)
+    results.update(dim_digestor)
+    contar("escenarios_evaluados", results['volumen_digestor_m3'].size)
+    return results
+
+
+def comparar_tecnologias_upgrading(entradas):
+    """Balance de un escenario con cada tecnología de TECNOLOGIAS_UPGRADING, en una sola llamada
+    al motor vectorizado: {clave: array con un valor por tecnología}. Los textos se ignoran."""
+    return realizar_calculos_balance_lote(dict(
+        {clave: valor for clave, valor in entradas.items() if not isinstance(valor, str)},
+        upgrading_tecnologia_idx=np.arange(len(TECNOLOGIAS_UPGRADING))))
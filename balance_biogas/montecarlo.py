@@ -0,0 +1,181 @@
+# balance_biogas/montecarlo.py
+# Análisis de incertidumbre por Monte Carlo sobre el motor vectorizado. Las muestras se generan
+# y evalúan por bloques, y los percentiles se estiman con un histograma en flujo (streaming) de
+# tamaño fijo, por lo que la memoria no crece con el número de muestras.
+import numpy as np
+
+from balance_biogas.barrido import SALIDAS_PRINCIPALES, TAMANO_BLOQUE, _entradas_base, _validar_parametros
+from balance_biogas.instrumentacion import medir
+from balance_biogas.lote import calcular_escenarios_lote
+
+# Distribuciones admitidas y sus parámetros:
+#   ('normal', media, desviacion[, minimo, maximo])  -> los límites opcionales recortan la muestra
+#   ('triangular', minimo, moda, maximo)
+#   ('uniforme', minimo, maximo)
+DISTRIBUCIONES = ('normal', 'triangular', 'uniforme')
+
+PERCENTILES = (10, 50, 90)
+N_CLASES_HISTOGRAMA = 4096
+
+
+class _HistogramaStreaming:
+    """Histograma de clases de igual ancho que duplica su ancho (fusionando clases contiguas)
+    cuando llegan valores fuera de rango. Error de los percentiles: como mucho un ancho de clase."""
+
+    def __init__(self, n_clases=N_CLASES_HISTOGRAMA):
+        self.n_clases = n_clases
+        self.conteos = np.zeros(n_clases, dtype=np.int64)
+        self.origen = None
+        self.ancho = None
+        self.n = 0
+        self.suma = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def _ampliar(self, hacia_abajo):
+        fusionados = self.conteos.reshape(-1, 2).sum(axis=1)
+        self.conteos = np.zeros(self.n_clases, dtype=np.int64)
+        if hacia_abajo:
+            self.conteos[self.n_clases // 2:] = fusionados
+            self.origen -= self.ancho * self.n_clases
+        else:
+            self.conteos[:self.n_clases // 2] = fusionados
+        self.ancho *= 2
+
+    def agregar(self, valores):
+        valores = valores[np.isfinite(valores)]
+        if not valores.size:
+            return
+        minimo, maximo = float(valores.min()), float(valores.max())
+        if self.origen is None:
+            self.origen = minimo
+            self.ancho = max(maximo - minimo, abs(minimo) * 1e-9, 1e-12) / self.n_clases * 1.0001
+        while minimo < self.origen:
+            self._ampliar(hacia_abajo=True)
+        while maximo >= self.origen + self.ancho * self.n_clases:
+            self._ampliar(hacia_abajo=False)
+        clases = np.minimum(((valores - self.origen) / self.ancho).astype(np.int64), self.n_clases - 1)
+        self.conteos += np.bincount(clases, minlength=self.n_clases)
+        self.n += valores.size
+        self.suma += float(valores.sum())
+        self.minimo = min(self.minimo, minimo)
+        self.maximo = max(self.maximo, maximo)
+
+    def percentil(self, q):
+        if not self.n:
+            return float('nan')
+        acumulado = np.cumsum(self.conteos)
+        objetivo = q / 100 * self.n
+        clase = int(np.searchsorted(acumulado, objetivo))
+        previos = acumulado[clase - 1] if clase > 0 else 0
+        fraccion = (objetivo - previos) / self.conteos[clase] if self.conteos[clase] else 0.0
+        valor = self.origen + (clase + fraccion) * self.ancho
+        return float(min(max(valor, self.minimo), self.maximo))
+
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, float) and np.isnan(valor))
+
+
+def construir_distribucion(tipo, minimo=None, mas_probable=0.0, maximo=None, desviacion=0.0):
+    """Distribución de simular_montecarlo a partir de los campos de una fila de tabla (None o NaN
+    es un campo vacío): la normal usa mas_probable como media y solo se recorta a los límites
+    dados (un lado vacío queda abierto); triangular y uniforme necesitan mínimo y máximo."""
+    if tipo == 'normal':
+        if _vacio(minimo) and _vacio(maximo):
+            return (tipo, mas_probable, desviacion)
+        return (tipo, mas_probable, desviacion, -np.inf if _vacio(minimo) else minimo, np.inf if _vacio(maximo) else maximo)
+    if tipo in ('triangular', 'uniforme') and (_vacio(minimo) or _vacio(maximo)):
+        raise ValueError(f"La distribución {tipo} necesita mínimo y máximo")
+    if tipo == 'triangular':
+        return (tipo, minimo, mas_probable, maximo)
+    if tipo == 'uniforme':
+        return (tipo, minimo, maximo)
+    raise ValueError(f"Distribución no soportada: '{tipo}' (use {', '.join(DISTRIBUCIONES)})")
+
+
+def _muestrear(rng, distribucion, n):
+    tipo, *parametros = distribucion
+    if tipo == 'normal':
+        media, desviacion, *limites = parametros
+        muestra = rng.normal(media, desviacion, n)
+        if limites:
+            muestra = np.clip(muestra, *limites)
+        return muestra
+    if tipo == 'triangular':
+        minimo, moda, maximo = parametros
+        return rng.triangular(minimo, moda, maximo, n) if maximo > minimo else np.full(n, float(moda))
+    if tipo == 'uniforme':
+        minimo, maximo = parametros
+        return rng.uniform(minimo, maximo, n)
+    raise ValueError(f"Distribución no soportada: '{tipo}' (use {', '.join(DISTRIBUCIONES)})")
+
+
+@medir("montecarlo")
+def simular_montecarlo(base, distribuciones, n_muestras=100000, salidas=SALIDAS_PRINCIPALES, semilla=None,
+                       tolerancia_convergencia=None, tamano_bloque=TAMANO_BLOQUE):
+    """Propaga la incertidumbre de las entradas {parámetro: distribución} a las salidas del balance.
+
+    Devuelve un dict con, por cada salida, la media, mínimo, máximo, P10/P50/P90 y la probabilidad
+    de que sea negativa, además de las probabilidades de déficit térmico, eléctrico y de
+    cualquiera de los dos. Con caldera o upgrading la electricidad neta es siempre un consumo, así
+    que el déficit eléctrico solo se cuenta en las muestras con cogeneración. Con la misma
+    semilla y tamaño de bloque el resultado es reproducible.
+
+    Si se indica tolerancia_convergencia, la simulación se detiene antes de n_muestras cuando
+    P10/P50/P90 de todas las salidas cambian menos de esa fracción del rango P10-P90 durante
+    tres bloques consecutivos.
+    """
+    _validar_parametros(distribuciones)
+    rng = np.random.default_rng(semilla)
+    entradas_base = _entradas_base(base)
+    histogramas = {salida: _HistogramaStreaming() for salida in salidas}
+    deficits = {salida: 0 for salida in salidas}
+    deficit_termico = deficit_electrico = deficit_conjunto = 0
+    percentiles_previos = None
+    bloques_estables = 0
+    convergido = False
+    n_evaluadas = 0
+
+    while n_evaluadas < n_muestras:
+        n_bloque = min(tamano_bloque, n_muestras - n_evaluadas)
+        entradas = dict(entradas_base)
+        for nombre, distribucion in distribuciones.items():
+            entradas[nombre] = _muestrear(rng, distribucion, n_bloque)
+        results = calcular_escenarios_lote(entradas)
+        for salida in salidas:
+            valores = np.broadcast_to(results[salida], (n_bloque,))
+            histogramas[salida].agregar(valores)
+            deficits[salida] += int(np.count_nonzero(valores < 0))
+        termico = np.broadcast_to(results['calor_neto_disponible_mj_dia'] < 0, (n_bloque,))
+        electrico = np.broadcast_to((results['electricidad_neta_exportable_kwh_dia'] < 0) & (entradas['uso_biogas_opcion_idx'] == 0), (n_bloque,))
+        deficit_termico += int(np.count_nonzero(termico))
+        deficit_electrico += int(np.count_nonzero(electrico))
+        deficit_conjunto += int(np.count_nonzero(termico | electrico))
+        n_evaluadas += n_bloque
+
+        if tolerancia_convergencia is not None:
+            percentiles = {salida: [h.percentil(q) for q in PERCENTILES] for salida, h in histogramas.items()}
+            if percentiles_previos is not None:
+                estable = all(
+                    max(abs(a - b) for a, b in zip(percentiles[s], percentiles_previos[s]))
+                    <= tolerancia_convergencia * max(percentiles[s][-1] - percentiles[s][0], 1e-12)
+                    for s in salidas)
+                bloques_estables = bloques_estables + 1 if estable else 0
+                if bloques_estables >= 3:
+                    convergido = True
+                    break
+            percentiles_previos = percentiles
+
+    resumen = {'n_muestras': n_evaluadas, 'convergido': convergido, 'salidas': {}}
+    for salida, histograma in histogramas.items():
+        resumen['salidas'][salida] = {
+            'media': histograma.suma / histograma.n if histograma.n else float('nan'),
+            'minimo': histograma.minimo,
+            'maximo': histograma.maximo,
+            **{f'P{q}': histograma.percentil(q) for q in PERCENTILES},
+            'probabilidad_deficit': deficits[salida] / n_evaluadas if n_evaluadas else float('nan'),
+        }
+    for clave, n_deficit in (('termico', deficit_termico), ('electrico', deficit_electrico), ('termico_o_electrico', deficit_conjunto)):
+        resumen[f'probabilidad_deficit_{clave}'] = n_deficit / n_evaluadas if n_evaluadas else float('nan')
+    return resumen
@@ -0,0 +1,180 @@
+# balance_biogas/optimizacion.py
+# Optimización de la receta de co-digestión: caudal de cada sustrato candidato (y TRH) que
+# maximiza la electricidad neta o el calor neto, con límites de disponibilidad, de ST de la
+# mezcla (bombeabilidad), de volumen del digestor y de calor neto mínimo.
+#
+# Para un caudal total M y un TRH fijos, todo el balance es lineal en los caudales salvo las
+# pérdidas del digestor, que solo dependen de M y del TRH (a través del área; con el modelo
+# cinético la eficiencia de digestión depende además del TRH, no de los caudales). Por eso el
+# problema se resuelve como una familia de programas lineales (scipy.optimize.linprog, HiGHS)
+# sobre una búsqueda unidimensional en M: rejilla vectorizada más refinamiento por sección áurea.
+# scipy es opcional y solo se importa al optimizar.
+import importlib.util
+
+import numpy as np
+
+from balance_biogas.calculos import calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.instrumentacion import medir
+from balance_biogas.lote import calcular_dimensiones_digestor_lote, realizar_calculos_balance_lote
+from balance_biogas.barrido import _entradas_base
+from balance_biogas.sustratos import MezclaSustratos
+
+OBJETIVOS = {
+    'electricidad': 'electricidad_neta_exportable_kwh_dia',
+    'calor': 'calor_neto_disponible_mj_dia',
+}
+CLAVES_SUSTRATO = ('st_porcentaje', 'sv_de_st_porcentaje', 'bmp_nm3_ch4_kg_sv', 'temp_sustrato_entrada_c', 'cp_sustrato_kj_kg_c')
+
+N_PUNTOS_CAUDAL = 16
+ITERACIONES_REFINADO = 20
+
+
+def scipy_disponible():
+    return importlib.util.find_spec("scipy") is not None
+
+
+def coeficientes_por_kg(base, biblioteca, nombres):
+    """Aportación de 1 kg/día de cada sustrato a la electricidad neta y al calor neto, sin
+    pérdidas del digestor (se evalúa con área nula). El balance es lineal en el caudal, así que
+    la aportación de una receta es la suma ponderada de estos coeficientes."""
+    posiciones = np.array([biblioteca.indice(nombre) for nombre in nombres])
+    entradas = _entradas_base(base)
+    entradas.update({clave: biblioteca.columna(clave)[posiciones] for clave in CLAVES_SUSTRATO})
+    entradas['caudal_sustrato_kg_dia'] = 1.0
+    entradas['area_superficial_digestor_m2'] = 0.0
+    results = realizar_calculos_balance_lote(entradas)
+    return {clave: np.broadcast_to(results[clave], posiciones.shape) for clave in OBJETIVOS.values()}
+
+
+def perdidas_digestor_mj_dia(base, caudal_total_kg_dia, trh_dias):
+    """Pérdidas de calor del digestor para uno o varios caudales totales (vectorizado)."""
+    entradas = _entradas_base(base)
+    caudal_total_kg_dia = np.asarray(caudal_total_kg_dia, dtype=float)
+    dim_digestor = calcular_dimensiones_digestor_lote(caudal_total_kg_dia, trh_dias, entradas.get('densidad_sustrato_kg_m3', 1000))
+    entradas.update(caudal_sustrato_kg_dia=caudal_total_kg_dia, area_superficial_digestor_m2=dim_digestor['area_superficial_digestor_m2'])
+    return realizar_calculos_balance_lote(entradas)['perdidas_calor_digestor_mj_dia']
+
+
+def _limites(disponibilidad):
+    minimos, maximos = [], []
+    for valor in disponibilidad.values():
+        minimo, maximo = valor if isinstance(valor, (tuple, list)) else (0.0, valor)
+        minimos.append(float(minimo))
+        maximos.append(float(maximo))
+    return np.array(minimos), np.array(maximos)
+
+
+@medir("optimizacion.mezcla")
+def optimizar_mezcla(base, biblioteca, disponibilidad, objetivo='electricidad', trh_opciones=None,
+                     st_max_porcentaje=None, st_min_porcentaje=None, volumen_max_m3=None,
+                     calor_neto_minimo_mj_dia=0.0, n_puntos_caudal=N_PUNTOS_CAUDAL):
+    """Receta y TRH que maximizan el objetivo ('electricidad' o 'calor').
+
+    base aporta el resto de entradas del balance (temperaturas, U, eficiencias, uso del biogás...).
+    disponibilidad es {sustrato: máximo} o {sustrato: (mínimo, máximo)} en kg/día.
+    trh_opciones son los TRH candidatos (por defecto el TRH de base).
+    Devuelve un dict con 'factible' y, si lo es, la receta, sus entradas de balance, las
+    dimensiones y los resultados calculados con las funciones escalares.
+    """
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo no soportado: '{objetivo}' (use {', '.join(OBJETIVOS)})")
+    from scipy.optimize import linprog
+
+    nombres = list(disponibilidad)
+    minimos, maximos = _limites(disponibilidad)
+    posiciones = np.array([biblioteca.indice(nombre) for nombre in nombres])
+    st_sustratos = biblioteca.columna('st_porcentaje')[posiciones]
+    densidad = float(base.get('densidad_sustrato_kg_m3', 1000))
+    trh_opciones = [float(base['trh_dias'])] if trh_opciones is None else [float(t) for t in trh_opciones]
+    restricciones_st = []
+    if st_max_porcentaje is not None:
+        restricciones_st.append(st_sustratos - st_max_porcentaje)
+    if st_min_porcentaje is not None:
+        restricciones_st.append(st_min_porcentaje - st_sustratos)
+    a_eq = np.ones((1, len(nombres)))
+    cotas = list(zip(minimos, maximos))
+    n_programas = 0
+    programas = {}
+
+    def programa(trh_dias):
+        """Objetivo y restricciones de desigualdad para un TRH (solo cambian con el modelo cinético)."""
+        if trh_dias not in programas:
+            coeficientes = coeficientes_por_kg(dict(base, trh_dias=trh_dias), biblioteca, nombres)
+            programas[trh_dias] = (coeficientes[OBJETIVOS[objetivo]],
+                                   np.vstack([-coeficientes['calor_neto_disponible_mj_dia']] + restricciones_st))
+        return programas[trh_dias]
+
+    def resolver(caudal_total, perdidas, trh_dias):
+        nonlocal n_programas
+        n_programas += 1
+        c_objetivo, a_ub = programa(trh_dias)
+        b_ub = np.zeros(len(a_ub))
+        b_ub[0] = -(calor_neto_minimo_mj_dia + perdidas)
+        solucion = linprog(-c_objetivo, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=[caudal_total], bounds=cotas, method='highs')
+        if solucion.status != 0:
+            return -np.inf, None
+        valor = float(c_objetivo @ solucion.x) - (perdidas if objetivo == 'calor' else 0.0)
+        return valor, solucion.x
+
+    # Rejilla de caudal total para cada TRH candidato; se refina solo el mejor punto encontrado.
+    mejor_rejilla = None
+    for trh_dias in trh_opciones:
+        caudal_max = float(maximos.sum())
+        if volumen_max_m3 is not None:
+            caudal_max = min(caudal_max, volumen_max_m3 * densidad / trh_dias)
+        caudal_min = float(minimos.sum())
+        if caudal_max <= 0 or caudal_max < caudal_min:
+            continue
+        caudales_total = np.linspace(max(caudal_min, caudal_max / n_puntos_caudal), caudal_max, n_puntos_caudal)
+        perdidas = perdidas_digestor_mj_dia(base, caudales_total, trh_dias)
+        for i, (caudal_total, perdidas_m) in enumerate(zip(caudales_total, perdidas)):
+            valor, caudales = resolver(caudal_total, perdidas_m, trh_dias)
+            if mejor_rejilla is None or valor > mejor_rejilla[0]:
+                mejor_rejilla = (valor, caudal_total, caudales, trh_dias, caudales_total[max(i - 1, 0)], caudales_total[min(i + 1, n_puntos_caudal - 1)])
+
+    if mejor_rejilla is None or not np.isfinite(mejor_rejilla[0]):
+        return {'factible': False, 'n_programas_lineales': n_programas}
+
+    # Refinado por sección áurea entre los vecinos del mejor punto de la rejilla.
+    valor_optimo, _, caudales_optimos, trh_optimo, izquierda, derecha = mejor_rejilla
+
+    def evaluar(caudal_total):
+        return resolver(caudal_total, float(perdidas_digestor_mj_dia(base, caudal_total, trh_optimo)), trh_optimo)
+
+    razon = (np.sqrt(5) - 1) / 2
+    m1, m2 = derecha - razon * (derecha - izquierda), izquierda + razon * (derecha - izquierda)
+    (v1, x1), (v2, x2) = evaluar(m1), evaluar(m2)
+    for _ in range(ITERACIONES_REFINADO if derecha > izquierda else 0):
+        for valor, caudales in ((v1, x1), (v2, x2)):
+            if valor > valor_optimo:
+                valor_optimo, caudales_optimos = valor, caudales
+        if v1 >= v2:
+            derecha, m2, v2, x2 = m2, m1, v1, x1
+            m1 = derecha - razon * (derecha - izquierda)
+            v1, x1 = evaluar(m1)
+        else:
+            izquierda, m1, v1, x1 = m1, m2, v2, x2
+            m2 = izquierda + razon * (derecha - izquierda)
+            v2, x2 = evaluar(m2)
+    for valor, caudales in ((v1, x1), (v2, x2)):
+        if valor > valor_optimo:
+            valor_optimo, caudales_optimos = valor, caudales
+
+    mejor = {'factible': True, 'valor_objetivo': valor_optimo, 'trh_dias': trh_optimo,
+             'caudales': {nombre: float(c) for nombre, c in zip(nombres, caudales_optimos) if c > 1e-9}}
+    mejor['n_programas_lineales'] = n_programas
+
+    # Resultado final con el camino escalar, sobre la corriente equivalente de la receta óptima.
+    mezcla = MezclaSustratos(biblioteca, mejor['caudales'])
+    entradas_balance = {clave: valor for clave, valor in base.items() if clave != 'area_superficial_digestor_m2'}
+    entradas_balance.update(mezcla.entradas_balance())
+    entradas_balance['trh_dias'] = mejor['trh_dias']
+    dim_digestor = calcular_dimensiones_digestor(entradas_balance['caudal_sustrato_kg_dia'], mejor['trh_dias'], densidad)
+    entradas_balance['area_superficial_digestor_m2'] = dim_digestor['area_superficial_digestor_m2']
+    mejor.update(
+        fracciones=mezcla.fracciones(),
+        entradas_balance=entradas_balance,
+        dimensiones=dim_digestor,
+        resultados=realizar_calculos_balance(entradas_balance),
+    )
+    return mejor
@@ -0,0 +1,162 @@
+# balance_biogas/serie_temporal.py
+# Simulación horaria del balance térmico y eléctrico con series de temperatura ambiente,
+# temperatura de entrada del sustrato y caudal variable. Las series se procesan por bloques
+# (también al leerlas de CSV o Parquet) y solo se conservan los acumulados mensuales, anuales
+# y de déficit, de modo que la memoria no depende de la longitud de la serie.
+# Con un escenario base de arrays (una planta por elemento) se simulan varias plantas a la vez.
+import numpy as np
+
+from balance_biogas.barrido import PARAMETROS_BARRIBLES
+from balance_biogas.ficheros import leer_tabla_por_bloques
+from balance_biogas.instrumentacion import medir
+from balance_biogas.lote import calcular_dimensiones_digestor_lote, realizar_calculos_balance_lote
+
+COLUMNA_TIEMPO = 'marca_tiempo'
+SERIES_ADMITIDAS = ('temp_ambiente_c', 'temp_sustrato_entrada_c', 'caudal_sustrato_kg_dia')
+
+# Variables acumuladas: nombre del total horario/mensual -> resultado del balance (por día) del que sale
+VARIABLES_ACUMULADAS = {
+    'perdidas_calor_digestor_mj': 'perdidas_calor_digestor_mj_dia',
+    'calor_calentar_sustrato_mj': 'calor_calentar_sustrato_mj_dia',
+    'demanda_termica_total_digestor_mj': 'demanda_termica_total_digestor_mj_dia',
+    'calor_util_generado_mj': 'calor_util_generado_mj_dia',
+    'electricidad_generada_bruta_kwh': 'electricidad_generada_bruta_kwh_dia',
+    'consumo_electrico_aux_total_kwh': 'consumo_electrico_aux_total_kwh_dia',
+    'electricidad_neta_exportable_kwh': 'electricidad_neta_exportable_kwh_dia',
+    'calor_neto_disponible_mj': 'calor_neto_disponible_mj_dia',
+}
+
+HORAS_POR_BLOQUE = 8760
+
+
+def _planta_columna(valor):
+    """Los parámetros de planta se disponen en columna (n_plantas, 1) para difundirse contra el eje
+    horario; los escalares se dejan tal cual."""
+    valor = np.asarray(valor, dtype=float)
+    return valor.reshape(-1, 1) if valor.ndim == 1 else valor
+
+
+def preparar_plantas(base):
+    """Entradas numéricas de las plantas con el área del digestor fijada por el diseño
+    (caudal y TRH nominales), que no cambia aunque varíe el caudal horario."""
+    entradas = {clave: np.asarray(base[clave], dtype=float) for clave in PARAMETROS_BARRIBLES if clave in base}
+    if 'area_superficial_digestor_m2' not in base:
+        entradas['area_superficial_digestor_m2'] = calcular_dimensiones_digestor_lote(
+            entradas['caudal_sustrato_kg_dia'], entradas['trh_dias'],
+            entradas.get('densidad_sustrato_kg_m3', 1000))['area_superficial_digestor_m2']
+    else:
+        entradas['area_superficial_digestor_m2'] = np.asarray(base['area_superficial_digestor_m2'], dtype=float)
+    return {clave: _planta_columna(valor) for clave, valor in entradas.items()}
+
+
+def simular_bloque_horario(plantas, series):
+    """Balance hora a hora de un bloque de series. Devuelve {variable: array (n_plantas, n_horas)}
+    con la energía de cada hora (MJ o kWh), usando los nombres de VARIABLES_ACUMULADAS."""
+    entradas = dict(plantas)
+    entradas['temp_ambiente_promedio_c'] = np.asarray(series['temp_ambiente_c'], dtype=float)
+    for clave in ('temp_sustrato_entrada_c', 'caudal_sustrato_kg_dia'):
+        if clave in series:
+            entradas[clave] = np.asarray(series[clave], dtype=float)
+    results = realizar_calculos_balance_lote(entradas)
+    n_horas = entradas['temp_ambiente_promedio_c'].shape[-1]
+    forma = np.broadcast_shapes(results['calor_neto_disponible_mj_dia'].shape, (1, n_horas))
+    return {
+        variable: np.broadcast_to(results[clave], forma) / 24
+        for variable, clave in VARIABLES_ACUMULADAS.items()
+    }
+
+
+def _iterar_bloques_memoria(series, horas_por_bloque):
+    n_horas = len(series[COLUMNA_TIEMPO])
+    for inicio in range(0, n_horas, horas_por_bloque):
+        yield {
+            clave: (valores[inicio:inicio + horas_por_bloque] if np.ndim(valores) else valores)
+            for clave, valores in series.items()
+        }
+
+
+@medir("serie_temporal")
+def simular_serie(base, series, horas_por_bloque=HORAS_POR_BLOQUE):
+    """Simula la serie horaria y la resume en totales mensuales y anuales y horas de déficit.
+
+    series es un dict con COLUMNA_TIEMPO (datetime64, orden cronológico) y 'temp_ambiente_c',
+    y opcionalmente 'temp_sustrato_entrada_c' y 'caudal_sustrato_kg_dia' (tasa horaria
+    expresada en kg/día), o bien un iterable de bloques con esas claves, p. ej. el de
+    leer_series_por_bloques. Cada array del resumen tiene una fila por planta; la hora de
+    déficit térmico máximo es NaT en las plantas sin horas de déficit.
+    """
+    if isinstance(series, dict):
+        series = _iterar_bloques_memoria(series, horas_por_bloque)
+    plantas = preparar_plantas(base)
+    meses = []
+    totales_mensuales = {variable: [] for variable in VARIABLES_ACUMULADAS}
+    deficit_mensual = []
+    horas_deficit = 0
+    deficit_maximo = None
+    hora_deficit_maximo = None
+    n_horas = 0
+
+    for bloque in series:
+        marcas = np.asarray(bloque[COLUMNA_TIEMPO], dtype='datetime64[h]')
+        if not marcas.size:
+            continue
+        horario = simular_bloque_horario(plantas, bloque)
+        calor_neto = horario['calor_neto_disponible_mj']
+        mes = marcas.astype('datetime64[M]')
+        inicios = np.flatnonzero(np.r_[True, mes[1:] != mes[:-1]])
+        parciales = {variable: np.add.reduceat(valores, inicios, axis=-1) for variable, valores in horario.items()}
+        deficit = np.add.reduceat(np.minimum(calor_neto, 0.0), inicios, axis=-1)
+        for j, inicio in enumerate(inicios):
+            if meses and meses[-1] == mes[inicio]:
+                for variable in VARIABLES_ACUMULADAS:
+                    totales_mensuales[variable][-1] = totales_mensuales[variable][-1] + parciales[variable][..., j]
+                deficit_mensual[-1] = deficit_mensual[-1] + deficit[..., j]
+            else:
+                meses.append(mes[inicio])
+                for variable in VARIABLES_ACUMULADAS:
+                    totales_mensuales[variable].append(parciales[variable][..., j])
+                deficit_mensual.append(deficit[..., j])
+
+        horas_deficit = horas_deficit + np.count_nonzero(calor_neto < 0, axis=-1)
+        peor_hora = np.argmin(calor_neto, axis=-1)
+        peor_valor = np.take_along_axis(calor_neto, peor_hora[..., None], axis=-1)[..., 0]
+        if deficit_maximo is None:
+            deficit_maximo, hora_deficit_maximo = peor_valor, marcas[peor_hora]
+        else:
+            mejora = peor_valor < deficit_maximo
+            deficit_maximo = np.where(mejora, peor_valor, deficit_maximo)
+            hora_deficit_maximo = np.where(mejora, marcas[peor_hora], hora_deficit_maximo)
+        n_horas += marcas.size
+
+    meses = np.array(meses, dtype='datetime64[M]')
+    mensual = {variable: np.stack(valores, axis=-1) for variable, valores in totales_mensuales.items()} if meses.size else {}
+    if meses.size:
+        mensual['deficit_termico_mj'] = -np.stack(deficit_mensual, axis=-1)
+    anios = meses.astype('datetime64[Y]')
+    inicios_anio = np.flatnonzero(np.r_[True, anios[1:] != anios[:-1]]) if anios.size else np.array([], dtype=int)
+    anual = {variable: np.add.reduceat(valores, inicios_anio, axis=-1) for variable, valores in mensual.items()}
+    return {
+        'n_horas': n_horas,
+        'meses': meses,
+        'mensual': mensual,
+        'anios': anios[inicios_anio],
+        'anual': anual,
+        'horas_deficit_termico': horas_deficit,
+        'deficit_termico_maximo_mj_h': np.maximum(-deficit_maximo, 0.0) if deficit_maximo is not None else None,
+        # Sin horas de déficit no hay hora de déficit máximo (NaT), solo la de menor calor neto.
+        'hora_deficit_termico_maximo': (np.where(horas_deficit > 0, hora_deficit_maximo, np.datetime64('NaT', 'h'))
+                                        if hora_deficit_maximo is not None else None),
+    }
+
+
+def leer_series_por_bloques(origen, horas_por_bloque=HORAS_POR_BLOQUE, formato=None, columnas=None):
+    """Lee una serie horaria de CSV o Parquet por bloques, sin cargar el fichero entero.
+
+    origen es una ruta o un objeto fichero; el formato se deduce de la extensión si no se indica.
+    columnas renombra las columnas del fichero: {nombre_en_fichero: nombre_interno}.
+    """
+    import pandas as pd
+    for tabla in leer_tabla_por_bloques(origen, horas_por_bloque, formato, columnas):
+        bloque = {clave: tabla[clave].to_numpy(dtype=float) for clave in SERIES_ADMITIDAS if clave in tabla.columns}
+        bloque[COLUMNA_TIEMPO] = pd.to_datetime(tabla[COLUMNA_TIEMPO]).to_numpy().astype('datetime64[h]')
+        yield bloque
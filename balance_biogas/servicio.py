@@ -0,0 +1,483 @@
+# balance_biogas/servicio.py
+# Servicio HTTP/JSON (asyncio, sin dependencias externas) con las dimensiones del digestor, el
+# balance y los informes PDF/XLSX, para integrarlo con sistemas de planificación y ERP.
+#
+# - Las peticiones de balance concurrentes se agrupan en micro-lotes (hasta LOTE_MAXIMO
+#   escenarios o ESPERA_LOTE_S segundos) que se evalúan con el motor vectorizado en un hilo:
+#   el bucle de eventos sigue aceptando peticiones mientras se calcula el lote anterior.
+# - Los informes se renderizan en un pool de procesos.
+# - Las respuestas se guardan en una caché LRU acotada en entradas y bytes, con el hash
+#   canónico de las entradas como clave; peticiones idénticas simultáneas comparten el cálculo.
+#
+# Uso: python -m balance_biogas.servicio [--host 127.0.0.1] [--puerto 8080] [--procesos 1]
+#
+#   GET  /salud                         -> {"estado": "ok"}
+#   GET  /estadisticas                  -> contadores de peticiones, lotes y caché
+#   GET  /metricas                      -> tiempos por tramo y contadores (texto de Prometheus;
+#                                          con --metricas o BALANCE_BIOGAS_METRICAS=1)
+#   POST /dimensiones                   {"caudal_sustrato_kg_dia", "trh_dias"[, "densidad_sustrato_kg_m3"]}
+#   POST /balance                       entradas de un escenario (las mismas columnas que la CLI)
+#                                       o una lista de escenarios
+#   POST /informe/pdf, /informe/xlsx    {"entradas": {...}, "proyecto": {"nombre", "analista", "fecha"}}
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import numbers
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from balance_biogas.calculos import calcular_dimensiones_digestor
+from balance_biogas import instrumentacion
+from balance_biogas.canonico import hash_entradas
+from balance_biogas.informes import FORMATOS_INFORME, VALORES_POR_DEFECTO, preparar_escenario, renderizar_tarea
+from balance_biogas.instrumentacion import contar, medir, observar
+from balance_biogas.lote import CLAVES_BALANCE_OBLIGATORIAS, CLAVES_BALANCE_OPCIONALES, calcular_escenarios_lote
+
+LOTE_MAXIMO = 1024
+ESPERA_LOTE_S = 0.002
+MAX_ENTRADAS_CACHE = 100000
+MAX_BYTES_CACHE = 256 * 2**20
+MAX_BYTES_CUERPO = 2**20
+MAX_BYTES_CABECERA = 2**16
+
+CLAVES_DIMENSIONES = ('volumen_digestor_m3', 'diametro_digestor_m', 'altura_digestor_m', 'area_superficial_digestor_m2')
+COLUMNAS_NUMERICAS = CLAVES_BALANCE_OBLIGATORIAS + CLAVES_BALANCE_OPCIONALES + ('densidad_sustrato_kg_m3',)
+COLUMNAS_OBLIGATORIAS = tuple(
+    clave for clave in CLAVES_BALANCE_OBLIGATORIAS
+    if clave != 'area_superficial_digestor_m2' and clave not in VALORES_POR_DEFECTO
+) + ('trh_dias',)
+TIPOS_INFORME = {
+    'pdf': "application/pdf",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+RAZONES_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+                413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error",
+                501: "Not Implemented"}
+
+_registro = logging.getLogger(__name__)
+
+
+class ErrorPeticion(Exception):
+    """Error atribuible a la petición: se responde con su estado HTTP y el mensaje en JSON."""
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# --- EVALUACIÓN DE LOTES ---
+def validar_escenario(entradas):
+    """Entradas de balance de un escenario con los valores por defecto de la CLI aplicados.
+    Las entradas numéricas presentes deben ser números finitos: null, NaN o infinito darían
+    resultados NaN que no se pueden devolver en JSON estándar."""
+    if not isinstance(entradas, dict):
+        raise ErrorPeticion("Cada escenario debe ser un objeto JSON")
+    faltan = [clave for clave in COLUMNAS_OBLIGATORIAS if clave not in entradas]
+    if faltan:
+        raise ErrorPeticion(f"Faltan entradas obligatorias: {', '.join(faltan)}")
+    for clave in COLUMNAS_NUMERICAS:
+        if clave not in entradas:
+            continue
+        valor = entradas[clave]
+        if type(valor) not in (float, int) and (isinstance(valor, bool) or not isinstance(valor, numbers.Real)):
+            raise ErrorPeticion(f"La entrada '{clave}' debe ser numérica")
+        if not math.isfinite(valor):
+            raise ErrorPeticion(f"La entrada '{clave}' debe ser un número finito")
+    return dict(VALORES_POR_DEFECTO, **entradas)
+
+
+def validar_peticion_informe(peticion):
+    """(entradas, proyecto) de una petición de informe: el proyecto es opcional y, si se da,
+    debe ser un objeto con textos; los campos que falten toman los valores por defecto."""
+    if not isinstance(peticion, dict) or not isinstance(peticion.get('entradas'), dict):
+        raise ErrorPeticion("El cuerpo debe ser un objeto con 'entradas' (y opcionalmente 'proyecto')")
+    entradas = validar_escenario(peticion['entradas'])
+    proyecto = peticion.get('proyecto') or {}
+    if not isinstance(proyecto, dict):
+        raise ErrorPeticion("'proyecto' debe ser un objeto JSON")
+    for clave, valor in proyecto.items():
+        if not isinstance(valor, str):
+            raise ErrorPeticion(f"El campo '{clave}' del proyecto debe ser un texto")
+    return entradas, dict({'nombre': "Proyecto de Biogás", 'analista': "", 'fecha': datetime.date.today().isoformat()}, **proyecto)
+
+
+def _huella(entradas):
+    try:
+        return hash_entradas(entradas)
+    except TypeError as error:
+        raise ErrorPeticion(str(error)) from None
+
+
+def _json(objeto):
+    """Cuerpo JSON estándar: NaN e infinito no son JSON válido y se rechazan (ValueError)."""
+    return json.dumps(objeto, allow_nan=False).encode()
+
+
+def _respuesta_balance(huella, results):
+    return {
+        'hash': huella,
+        'dimensiones': {clave: results[clave] for clave in CLAVES_DIMENSIONES},
+        'resultados': {clave: valor for clave, valor in results.items() if clave not in CLAVES_DIMENSIONES},
+    }
+
+
+@medir("servicio.lote")
+def evaluar_lote(escenarios):
+    """Evalúa una lista de entradas ya validadas; devuelve un dict de resultados (con las
+    dimensiones) o la excepción de cada escenario. Los escenarios con el mismo conjunto de
+    entradas numéricas se calculan juntos con el motor vectorizado; si un grupo falla (p. ej. una
+    tecnología no válida) se recalcula escenario a escenario para aislar el error."""
+    salida = [None] * len(escenarios)
+    grupos = {}
+    for i, entradas in enumerate(escenarios):
+        grupos.setdefault(tuple(clave for clave in COLUMNAS_NUMERICAS if clave in entradas), []).append(i)
+    for claves, indices in grupos.items():
+        try:
+            with np.errstate(all='ignore'):
+                results = calcular_escenarios_lote({clave: np.array([escenarios[i][clave] for i in indices], dtype=float) for clave in claves})
+            nombres = list(results)
+            for i, fila in zip(indices, np.column_stack([results[nombre] for nombre in nombres]).tolist()):
+                salida[i] = dict(zip(nombres, fila))
+        except (ValueError, KeyError, ZeroDivisionError):
+            for i in indices:
+                try:
+                    _, results, dim_digestor = preparar_escenario({clave: escenarios[i][clave] for clave in claves})
+                    results.update(dim_digestor)
+                    salida[i] = results
+                except (ValueError, KeyError, ZeroDivisionError) as error:
+                    salida[i] = ErrorPeticion(f"Escenario no evaluable: {error}")
+    return salida
+
+
+class LoteadorBalance:
+    """Agrupa las peticiones de balance que llegan juntas en un solo cálculo vectorizado."""
+
+    def __init__(self, lote_maximo=LOTE_MAXIMO, espera_s=ESPERA_LOTE_S):
+        self.lote_maximo = lote_maximo
+        self.espera_s = espera_s
+        self.n_lotes = 0
+        self.n_escenarios = 0
+        self._cola = []
+        self._hay_trabajo = asyncio.Event()
+        self._lleno = asyncio.Event()
+        self._tarea = None
+
+    def iniciar(self):
+        self._tarea = asyncio.create_task(self._ejecutar())
+
+    async def cerrar(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+
+    async def evaluar(self, entradas):
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.append((entradas, futuro))
+        self._hay_trabajo.set()
+        if len(self._cola) >= self.lote_maximo:
+            self._lleno.set()
+        return await futuro
+
+    async def _ejecutar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._hay_trabajo.wait()
+            if len(self._cola) < self.lote_maximo and self.espera_s > 0:
+                try:
+                    await asyncio.wait_for(self._lleno.wait(), self.espera_s)
+                except TimeoutError:
+                    pass
+            lote, self._cola = self._cola[:self.lote_maximo], self._cola[self.lote_maximo:]
+            self._lleno.clear()
+            if not self._cola:
+                self._hay_trabajo.clear()
+            try:
+                resultados = await loop.run_in_executor(None, evaluar_lote, [entradas for entradas, _ in lote])
+            except Exception as error:
+                resultados = [error] * len(lote)
+            self.n_lotes += 1
+            self.n_escenarios += len(lote)
+            for (_, futuro), resultado in zip(lote, resultados):
+                if futuro.done():
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+
+# --- CACHÉ DE RESPUESTAS ---
+class CacheRespuestas:
+    """LRU de respuestas ya serializadas, acotada por número de entradas y por bytes."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE, max_bytes=MAX_BYTES_CACHE):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave):
+        contenido = self._entradas.get(clave)
+        if contenido is None:
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return contenido
+
+    def guardar(self, clave, contenido):
+        if len(contenido) > self.max_bytes:
+            return
+        anterior = self._entradas.pop(clave, None)
+        if anterior is not None:
+            self.n_bytes -= len(anterior)
+        self._entradas[clave] = contenido
+        self.n_bytes += len(contenido)
+        while len(self._entradas) > self.max_entradas or self.n_bytes > self.max_bytes:
+            _, expulsado = self._entradas.popitem(last=False)
+            self.n_bytes -= len(expulsado)
+
+
+# --- SERVICIO HTTP ---
+class ServicioBalance:
+    def __init__(self, procesos=1, lote_maximo=LOTE_MAXIMO, espera_lote_s=ESPERA_LOTE_S,
+                 max_entradas_cache=MAX_ENTRADAS_CACHE, max_bytes_cache=MAX_BYTES_CACHE):
+        self.procesos = procesos
+        self.loteador = LoteadorBalance(lote_maximo, espera_lote_s)
+        self.cache = CacheRespuestas(max_entradas_cache, max_bytes_cache)
+        self.n_peticiones = 0
+        self.n_informes = 0
+        self._en_curso = {}
+        self._pool = None
+        self._servidor = None
+
+    async def iniciar(self, host="127.0.0.1", puerto=8080):
+        self.loteador.iniciar()
+        self._servidor = await asyncio.start_server(self._atender_conexion, host, puerto, backlog=4096,
+                                                    limit=MAX_BYTES_CABECERA)
+        return self._servidor
+
+    async def cerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        await self.loteador.cerrar()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def estadisticas(self):
+        return {
+            'peticiones': self.n_peticiones,
+            'lotes': self.loteador.n_lotes,
+            'escenarios_en_lotes': self.loteador.n_escenarios,
+            'escenarios_por_lote': round(self.loteador.n_escenarios / self.loteador.n_lotes, 2) if self.loteador.n_lotes else 0.0,
+            'informes': self.n_informes,
+            'cache_entradas': len(self.cache),
+            'cache_bytes': self.cache.n_bytes,
+            'cache_aciertos': self.cache.aciertos,
+            'cache_fallos': self.cache.fallos,
+        }
+
+    async def _memorizado(self, clave, calcular):
+        """Respuesta en caché o calculada una sola vez aunque lleguen varias peticiones iguales."""
+        contenido = self.cache.obtener(clave)
+        if contenido is not None:
+            contar("cache_aciertos", tipo=clave[0])
+            return contenido
+        if clave in self._en_curso:
+            contar("cache_compartidas", tipo=clave[0])
+            return await asyncio.shield(self._en_curso[clave])
+        contar("cache_fallos", tipo=clave[0])
+        futuro = asyncio.ensure_future(calcular())
+        self._en_curso[clave] = futuro
+        try:
+            contenido = await asyncio.shield(futuro)
+        finally:
+            self._en_curso.pop(clave, None)
+        self.cache.guardar(clave, contenido)
+        return contenido
+
+    async def balance(self, escenario):
+        entradas = validar_escenario(escenario)
+        huella = _huella(entradas)
+
+        async def calcular():
+            results = await self.loteador.evaluar(entradas)
+            try:
+                return _json(_respuesta_balance(huella, results))
+            except ValueError:
+                raise ErrorPeticion("Escenario no evaluable: resultados no finitos") from None
+        return await self._memorizado(('balance', huella), calcular)
+
+    async def informe(self, formato, peticion):
+        entradas, proyecto = validar_peticion_informe(peticion)
+        huella = _huella(dict(entradas, **{f"proyecto.{clave}": valor for clave, valor in proyecto.items()}))
+
+        async def calcular():
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.procesos)
+            try:
+                [(_, contenido)] = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, renderizar_tarea, [(proyecto['nombre'], entradas)], proyecto, (formato,))
+            except (ValueError, KeyError, ZeroDivisionError) as error:
+                raise ErrorPeticion(f"Escenario no evaluable: {error}") from None
+            except ImportError as error:
+                raise ErrorPeticion(str(error), 501) from None
+            self.n_informes += 1
+            contar("bytes_exportados", len(contenido), formato=formato)
+            return contenido
+        return await self._memorizado(('informe', formato, huella), calcular)
+
+    async def _despachar(self, metodo, ruta, cuerpo):
+        """(estado, tipo de contenido, contenido, cabeceras adicionales) de una petición."""
+        ruta = ruta.split('?', 1)[0].rstrip('/') or '/'
+        rutas_get = {'/salud', '/estadisticas', '/metricas'}
+        rutas_post = {'/dimensiones', '/balance'} | {f"/informe/{formato}" for formato in FORMATOS_INFORME}
+        if ruta not in rutas_get | rutas_post:
+            raise ErrorPeticion(f"Ruta no encontrada: {ruta}", 404)
+        if metodo != ('GET' if ruta in rutas_get else 'POST'):
+            raise ErrorPeticion(f"Método no permitido en {ruta}: {metodo}", 405)
+        if ruta == '/salud':
+            return 200, "application/json", b'{"estado":"ok"}', ""
+        if ruta == '/estadisticas':
+            return 200, "application/json", _json(self.estadisticas()), ""
+        if ruta == '/metricas':
+            return 200, "text/plain; version=0.0.4; charset=utf-8", instrumentacion.texto_prometheus().encode(), ""
+        try:
+            peticion = json.loads(cuerpo)
+        except (UnicodeDecodeError, json.JSONDecodeError) as error:
+            raise ErrorPeticion(f"JSON no válido: {error}") from None
+        if ruta == '/dimensiones':
+            if not isinstance(peticion, dict):
+                raise ErrorPeticion("El cuerpo debe ser un objeto JSON")
+            try:
+                dim_digestor = calcular_dimensiones_digestor(float(peticion['caudal_sustrato_kg_dia']), float(peticion['trh_dias']),
+                                                             float(peticion.get('densidad_sustrato_kg_m3', 1000)))
+                contenido = _json(dim_digestor)
+            except KeyError as error:
+                raise ErrorPeticion(f"Falta la entrada obligatoria: {error.args[0]}") from None
+            except (TypeError, ValueError, ZeroDivisionError) as error:
+                raise ErrorPeticion(f"Entradas no válidas: {error}") from None
+            return 200, "application/json", contenido, ""
+        if ruta == '/balance':
+            if isinstance(peticion, list):
+                partes = await asyncio.gather(*(self.balance(escenario) for escenario in peticion))
+                return 200, "application/json", b"[" + b",".join(partes) + b"]", ""
+            return 200, "application/json", await self.balance(peticion), ""
+        formato = ruta.rsplit('/', 1)[1]
+        contenido = await self.informe(formato, peticion)
+        return 200, TIPOS_INFORME[formato], contenido, f'Content-Disposition: attachment; filename="informe.{formato}"\r\n'
+
+    async def _atender_conexion(self, reader, writer):
+        """Conexión HTTP/1.1 persistente: peticiones con Content-Length, una tras otra."""
+        try:
+            while True:
+                try:
+                    cabecera = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._responder(writer, 431, "application/json", b'{"error":"Cabecera demasiado larga"}', "", False)
+                    break
+                linea, *lineas = cabecera.decode('latin-1').rstrip("\r\n").split("\r\n")
+                metodo, _, resto = linea.partition(" ")
+                ruta, _, version = resto.partition(" ")
+                cabeceras = {}
+                for texto in lineas:
+                    nombre, _, valor = texto.partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                conexion = cabeceras.get('connection', '').lower()
+                mantener = conexion == 'keep-alive' if version == "HTTP/1.0" else conexion != 'close'
+                self.n_peticiones += 1
+                t0 = time.perf_counter()
+                try:
+                    if 'transfer-encoding' in cabeceras:
+                        raise ErrorPeticion("Transfer-Encoding no soportado: use Content-Length", 501)
+                    try:
+                        longitud = int(cabeceras.get('content-length', 0))
+                    except ValueError:
+                        raise ErrorPeticion("Content-Length no válido", 411) from None
+                    if longitud > MAX_BYTES_CUERPO:
+                        raise ErrorPeticion(f"Cuerpo demasiado grande (máximo {MAX_BYTES_CUERPO} bytes)", 413)
+                    cuerpo = await reader.readexactly(longitud) if longitud > 0 else b""
+                    estado, tipo, contenido, extra = await self._despachar(metodo, ruta, cuerpo)
+                except ErrorPeticion as error:
+                    estado, tipo, contenido, extra = error.estado, "application/json", _json({'error': str(error)}), ""
+                    mantener = mantener and error.estado < 411
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception:
+                    _registro.exception("Error interno atendiendo %s %s", metodo, ruta)
+                    contar("errores_internos")
+                    estado, tipo, contenido, extra = 500, "application/json", b'{"error":"Error interno"}', ""
+                await self._responder(writer, estado, tipo, contenido, extra, mantener)
+                observar("servicio.peticion", time.perf_counter() - t0)
+                contar("peticiones", estado=estado)
+                if not mantener:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _responder(writer, estado, tipo, contenido, extra, mantener):
+        writer.write((f"HTTP/1.1 {estado} {RAZONES_HTTP[estado]}\r\nContent-Type: {tipo}\r\n"
+                      f"Content-Length: {len(contenido)}\r\n{extra}"
+                      f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n").encode('latin-1') + contenido)
+        await writer.drain()
+
+
+async def servir(host="127.0.0.1", puerto=8080, **opciones):
+    """Arranca el servicio y atiende peticiones hasta que se cancele."""
+    servicio = ServicioBalance(**opciones)
+    servidor = await servicio.iniciar(host, puerto)
+    host_real, puerto_real = servidor.sockets[0].getsockname()[:2]
+    print(f"Servicio de balance escuchando en http://{host_real}:{puerto_real}", file=sys.stderr, flush=True)
+    try:
+        await servidor.serve_forever()
+    finally:
+        await servicio.cerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m balance_biogas.servicio",
+        description="Servicio HTTP/JSON de dimensiones, balance energético e informes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=8080, help="Puerto (por defecto 8080; 0 = uno libre)")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos para renderizar informes (por defecto 1)")
+    parser.add_argument("--lote-maximo", type=int, default=LOTE_MAXIMO, help=f"Escenarios por lote (por defecto {LOTE_MAXIMO})")
+    parser.add_argument("--espera-lote-ms", type=float, default=ESPERA_LOTE_S * 1000,
+                        help=f"Espera máxima para completar un lote en ms (por defecto {ESPERA_LOTE_S * 1000:g})")
+    parser.add_argument("--cache-entradas", type=int, default=MAX_ENTRADAS_CACHE,
+                        help=f"Respuestas en caché (por defecto {MAX_ENTRADAS_CACHE}; 0 = sin caché)")
+    parser.add_argument("--metricas", action="store_true", help="Activa la instrumentación (GET /metricas)")
+    args = parser.parse_args(argv)
+    if args.metricas:
+        instrumentacion.activar()
+    try:
+        asyncio.run(servir(args.host, args.puerto, procesos=args.procesos, lote_maximo=max(1, args.lote_maximo),
+                           espera_lote_s=args.espera_lote_ms / 1000, max_entradas_cache=args.cache_entradas))
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
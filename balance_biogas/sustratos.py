@@ -0,0 +1,186 @@
+# balance_biogas/sustratos.py
+# Biblioteca de sustratos y mezclas de co-digestión. La biblioteca guarda los datos de cada
+# sustrato en columnas con índices por nombre y por categoría, y precalcula los valores
+# derivados (fracción de SV y rendimiento de CH4 por kg de materia fresca). Una mezcla se
+# define por el caudal de cada componente y mantiene sumas acumuladas, de modo que cambiar un
+# caudal es una actualización O(1) y no una reagregación de toda la receta.
+import numpy as np
+
+CP_SUSTRATO_POR_DEFECTO_KJ_KG_C = 4.186
+TEMP_ENTRADA_POR_DEFECTO_C = 15.0
+
+# Valores orientativos de literatura (materia fresca). Deben sustituirse por análisis de laboratorio.
+# (nombre, categoría, ST %, SV % de ST, BMP Nm³ CH₄/kg SV)
+BIBLIOTECA_POR_DEFECTO = (
+    ("Purín de cerdo", "Estiércoles", 5.0, 75.0, 0.30),
+    ("Purín de vacuno", "Estiércoles", 9.0, 80.0, 0.22),
+    ("Estiércol sólido de vacuno", "Estiércoles", 25.0, 80.0, 0.23),
+    ("Gallinaza", "Estiércoles", 30.0, 70.0, 0.30),
+    ("Ensilado de maíz", "Cultivos energéticos", 33.0, 95.0, 0.34),
+    ("Ensilado de hierba", "Cultivos energéticos", 35.0, 90.0, 0.31),
+    ("Pulpa de remolacha", "Residuos agroindustriales", 22.0, 92.0, 0.33),
+    ("Orujo de uva", "Residuos agroindustriales", 45.0, 90.0, 0.20),
+    ("Suero lácteo", "Residuos agroindustriales", 6.0, 85.0, 0.45),
+    ("Grasas de separadores", "Residuos agroindustriales", 30.0, 95.0, 0.70),
+    ("Glicerina cruda", "Residuos agroindustriales", 85.0, 95.0, 0.40),
+    ("Residuos de alimentos (FORSU)", "Residuos orgánicos", 25.0, 88.0, 0.45),
+    ("Residuos de frutas y verduras", "Residuos orgánicos", 12.0, 88.0, 0.38),
+    ("Lodos de EDAR mixtos", "Lodos", 4.0, 75.0, 0.30),
+)
+
+
+class BibliotecaSustratos:
+    """Sustratos en columnas (arrays de NumPy) con índice por nombre y por categoría."""
+
+    def __init__(self, sustratos=BIBLIOTECA_POR_DEFECTO):
+        self.nombres = []
+        self.categorias = []
+        self._indice_nombre = {}
+        self._indice_categoria = {}
+        columnas = {'st_porcentaje': [], 'sv_de_st_porcentaje': [], 'bmp_nm3_ch4_kg_sv': [],
+                    'temp_sustrato_entrada_c': [], 'cp_sustrato_kj_kg_c': []}
+        self._columnas = {clave: np.array(valores, dtype=float) for clave, valores in columnas.items()}
+        for sustrato in sustratos:
+            self.agregar(*sustrato)
+
+    def agregar(self, nombre, categoria, st_porcentaje, sv_de_st_porcentaje, bmp_nm3_ch4_kg_sv,
+                temp_sustrato_entrada_c=TEMP_ENTRADA_POR_DEFECTO_C, cp_sustrato_kj_kg_c=CP_SUSTRATO_POR_DEFECTO_KJ_KG_C):
+        if nombre in self._indice_nombre:
+            raise ValueError(f"El sustrato '{nombre}' ya existe en la biblioteca")
+        posicion = len(self.nombres)
+        self.nombres.append(nombre)
+        self.categorias.append(categoria)
+        self._indice_nombre[nombre] = posicion
+        self._indice_categoria.setdefault(categoria, []).append(posicion)
+        valores = {'st_porcentaje': st_porcentaje, 'sv_de_st_porcentaje': sv_de_st_porcentaje,
+                   'bmp_nm3_ch4_kg_sv': bmp_nm3_ch4_kg_sv, 'temp_sustrato_entrada_c': temp_sustrato_entrada_c,
+                   'cp_sustrato_kj_kg_c': cp_sustrato_kj_kg_c}
+        for clave, valor in valores.items():
+            self._columnas[clave] = np.append(self._columnas[clave], float(valor))
+        self._actualizar_derivados()
+        return posicion
+
+    def _actualizar_derivados(self):
+        # kg ST y kg SV por kg de materia fresca, y Nm³ CH₄ (potencial) por kg de materia fresca.
+        self.fraccion_st = self._columnas['st_porcentaje'] / 100
+        self.fraccion_sv = self.fraccion_st * (self._columnas['sv_de_st_porcentaje'] / 100)
+        self.ch4_nm3_kg_fresco = self.fraccion_sv * self._columnas['bmp_nm3_ch4_kg_sv']
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def __contains__(self, nombre):
+        return nombre in self._indice_nombre
+
+    def indice(self, nombre):
+        try:
+            return self._indice_nombre[nombre]
+        except KeyError:
+            raise KeyError(f"Sustrato no encontrado en la biblioteca: '{nombre}'") from None
+
+    def columna(self, clave):
+        return self._columnas[clave]
+
+    def lista_categorias(self):
+        return list(self._indice_categoria)
+
+    def por_categoria(self, categoria):
+        return [self.nombres[posicion] for posicion in self._indice_categoria.get(categoria, [])]
+
+    def datos(self, nombre):
+        posicion = self.indice(nombre)
+        datos = {clave: float(valores[posicion]) for clave, valores in self._columnas.items()}
+        datos.update({
+            'nombre': nombre, 'categoria': self.categorias[posicion],
+            'fraccion_sv': float(self.fraccion_sv[posicion]), 'ch4_nm3_kg_fresco': float(self.ch4_nm3_kg_fresco[posicion]),
+        })
+        return datos
+
+
+class MezclaSustratos:
+    """Receta de co-digestión: caudal (kg/día) de cada sustrato de la biblioteca.
+
+    Mantiene las sumas ponderadas por caudal que definen la corriente equivalente, y cada cambio
+    de caudal las actualiza solo con la diferencia. Cada RESINCRONIZAR_CADA cambios se reagregan
+    desde cero para acotar el error de redondeo acumulado.
+    """
+
+    RESINCRONIZAR_CADA = 1000
+
+    def __init__(self, biblioteca, caudales=None):
+        self.biblioteca = biblioteca
+        self.caudales = {}
+        self._sumas = dict.fromkeys(('caudal', 'st', 'sv', 'ch4', 'cp', 'cp_t'), 0.0)
+        self._cambios = 0
+        for nombre, caudal in (caudales or {}).items():
+            self.fijar_caudal(nombre, caudal)
+
+    def _contribucion(self, posicion, caudal):
+        b = self.biblioteca
+        cp = b.columna('cp_sustrato_kj_kg_c')[posicion]
+        return {
+            'caudal': caudal,
+            'st': caudal * b.fraccion_st[posicion],
+            'sv': caudal * b.fraccion_sv[posicion],
+            'ch4': caudal * b.ch4_nm3_kg_fresco[posicion],
+            'cp': caudal * cp,
+            'cp_t': caudal * cp * b.columna('temp_sustrato_entrada_c')[posicion],
+        }
+
+    def fijar_caudal(self, nombre, caudal_kg_dia):
+        """Fija el caudal de un componente (0 lo elimina) actualizando las sumas de forma incremental."""
+        posicion = self.biblioteca.indice(nombre)
+        caudal_kg_dia = float(caudal_kg_dia)
+        if caudal_kg_dia < 0:
+            raise ValueError(f"El caudal de '{nombre}' no puede ser negativo")
+        anterior = self.caudales.get(nombre, 0.0)
+        if caudal_kg_dia == anterior:
+            return
+        for clave, valor in self._contribucion(posicion, caudal_kg_dia - anterior).items():
+            self._sumas[clave] += float(valor)
+        if caudal_kg_dia > 0:
+            self.caudales[nombre] = caudal_kg_dia
+        else:
+            self.caudales.pop(nombre, None)
+        self._cambios += 1
+        if self._cambios >= self.RESINCRONIZAR_CADA:
+            self.reagregar()
+
+    def sincronizar(self, caudales):
+        """Ajusta la mezcla a {nombre: caudal}, tocando solo los componentes que cambian."""
+        for nombre in [n for n in self.caudales if n not in caudales]:
+            self.fijar_caudal(nombre, 0.0)
+        for nombre, caudal in caudales.items():
+            self.fijar_caudal(nombre, caudal)
+
+    def reagregar(self):
+        """Recalcula las sumas desde cero (vectorizado sobre los componentes)."""
+        self._cambios = 0
+        if not self.caudales:
+            self._sumas = dict.fromkeys(self._sumas, 0.0)
+            return
+        posiciones = np.array([self.biblioteca.indice(nombre) for nombre in self.caudales])
+        caudales = np.fromiter(self.caudales.values(), dtype=float, count=len(self.caudales))
+        self._sumas = {clave: float(np.sum(valores)) for clave, valores in self._contribucion(posiciones, caudales).items()}
+
+    def fracciones(self):
+        total = self._sumas['caudal']
+        return {nombre: caudal / total for nombre, caudal in self.caudales.items()} if total > 0 else {}
+
+    def entradas_balance(self):
+        """Corriente equivalente de la mezcla con las claves de entrada de realizar_calculos_balance.
+
+        Reproduce exactamente SV alimentado, CH4 potencial y calor de calentamiento de la suma de
+        los componentes: ST y SV se ponderan por masa, el BMP por SV y la temperatura por caudal·cp.
+        """
+        s = self._sumas
+        return {
+            'sustrato_nombre': "Mezcla: " + ", ".join(
+                f"{nombre} ({100 * fraccion:.0f}%)" for nombre, fraccion in self.fracciones().items()),
+            'caudal_sustrato_kg_dia': s['caudal'],
+            'st_porcentaje': 100 * s['st'] / s['caudal'] if s['caudal'] > 0 else 0.0,
+            'sv_de_st_porcentaje': 100 * s['sv'] / s['st'] if s['st'] > 0 else 0.0,
+            'bmp_nm3_ch4_kg_sv': s['ch4'] / s['sv'] if s['sv'] > 0 else 0.0,
+            'cp_sustrato_kj_kg_c': s['cp'] / s['caudal'] if s['caudal'] > 0 else CP_SUSTRATO_POR_DEFECTO_KJ_KG_C,
+            'temp_sustrato_entrada_c': s['cp_t'] / s['cp'] if s['cp'] > 0 else TEMP_ENTRADA_POR_DEFECTO_C,
+        }
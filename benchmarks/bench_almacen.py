@@ -0,0 +1,75 @@
+# benchmarks/bench_almacen.py
+# Almacén de escenarios en SQLite: escenarios guardados por segundo, búsqueda por proyecto,
+# analista y fecha con los índices, comparación de escenarios, y reabrir/reexportar un escenario
+# conocido (acierto en el almacén) frente a recalcularlo y volver a renderizar el informe. Por
+# último comprueba que la poda mantiene los informes por debajo del límite de bytes.
+# Uso: python benchmarks/bench_almacen.py [n_escenarios]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas.almacen import AlmacenEscenarios
+from balance_biogas.informes import FORMATOS_INFORME, preparar_escenario
+from bench_barrido import ESCENARIO_BASE
+
+N_INFORMES = 50
+
+
+def escenarios(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    for i, (caudal, bmp) in enumerate(zip(rng.uniform(2000, 50000, n), rng.uniform(0.2, 0.5, n))):
+        yield dict(ESCENARIO_BASE, caudal_sustrato_kg_dia=float(caudal), bmp_nm3_ch4_kg_sv=float(bmp), uso_biogas_opcion_idx=i % 3)
+
+
+def proyecto(i):
+    return {'nombre': f"Proyecto {i % 100}", 'analista': f"Analista {i % 7}", 'fecha': f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}"}
+
+
+def cronometrar(funcion, *args, repeticiones=1):
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion(*args)
+    return resultado, (time.perf_counter() - t0) / repeticiones
+
+
+def main(n=10000):
+    with tempfile.TemporaryDirectory() as directorio, AlmacenEscenarios(os.path.join(directorio, "escenarios.sqlite")) as almacen:
+        lista = list(escenarios(n))
+        t0 = time.perf_counter()
+        huellas = [almacen.guardar(entradas, proyecto(i)) for i, entradas in enumerate(lista)]
+        t_guardar = time.perf_counter() - t0
+        print(f"{n:,} escenarios guardados en {t_guardar:.2f} s ({n / t_guardar:,.0f}/s)")
+
+        _, t_proyecto = cronometrar(almacen.buscar, "Proyecto 7", None, None, None, repeticiones=100)
+        _, t_filtros = cronometrar(almacen.buscar, None, "Analista 3", "2026-03-01", "2026-03-31", repeticiones=100)
+        print(f"  Búsqueda por proyecto: {t_proyecto * 1e3:.2f} ms; por analista y mes: {t_filtros * 1e3:.2f} ms")
+        for n_comparar in (10, 100):
+            _, t_comparar = cronometrar(almacen.comparar, huellas[:n_comparar], repeticiones=20)
+            print(f"  Comparar {n_comparar} escenarios: {t_comparar * 1e3:.2f} ms")
+
+        _, t_acierto = cronometrar(lambda: [almacen.resultados(entradas) for entradas in lista[:1000]])
+        _, t_recalculo = cronometrar(lambda: [preparar_escenario(entradas) for entradas in lista[:1000]])
+        print(f"  Reabrir resultados: {t_acierto * 1e3:.3f} µs/escenario en el almacén, {t_recalculo * 1e3:.3f} µs recalculando")
+
+        for formato in FORMATOS_INFORME:
+            _, t_render = cronometrar(lambda: [almacen.informe(entradas, proyecto(i), formato) for i, entradas in enumerate(lista[:N_INFORMES])])
+            _, t_blob = cronometrar(lambda: [almacen.informe(entradas, proyecto(i), formato) for i, entradas in enumerate(lista[:N_INFORMES])])
+            print(f"  Informe {formato}: {t_render / N_INFORMES * 1e3:.2f} ms renderizando, "
+                  f"{t_blob / N_INFORMES * 1e3:.3f} ms desde el almacén ({t_render / t_blob:,.0f}x)")
+
+        almacen.max_bytes_informes = almacen.estadisticas()['bytes_informes'] // 2
+        for i, entradas in enumerate(lista[N_INFORMES:2 * N_INFORMES]):
+            almacen.informe(entradas, proyecto(i), 'pdf')
+        estadisticas = almacen.estadisticas()
+        print(f"  Poda: {estadisticas['informes']} informes, {estadisticas['bytes_informes']:,} bytes "
+              f"(límite {estadisticas['max_bytes_informes']:,})")
+        print(f"  Tamaño del fichero: {os.path.getsize(almacen.ruta) / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,58 @@
+# benchmarks/bench_barrido.py
+# Tiempo de un barrido de rejilla de 10^6 puntos (secuencial y con procesos) y de una muestra
+# por hipercubo latino del mismo tamaño.
+# Uso: python benchmarks/bench_barrido.py [procesos]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas.barrido import evaluar_barrido_rejilla, evaluar_muestras, muestreo_hipercubo_latino
+
+ESCENARIO_BASE = {
+    'caudal_sustrato_kg_dia': 10000.0, 'st_porcentaje': 20.0, 'sv_de_st_porcentaje': 80.0,
+    'bmp_nm3_ch4_kg_sv': 0.35, 'eficiencia_digestion_porcentaje': 75.0, 'ch4_en_biogas_porcentaje': 60.0,
+    'cp_sustrato_kj_kg_c': 4.186, 'temp_op_digestor_c': 38.0, 'temp_sustrato_entrada_c': 15.0,
+    'u_digestor_w_m2_k': 0.5, 'temp_ambiente_promedio_c': 10.0, 'uso_biogas_opcion_idx': 0,
+    'chp_eficiencia_electrica_porcentaje': 35.0, 'chp_eficiencia_termica_porcentaje': 45.0,
+    'caldera_eficiencia_porcentaje': 0.0, 'consumo_electrico_aux_kwh_ton_sustrato': 30.0, 'trh_dias': 30.0,
+}
+
+REJILLA = {
+    'bmp_nm3_ch4_kg_sv': np.linspace(0.2, 0.5, 10),
+    'st_porcentaje': np.linspace(5.0, 35.0, 10),
+    'eficiencia_digestion_porcentaje': np.linspace(50.0, 90.0, 10),
+    'trh_dias': np.linspace(15.0, 60.0, 10),
+    'u_digestor_w_m2_k': np.linspace(0.3, 3.0, 10),
+    'temp_ambiente_promedio_c': np.linspace(-5.0, 25.0, 10),
+}
+
+
+def cronometrar(funcion, *args, **kwargs):
+    t0 = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - t0
+
+
+def main(procesos=os.cpu_count()):
+    n = int(np.prod([len(v) for v in REJILLA.values()]))
+    secuencial, t_secuencial = cronometrar(evaluar_barrido_rejilla, ESCENARIO_BASE, REJILLA)
+    paralelo, t_paralelo = cronometrar(evaluar_barrido_rejilla, ESCENARIO_BASE, REJILLA, procesos=procesos)
+    for salida in secuencial:
+        if not np.array_equal(secuencial[salida], paralelo[salida]):
+            raise SystemExit(f"El barrido paralelo difiere del secuencial en '{salida}'")
+    rangos = {nombre: (valores[0], valores[-1]) for nombre, valores in REJILLA.items()}
+    muestras = muestreo_hipercubo_latino(rangos, n, semilla=0)
+    _, t_lhs = cronometrar(evaluar_muestras, ESCENARIO_BASE, muestras)
+
+    print(f"Puntos: {n:,}")
+    print(f"  Rejilla secuencial        : {t_secuencial:.3f} s ({n / t_secuencial:14,.0f} puntos/s)")
+    print(f"  Rejilla con {procesos:>2} procesos   : {t_paralelo:.3f} s ({n / t_paralelo:14,.0f} puntos/s)")
+    print(f"  Hipercubo latino          : {t_lhs:.3f} s ({n / t_lhs:14,.0f} puntos/s)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count())
@@ -0,0 +1,79 @@
+# benchmarks/bench_cartera.py
+# Cartera de plantas: carga inicial de la flota (motor vectorizado), cambio de una planta con
+# agregados incrementales frente a recalcular la flota entera, refresco del panel (totales, totales
+# por grupo y tabla de plantas en un DataFrame) y deriva de los totales incrementales tras muchas
+# actualizaciones frente a sumarlos desde cero.
+# Uso: python benchmarks/bench_cartera.py [n_plantas ...]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas.almacen import AlmacenEscenarios
+from balance_biogas.cartera import AGREGADOS, CarteraPlantas
+from bench_lote import generar_escenarios
+
+N_ACTUALIZACIONES = 1000
+N_GRUPOS = 8
+
+
+def plantas(n, semilla=0):
+    escenarios = generar_escenarios(n, semilla=semilla)
+    return [(f"Planta {i:05d}", {clave: float(valores[i]) for clave, valores in escenarios.items()}, f"Región {i % N_GRUPOS}")
+            for i in range(n)]
+
+
+def refrescar_panel(cartera):
+    totales = cartera.agregados()
+    por_grupo = pd.DataFrame(cartera.agregados_por_grupo()).T
+    return totales, por_grupo, pd.DataFrame(cartera.tabla()).set_index('planta')
+
+
+def main(tamanos=(500, 5000)):
+    rng = np.random.default_rng(1)
+    for n in tamanos:
+        lista = plantas(n)
+        with tempfile.TemporaryDirectory() as directorio, AlmacenEscenarios(os.path.join(directorio, "escenarios.sqlite")) as almacen:
+            cartera = CarteraPlantas("Flota", almacen)
+            t0 = time.perf_counter()
+            cartera.cargar_plantas(lista)
+            t_carga = time.perf_counter() - t0
+            print(f"{n:,} plantas: carga inicial {t_carga * 1e3:.1f} ms (guardadas en el almacén)")
+
+            t0 = time.perf_counter()
+            cartera.recalcular()
+            t_completo = time.perf_counter() - t0
+            nombres = [lista[i][0] for i in rng.integers(0, n, N_ACTUALIZACIONES)]
+            caudales = rng.uniform(2000, 50000, N_ACTUALIZACIONES)
+            t0 = time.perf_counter()
+            for planta, caudal in zip(nombres, caudales):
+                cartera.actualizar(planta, caudal_sustrato_kg_dia=float(caudal))
+            t_actualizar = (time.perf_counter() - t0) / N_ACTUALIZACIONES
+            print(f"  Cambio de una planta: {t_actualizar * 1e3:.3f} ms incremental, {t_completo * 1e3:.1f} ms recalculando la flota "
+                  f"({t_completo / t_actualizar:,.0f}x)")
+
+            refrescar_panel(cartera)
+            t0 = time.perf_counter()
+            for _ in range(20):
+                refrescar_panel(cartera)
+            print(f"  Refresco del panel (totales, {N_GRUPOS} grupos y tabla): {(time.perf_counter() - t0) / 20 * 1e3:.2f} ms")
+
+            incrementales = cartera.agregados()
+            cartera.recalcular()
+            desde_cero = cartera.agregados()
+            deriva = max(abs(incrementales[clave] - desde_cero[clave]) / max(abs(desde_cero[clave]), 1.0) for clave in AGREGADOS)
+            print(f"  Deriva relativa tras {N_ACTUALIZACIONES:,} actualizaciones: {deriva:.1e}")
+
+            t0 = time.perf_counter()
+            reabierta = CarteraPlantas.abrir(almacen, "Flota")
+            print(f"  Reabrir la cartera desde el almacén: {(time.perf_counter() - t0) * 1e3:.1f} ms "
+                  f"({reabierta.n_plantas_recalculadas} plantas recalculadas)")
+
+
+if __name__ == "__main__":
+    main(tuple(int(argumento) for argumento in sys.argv[1:]) or (500, 5000))
@@ -0,0 +1,42 @@
+# benchmarks/bench_cli.py
+# Rendimiento de la evaluación masiva por línea de comandos (filas/s y memoria pico del
+# proceso) para cada formato de salida, sobre un CSV de escenarios sintéticos.
+# Uso: python benchmarks/bench_cli.py [n_filas]
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_lote import generar_escenarios
+
+
+def main(n_filas=100000):
+    import pandas as pd
+    with tempfile.TemporaryDirectory() as directorio:
+        entrada = os.path.join(directorio, "escenarios.csv")
+        tabla = pd.DataFrame(generar_escenarios(n_filas))
+        tabla.insert(0, "planta", [f"P{i:07d}" for i in range(n_filas)])
+        tabla.to_csv(entrada, index=False)
+        print(f"Escenarios: {n_filas:,}")
+        for formato in ("csv", "parquet", "xlsx"):
+            salida = os.path.join(directorio, f"resultados.{formato}")
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "balance_biogas", entrada, salida], cwd=RAIZ, check=True,
+                           stderr=subprocess.DEVNULL)
+            t = time.perf_counter() - t0
+            pico_mib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            print(f"  -> {formato:<8}: {n_filas / t:12,.0f} filas/s ({t:.2f} s, pico acumulado de hijos {pico_mib:.0f} MiB)")
+        resultados = pd.read_parquet(os.path.join(directorio, "resultados.parquet"))
+        if len(resultados) != n_filas or not np.isfinite(resultados['calor_neto_disponible_mj_dia']).all():
+            raise SystemExit("La salida no contiene un resultado válido por fila")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
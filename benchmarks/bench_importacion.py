@@ -0,0 +1,50 @@
+# benchmarks/bench_importacion.py
+# Tiempo de importación del núcleo headless frente al script de Streamlit, en procesos
+# limpios. Comprueba además que el núcleo no arrastra Streamlit, openpyxl, fpdf2 ni NumPy.
+# Uso: python benchmarks/bench_importacion.py [repeticiones]
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODIGO_MEDICION = """
+import sys, time
+t0 = time.perf_counter()
+{importacion}
+t = time.perf_counter() - t0
+pesados = [m for m in ('streamlit', 'openpyxl', 'fpdf', 'numpy') if m in sys.modules]
+print(t, ','.join(pesados))
+"""
+
+
+def medir(importacion, repeticiones):
+    tiempos = []
+    pesados = ''
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", CODIGO_MEDICION.format(importacion=importacion)],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        tiempos.append(float(salida[0]))
+        pesados = salida[1] if len(salida) > 1 else ''
+    return statistics.median(tiempos), pesados
+
+
+def main(repeticiones=5):
+    casos = [
+        ("núcleo (balance_biogas)", "import balance_biogas"),
+        ("núcleo + exportación", "from balance_biogas import generar_excel_bytes, generar_pdf_bytes"),
+        ("script Streamlit", "import streamlit_biogas_balance_1"),
+    ]
+    for nombre, importacion in casos:
+        mediana, pesados = medir(importacion, repeticiones)
+        print(f"  {nombre:<26}: {mediana * 1000:9.2f} ms  (módulos pesados cargados: {pesados or 'ninguno'})")
+    mediana, pesados = medir("import balance_biogas", 1)
+    if pesados:
+        raise SystemExit(f"El núcleo headless importa dependencias pesadas: {pesados}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,157 @@
+# benchmarks/bench_informes.py
+# Informes por segundo y memoria pico de la exportación masiva a ZIP, y coste por informe de
+# las plantillas compiladas frente a la ruta anterior: para el PDF, saneado con str.replace por
+# carácter y todas las líneas con multi_cell; para Excel, la función generar_excel_bytes
+# anterior sin cambios (libro normal de openpyxl con todas las celdas como texto).
+# Uso: python benchmarks/bench_informes.py [escenarios] [procesos]
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas.exportacion import (
+    REEMPLAZOS_FPDF, _plantilla_pdf,
+    generar_excel_bytes, generar_pdf_bytes,
+)
+from balance_biogas.informes import exportar_informes_zip, preparar_escenario
+from bench_barrido import ESCENARIO_BASE
+
+PROYECTO = {'nombre': "Planta de referencia", 'analista': "Benchmark", 'fecha': "2026-01-01"}
+
+
+def sanear_anterior(texto):
+    texto = str(texto)
+    for original, reemplazo in REEMPLAZOS_FPDF.items():
+        texto = texto.replace(original, reemplazo)
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+
+def pdf_anterior(entradas, results, dim_digestor, project_info):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    saltar = 0
+    for operacion in _plantilla_pdf():
+        if saltar:
+            saltar -= 1
+        elif operacion[0] == 'si_uso':
+            saltar = operacion[2] if entradas['uso_biogas_opcion_idx'] != operacion[1] else 0
+        elif operacion[0] == 'linea':
+            pdf.multi_cell(0, 5, sanear_anterior(operacion[1] + str(operacion[2](entradas, results, dim_digestor))), 0, "L", new_x="LMARGIN", new_y="NEXT")
+        elif operacion[0] == 'fuente':
+            pdf.set_font("Helvetica", operacion[1], operacion[2])
+        elif operacion[0] in ('celda', 'texto'):
+            pdf.multi_cell(0, operacion[1], sanear_anterior(operacion[2]), 0, "L", new_x="LMARGIN", new_y="NEXT")
+        elif operacion[0] in ('titulo', 'subtitulo'):
+            pdf.cell(0, operacion[1], sanear_anterior(project_info['nombre']), 0, new_x="LMARGIN", new_y="NEXT", align="C")
+    return bytes(pdf.output())
+
+
+def excel_anterior(all_inputs, results_dict, dim_digestor_dict, project_info):
+    # generar_excel_bytes tal como estaba antes de las plantillas compiladas (sin cambios).
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Resumen Balance Energético"
+    header_font = Font(bold=True, size=12, color="00FFFFFF")
+    category_font = Font(bold=True)
+    bold_font = Font(bold=True)
+    ws['A1'] = f"Balance Energético Preliminar: {project_info['nombre']}"
+    ws.merge_cells('A1:D1'); ws['A1'].font = Font(bold=True, size=14); ws['A1'].alignment = Alignment(horizontal="center")
+    ws['A2'] = f"Fecha: {project_info['fecha']}"; ws['A3'] = f"Analista: {project_info['analista']}"; ws.append([])
+    def add_excel_row(sheet, data, font=None):
+        sheet.append([str(d) for d in data]) # Convertir todo a string para Excel
+        if font:
+            for cell in sheet[sheet.max_row]: cell.font = font
+    current_row_excel = ws.max_row + 1
+    add_excel_row(ws, ["PARÁMETROS DE ENTRADA"], font=header_font)
+    ws.merge_cells(start_row=current_row_excel, start_column=1, end_row=current_row_excel, end_column=3); current_row_excel +=1
+
+    input_params_excel = [
+        ("Sustrato:", 'sustrato_nombre'), ("Caudal Sustrato (kg/día):", 'caudal_sustrato_kg_dia'),
+        ("ST (%):", 'st_porcentaje'), ("SV (% de ST):", 'sv_de_st_porcentaje'),
+        ("Fuente BMP:", 'bmp_fuente_texto'), ("BMP (Nm³ CH₄/kg SV):", 'bmp_nm3_ch4_kg_sv'),
+        ("Temp. Op. Digestor (°C):", 'temp_op_digestor_c', lambda v: f"({all_inputs.get('temp_op_digestor_texto','N/A')})"),
+        ("Eficiencia Digestión (%):", 'eficiencia_digestion_porcentaje'),
+        ("%CH₄ en biogás:", 'ch4_en_biogas_porcentaje'),
+        ("Uso Principal Biogás:", 'uso_biogas_texto'),
+    ]
+    if all_inputs.get('uso_biogas_opcion_idx') == 0:
+        input_params_excel.extend([
+            ("Eficiencia Eléctrica CHP (%):", 'chp_eficiencia_electrica_porcentaje'),
+            ("Eficiencia Térmica CHP (%):", 'chp_eficiencia_termica_porcentaje')
+        ])
+    elif all_inputs.get('uso_biogas_opcion_idx') == 1:
+        input_params_excel.append(("Eficiencia Caldera (%):", 'caldera_eficiencia_porcentaje'))
+
+    for label, key, *extra in input_params_excel:
+        val = all_inputs.get(key, 'N/A')
+        row_data = [label, val]
+        if extra and callable(extra[0]): row_data.append(extra[0](val))
+        add_excel_row(ws, row_data)
+
+    ws.append([]); current_row_excel = ws.max_row
+    add_excel_row(ws, ["RESULTADOS DEL BALANCE (por día)"], font=header_font)
+    ws.merge_cells(start_row=current_row_excel, start_column=1, end_row=current_row_excel, end_column=3); current_row_excel +=1
+
+    add_excel_row(ws, ["BALANCE NETO:"], font=category_font)
+    add_excel_row(ws, ["  Electricidad Neta Exportable (kWh/día):", results_dict.get('electricidad_neta_exportable_kwh_dia',0)], font=bold_font)
+    add_excel_row(ws, ["  Calor Neto Disponible/Déficit (MJ/día):", results_dict.get('calor_neto_disponible_mj_dia',0)], font=bold_font)
+
+    for col_letter in ['A', 'B', 'C']: ws.column_dimensions[col_letter].width = 35 if col_letter == 'A' else 15
+
+    excel_stream = BytesIO()
+    wb.save(excel_stream)
+    excel_stream.seek(0)
+    return excel_stream.getvalue()
+
+
+def generar_escenarios(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    for i in range(n):
+        yield dict(ESCENARIO_BASE, nombre_escenario=f"Escenario {i + 1}", sustrato_nombre="Purín de cerdo",
+                   caudal_sustrato_kg_dia=float(rng.uniform(2000, 50000)), bmp_nm3_ch4_kg_sv=float(rng.uniform(0.2, 0.5)),
+                   uso_biogas_opcion_idx=int(rng.integers(0, 3)))
+
+
+def coste_por_informe(funcion, escenarios):
+    t0 = time.perf_counter()
+    for entradas, results, dim_digestor in escenarios:
+        funcion(entradas, results, dim_digestor, PROYECTO)
+    return (time.perf_counter() - t0) / len(escenarios)
+
+
+def main(n_escenarios=1000, procesos=os.cpu_count()):
+    muestra = [preparar_escenario(escenario) for escenario in generar_escenarios(200)]
+    print("Coste por informe (200 escenarios):")
+    for formato, anterior, actual in (("PDF ", pdf_anterior, generar_pdf_bytes), ("XLSX", excel_anterior, generar_excel_bytes)):
+        anterior(*muestra[0], PROYECTO); actual(*muestra[0], PROYECTO)
+        t_anterior, t_actual = coste_por_informe(anterior, muestra), coste_por_informe(actual, muestra)
+        print(f"  {formato}: ruta anterior {t_anterior * 1e3:6.2f} ms, plantilla {t_actual * 1e3:6.2f} ms ({t_anterior / t_actual:.1f}x)")
+
+    print(f"Exportación a ZIP de {n_escenarios:,} escenarios (PDF + XLSX):")
+    for n_procesos in sorted({1, procesos}):
+        resumen = exportar_informes_zip(generar_escenarios(n_escenarios), BytesIO(), PROYECTO, procesos=n_procesos)
+        print(f"  {n_procesos} proceso(s): {resumen['informes']:,} informes en {resumen['segundos']:.2f} s "
+              f"({resumen['informes_por_segundo']:,.0f} informes/s, {resumen['bytes'] / 2**20:.1f} MiB)")
+
+    # Memoria pico del proceso principal escribiendo el ZIP en disco (sin acumular en memoria).
+    ruta_zip = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_bench_informes.zip")
+    tracemalloc.start()
+    try:
+        exportar_informes_zip(generar_escenarios(n_escenarios), ruta_zip, PROYECTO)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        os.remove(ruta_zip)
+    print(f"  Memoria pico (tracemalloc, 1 proceso, ZIP en disco): {pico / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count())
@@ -0,0 +1,60 @@
+# benchmarks/bench_instrumentacion.py
+# Sobrecoste de la instrumentación: llamadas escalares al balance (la función más corta que lleva
+# tramo) y lotes vectorizados pequeños, sin decorador, con la instrumentación desactivada y
+# activada. Desactivada debe quedar en el ruido de la medida.
+# Uso: python benchmarks/bench_instrumentacion.py [n_llamadas]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas import instrumentacion
+from balance_biogas.calculos import calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.lote import calcular_escenarios_lote
+from bench_barrido import ESCENARIO_BASE
+
+REPETICIONES = 7
+
+
+def pasada(funcion, argumento, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        funcion(argumento)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def comparar(funcion, argumento, n):
+    """Mejor tiempo por llamada (µs) sin decorador, desactivada y activada. Los tres modos se
+    alternan en cada repetición para que el calentamiento y el ruido les afecten por igual."""
+    modos = {'sin decorador': (funcion.__wrapped__, False), 'desactivada': (funcion, False), 'activada': (funcion, True)}
+    mejores = dict.fromkeys(modos, float('inf'))
+    for _ in range(REPETICIONES):
+        for modo, (llamada, activa) in modos.items():
+            instrumentacion.activar(activa)
+            mejores[modo] = min(mejores[modo], pasada(llamada, argumento, n))
+    instrumentacion.activar(False)
+    return mejores
+
+
+def main(n=100000):
+    entradas = dict(ESCENARIO_BASE, area_superficial_digestor_m2=calcular_dimensiones_digestor(
+        ESCENARIO_BASE['caudal_sustrato_kg_dia'], ESCENARIO_BASE['trh_dias'])['area_superficial_digestor_m2'])
+    entradas_lote = {clave: np.full(64, valor) for clave, valor in ESCENARIO_BASE.items()}
+    casos = (("Balance escalar", realizar_calculos_balance, entradas, n),
+             ("Lote de 64 escenarios", calcular_escenarios_lote, entradas_lote, n // 20))
+    print(f"Mejor de {REPETICIONES} pasadas (µs por llamada):")
+    for nombre, funcion, argumento, llamadas in casos:
+        mejores = comparar(funcion, argumento, llamadas)
+        base = mejores['sin decorador']
+        print(f"  {nombre:<22}: sin decorador {base:8.2f}, desactivada {mejores['desactivada']:8.2f} "
+              f"({100 * (mejores['desactivada'] / base - 1):+.1f}%), activada {mejores['activada']:8.2f} "
+              f"({100 * (mejores['activada'] / base - 1):+.1f}%)")
+    print(f"  Tramos registrados con la instrumentación activada: "
+          f"{sum(estadistica['n'] for estadistica in instrumentacion.instantanea()['tramos'].values()):,}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
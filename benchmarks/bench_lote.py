@@ -0,0 +1,75 @@
+# benchmarks/bench_lote.py
+# Escenarios/s del motor vectorizado frente a un bucle sobre las funciones escalares.
+# Uso: python benchmarks/bench_lote.py [n_escenarios]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas import calcular_dimensiones_digestor, realizar_calculos_balance, calcular_escenarios_lote
+
+
+def generar_escenarios(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return {
+        'caudal_sustrato_kg_dia': rng.uniform(0.0, 50000.0, n),
+        'trh_dias': rng.uniform(1.0, 60.0, n),
+        'st_porcentaje': rng.uniform(2.0, 40.0, n),
+        'sv_de_st_porcentaje': rng.uniform(50.0, 95.0, n),
+        'bmp_nm3_ch4_kg_sv': rng.uniform(0.15, 0.5, n),
+        'eficiencia_digestion_porcentaje': rng.uniform(40.0, 95.0, n),
+        'ch4_en_biogas_porcentaje': rng.choice([0.0, 50.0, 55.0, 60.0, 65.0], n),
+        'cp_sustrato_kj_kg_c': np.full(n, 4.186),
+        'temp_op_digestor_c': rng.choice([38.0, 52.0], n),
+        'temp_sustrato_entrada_c': rng.uniform(0.0, 30.0, n),
+        'u_digestor_w_m2_k': rng.uniform(0.3, 3.0, n),
+        'temp_ambiente_promedio_c': rng.uniform(-5.0, 45.0, n),
+        'uso_biogas_opcion_idx': rng.integers(0, 3, n).astype(float),
+        'chp_eficiencia_electrica_porcentaje': rng.uniform(30.0, 42.0, n),
+        'chp_eficiencia_termica_porcentaje': rng.uniform(35.0, 50.0, n),
+        'caldera_eficiencia_porcentaje': rng.uniform(80.0, 95.0, n),
+        'consumo_electrico_aux_kwh_ton_sustrato': rng.uniform(10.0, 50.0, n),
+    }
+
+
+def bucle_escalar(escenarios):
+    n = len(escenarios['caudal_sustrato_kg_dia'])
+    columnas = {clave: valores.tolist() for clave, valores in escenarios.items()}
+    filas = []
+    for i in range(n):
+        inputs_calc = {clave: valores[i] for clave, valores in columnas.items()}
+        dim_digestor = calcular_dimensiones_digestor(inputs_calc['caudal_sustrato_kg_dia'], inputs_calc['trh_dias'])
+        inputs_calc['area_superficial_digestor_m2'] = dim_digestor['area_superficial_digestor_m2']
+        results = realizar_calculos_balance(inputs_calc)
+        results.update(dim_digestor)
+        filas.append(results)
+    return filas
+
+
+def main(n=100000):
+    escenarios = generar_escenarios(n)
+
+    t0 = time.perf_counter()
+    filas = bucle_escalar(escenarios)
+    t_escalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    lote = calcular_escenarios_lote(escenarios)
+    t_lote = time.perf_counter() - t0
+
+    for clave, valores in lote.items():
+        esperado = np.array([fila[clave] for fila in filas], dtype=float)
+        if not np.array_equal(valores, esperado):
+            raise SystemExit(f"Discrepancia en '{clave}' entre el camino escalar y el vectorizado")
+
+    print(f"Escenarios: {n}")
+    print(f"  Bucle escalar : {n / t_escalar:14,.0f} escenarios/s ({t_escalar:.3f} s)")
+    print(f"  Lote NumPy    : {n / t_lote:14,.0f} escenarios/s ({t_lote:.3f} s)")
+    print(f"  Aceleración   : {t_escalar / t_lote:.1f}x (resultados idénticos)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
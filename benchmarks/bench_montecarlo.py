@@ -0,0 +1,59 @@
+# benchmarks/bench_montecarlo.py
+# Muestras/s y memoria pico del motor Monte Carlo para distintos números de muestras, y error
+# de los percentiles en flujo frente a np.percentile sobre la muestra completa.
+# Uso: python benchmarks/bench_montecarlo.py
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas.lote import calcular_escenarios_lote
+from balance_biogas.montecarlo import _muestrear, simular_montecarlo
+from bench_barrido import ESCENARIO_BASE
+
+DISTRIBUCIONES = {
+    'bmp_nm3_ch4_kg_sv': ('triangular', 0.25, 0.35, 0.42),
+    'st_porcentaje': ('normal', 20.0, 2.0, 0.0, 100.0),
+    'eficiencia_digestion_porcentaje': ('uniforme', 60.0, 85.0),
+    'u_digestor_w_m2_k': ('uniforme', 0.3, 1.5),
+    'chp_eficiencia_electrica_porcentaje': ('normal', 35.0, 1.5),
+}
+
+
+def error_percentiles(n, semilla=0):
+    resumen = simular_montecarlo(ESCENARIO_BASE, DISTRIBUCIONES, n, semilla=semilla, tamano_bloque=n)
+    rng = np.random.default_rng(semilla)
+    entradas = dict(ESCENARIO_BASE)
+    for nombre, distribucion in DISTRIBUCIONES.items():
+        entradas[nombre] = _muestrear(rng, distribucion, n)
+    exactos = calcular_escenarios_lote(entradas)
+    errores = []
+    for salida, estadisticos in resumen['salidas'].items():
+        rango = np.percentile(exactos[salida], 90) - np.percentile(exactos[salida], 10)
+        for q in (10, 50, 90):
+            errores.append(abs(estadisticos[f'P{q}'] - np.percentile(exactos[salida], q)) / rango)
+    return max(errores)
+
+
+def main():
+    for n in (10**5, 10**6):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        resumen = simular_montecarlo(ESCENARIO_BASE, DISTRIBUCIONES, n, semilla=1)
+        t = time.perf_counter() - t0
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        electricidad = resumen['salidas']['electricidad_neta_exportable_kwh_dia']
+        print(f"Muestras: {n:>9,}  {n / t:12,.0f} muestras/s  memoria pico {pico / 2**20:6.1f} MiB  "
+              f"P10/P50/P90 electricidad: {electricidad['P10']:.1f} / {electricidad['P50']:.1f} / {electricidad['P90']:.1f}")
+    resumen = simular_montecarlo(ESCENARIO_BASE, DISTRIBUCIONES, 10**6, semilla=1, tolerancia_convergencia=0.002)
+    print(f"Parada temprana (tolerancia 0.2% del rango P10-P90): {resumen['n_muestras']:,} muestras")
+    print(f"Error máximo de percentiles frente a np.percentile (10^5 muestras): {error_percentiles(10**5) * 100:.4f}% del rango P10-P90")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_optimizacion.py
+# Tiempo de optimizar la receta de co-digestión con 40 sustratos candidatos y varios TRH, y
+# comparación con una búsqueda aleatoria de recetas evaluadas con el motor vectorizado: el
+# óptimo debe igualar o superar a la mejor receta aleatoria que cumple las restricciones.
+# Uso: python benchmarks/bench_optimizacion.py [recetas_aleatorias]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas.lote import calcular_escenarios_lote
+from balance_biogas.optimizacion import optimizar_mezcla
+from balance_biogas.sustratos import BibliotecaSustratos
+from bench_barrido import ESCENARIO_BASE
+
+N_SUSTRATOS = 40
+TRH_OPCIONES = (15, 20, 25, 30, 35, 40)
+ST_MAX_PORCENTAJE = 12.0
+VOLUMEN_MAX_M3 = 3000.0
+
+
+def busqueda_aleatoria(biblioteca, maximos, n_recetas, semilla=0):
+    """Mejor electricidad neta entre recetas aleatorias (corriente equivalente + balance vectorizado)."""
+    rng = np.random.default_rng(semilla)
+    caudales = rng.uniform(0, 1, (n_recetas, len(maximos))) ** 4 * maximos
+    trh = rng.choice(TRH_OPCIONES, n_recetas).astype(float)
+    total = caudales.sum(axis=1)
+    st = caudales @ biblioteca.fraccion_st
+    sv = caudales @ biblioteca.fraccion_sv
+    cp = caudales @ biblioteca.columna('cp_sustrato_kj_kg_c')
+    entradas = dict(ESCENARIO_BASE)
+    entradas.update(
+        caudal_sustrato_kg_dia=total, trh_dias=trh,
+        st_porcentaje=100 * st / total, sv_de_st_porcentaje=100 * sv / st,
+        bmp_nm3_ch4_kg_sv=(caudales @ biblioteca.ch4_nm3_kg_fresco) / sv,
+        cp_sustrato_kj_kg_c=cp / total,
+        temp_sustrato_entrada_c=(caudales @ (biblioteca.columna('cp_sustrato_kj_kg_c') * biblioteca.columna('temp_sustrato_entrada_c'))) / cp,
+    )
+    results = calcular_escenarios_lote(entradas)
+    factibles = ((entradas['st_porcentaje'] <= ST_MAX_PORCENTAJE) & (results['volumen_digestor_m3'] <= VOLUMEN_MAX_M3)
+                 & (results['calor_neto_disponible_mj_dia'] >= 0))
+    electricidad = np.where(factibles, results['electricidad_neta_exportable_kwh_dia'], -np.inf)
+    return float(electricidad.max()), int(factibles.sum())
+
+
+def main(n_recetas=200000):
+    biblioteca = BibliotecaSustratos()
+    rng = np.random.default_rng(1)
+    for i in range(len(biblioteca), N_SUSTRATOS):
+        biblioteca.agregar(f"Sustrato {i}", "Otros", rng.uniform(3, 40), rng.uniform(60, 95), rng.uniform(0.2, 0.6))
+    maximos = rng.uniform(1000, 20000, N_SUSTRATOS)
+    disponibilidad = dict(zip(biblioteca.nombres, maximos))
+
+    optimizar_mezcla(ESCENARIO_BASE, biblioteca, {biblioteca.nombres[0]: 1000.0})  # importa scipy fuera del cronómetro
+    t0 = time.perf_counter()
+    optimo = optimizar_mezcla(ESCENARIO_BASE, biblioteca, disponibilidad, trh_opciones=TRH_OPCIONES,
+                              st_max_porcentaje=ST_MAX_PORCENTAJE, volumen_max_m3=VOLUMEN_MAX_M3)
+    t_optimo = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    mejor_aleatoria, n_factibles = busqueda_aleatoria(biblioteca, maximos, n_recetas)
+    t_aleatoria = time.perf_counter() - t0
+
+    electricidad_optima = optimo['resultados']['electricidad_neta_exportable_kwh_dia']
+    if electricidad_optima < mejor_aleatoria - 1e-6 * abs(mejor_aleatoria):
+        raise SystemExit("La búsqueda aleatoria encuentra una receta mejor que el óptimo")
+    if optimo['resultados']['calor_neto_disponible_mj_dia'] < -1e-6 or optimo['entradas_balance']['st_porcentaje'] > ST_MAX_PORCENTAJE + 1e-9:
+        raise SystemExit("El óptimo no cumple las restricciones")
+    print(f"{N_SUSTRATOS} sustratos, {len(TRH_OPCIONES)} TRH candidatos:")
+    print(f"  Optimizador (LP)   : {t_optimo:6.3f} s, {optimo['n_programas_lineales']} programas lineales, "
+          f"{electricidad_optima:,.1f} kWh/día (TRH {optimo['trh_dias']:.0f} d, {len(optimo['caudales'])} sustratos)")
+    print(f"  Búsqueda aleatoria : {t_aleatoria:6.3f} s, {n_recetas:,} recetas ({n_factibles:,} factibles), "
+          f"mejor {mejor_aleatoria:,.1f} kWh/día")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
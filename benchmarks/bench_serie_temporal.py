@@ -0,0 +1,82 @@
+# benchmarks/bench_serie_temporal.py
+# Simulación horaria de 20 años para cientos de plantas, desde memoria y desde CSV/Parquet.
+# Comprueba además que con temperatura constante se recupera el balance diario escalar.
+# Uso: python benchmarks/bench_serie_temporal.py [n_plantas] [años]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas import calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.serie_temporal import leer_series_por_bloques, simular_serie
+from bench_barrido import ESCENARIO_BASE
+
+
+def serie_sintetica(años, semilla=0):
+    rng = np.random.default_rng(semilla)
+    marcas = np.arange(np.datetime64('2030-01-01T00'), np.datetime64(f'{2030 + años}-01-01T00'), dtype='datetime64[h]')
+    horas = np.arange(marcas.size)
+    temp_ambiente = 12 - 10 * np.cos(2 * np.pi * horas / 8766) - 4 * np.cos(2 * np.pi * horas / 24) + rng.normal(0, 2, marcas.size)
+    return {
+        'marca_tiempo': marcas,
+        'temp_ambiente_c': temp_ambiente,
+        'temp_sustrato_entrada_c': np.clip(temp_ambiente + 3, 2, None),
+        'caudal_sustrato_kg_dia': 10000 * (1 + 0.1 * np.sin(2 * np.pi * horas / 168)),
+    }
+
+
+def plantas(n, semilla=1):
+    rng = np.random.default_rng(semilla)
+    base = {clave: np.full(n, valor, dtype=float) for clave, valor in ESCENARIO_BASE.items()}
+    base['caudal_sustrato_kg_dia'] = rng.uniform(5000, 50000, n)
+    base['u_digestor_w_m2_k'] = rng.uniform(0.3, 2.0, n)
+    return base
+
+
+def comprobar_constante():
+    marcas = np.arange(np.datetime64('2030-01-01T00'), np.datetime64('2031-01-01T00'), dtype='datetime64[h]')
+    series = {'marca_tiempo': marcas, 'temp_ambiente_c': np.full(marcas.size, ESCENARIO_BASE['temp_ambiente_promedio_c'])}
+    resumen = simular_serie(ESCENARIO_BASE, series)
+    inputs_calc = dict(ESCENARIO_BASE)
+    inputs_calc['area_superficial_digestor_m2'] = calcular_dimensiones_digestor(
+        ESCENARIO_BASE['caudal_sustrato_kg_dia'], ESCENARIO_BASE['trh_dias'])['area_superficial_digestor_m2']
+    diario = realizar_calculos_balance(inputs_calc)['calor_neto_disponible_mj_dia']
+    anual = resumen['anual']['calor_neto_disponible_mj'][0, 0]
+    if not np.isclose(anual, diario * 365, rtol=1e-9):
+        raise SystemExit(f"La simulación horaria con temperatura constante no reproduce el balance diario ({anual} != {diario * 365})")
+
+
+def main(n_plantas=200, años=20):
+    comprobar_constante()
+    series = serie_sintetica(años)
+    base = plantas(n_plantas)
+    n_plantas_hora = n_plantas * series['marca_tiempo'].size
+
+    t0 = time.perf_counter()
+    resumen = simular_serie(base, series)
+    t = time.perf_counter() - t0
+    print(f"{n_plantas} plantas x {años} años horarios ({n_plantas_hora:,} planta-horas)")
+    print(f"  Desde memoria : {t:.2f} s ({n_plantas_hora / t:14,.0f} planta-horas/s)")
+
+    import pandas as pd
+    with tempfile.TemporaryDirectory() as directorio:
+        tabla = pd.DataFrame(series)
+        for formato in ('csv', 'parquet'):
+            ruta = os.path.join(directorio, f"serie.{formato}")
+            tabla.to_csv(ruta, index=False) if formato == 'csv' else tabla.to_parquet(ruta, index=False)
+            t0 = time.perf_counter()
+            desde_fichero = simular_serie(base, leer_series_por_bloques(ruta))
+            t = time.perf_counter() - t0
+            print(f"  Desde {formato:<8}: {t:.2f} s ({n_plantas_hora / t:14,.0f} planta-horas/s)")
+            if not np.allclose(desde_fichero['anual']['calor_neto_disponible_mj'], resumen['anual']['calor_neto_disponible_mj']):
+                raise SystemExit(f"La lectura por bloques de {formato} no reproduce la simulación en memoria")
+
+    print(f"  Horas con déficit térmico (mediana por planta): {int(np.median(resumen['horas_deficit_termico'])):,}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,99 @@
+# benchmarks/bench_servicio.py
+# Prueba de carga local del servicio HTTP: arranca el servicio en otro proceso y lanza N clientes
+# concurrentes (conexiones persistentes) que piden balances. Mide latencia p50/p99 y peticiones/s
+# con micro-lotes, sin micro-lotes (--lote-maximo 1) y con la caché caliente, y después la
+# generación de informes PDF en el pool de procesos.
+# Uso: python benchmarks/bench_servicio.py [clientes] [peticiones_por_cliente]
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_barrido import ESCENARIO_BASE
+
+
+def arrancar_servicio(*opciones):
+    proceso = subprocess.Popen([sys.executable, "-m", "balance_biogas.servicio", "--puerto", "0", *opciones],
+                               cwd=RAIZ, stderr=subprocess.PIPE, text=True)
+    linea = proceso.stderr.readline()
+    coincidencia = re.search(r":(\d+)\s*$", linea)
+    if coincidencia is None:
+        proceso.kill()
+        raise SystemExit(f"El servicio no arrancó: {linea}")
+    return proceso, int(coincidencia.group(1))
+
+
+def cuerpos_balance(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return [json.dumps(dict(ESCENARIO_BASE, caudal_sustrato_kg_dia=float(caudal), bmp_nm3_ch4_kg_sv=float(bmp))).encode()
+            for caudal, bmp in zip(rng.uniform(2000, 50000, n), rng.uniform(0.2, 0.5, n))]
+
+
+async def cliente(puerto, ruta, cuerpos, latencias):
+    reader, writer = await asyncio.open_connection("127.0.0.1", puerto)
+    try:
+        for cuerpo in cuerpos:
+            t0 = time.perf_counter()
+            writer.write(f"POST {ruta} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(cuerpo)}\r\n\r\n".encode() + cuerpo)
+            cabecera = await reader.readuntil(b"\r\n\r\n")
+            longitud = int(re.search(rb"Content-Length: (\d+)", cabecera).group(1))
+            await reader.readexactly(longitud)
+            if not cabecera.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(cabecera.split(b"\r\n", 1)[0].decode())
+            latencias.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+
+async def carga(puerto, ruta, cuerpos, clientes):
+    """Reparte los cuerpos entre los clientes y devuelve (latencias, segundos totales)."""
+    latencias = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente(puerto, ruta, cuerpos[i::clientes], latencias) for i in range(clientes)))
+    return np.array(latencias), time.perf_counter() - t0
+
+
+async def estadisticas(puerto):
+    reader, writer = await asyncio.open_connection("127.0.0.1", puerto)
+    writer.write(b"GET /estadisticas HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    respuesta = await reader.read()
+    writer.close()
+    return json.loads(respuesta.split(b"\r\n\r\n", 1)[1])
+
+
+def informar(nombre, latencias, segundos):
+    print(f"  {nombre:<34}: {len(latencias) / segundos:8,.0f} peticiones/s, "
+          f"p50 {np.percentile(latencias, 50) * 1e3:7.1f} ms, p99 {np.percentile(latencias, 99) * 1e3:7.1f} ms")
+
+
+def main(clientes=1000, peticiones_por_cliente=10):
+    n = clientes * peticiones_por_cliente
+    cuerpos = cuerpos_balance(n)
+    print(f"{clientes:,} clientes concurrentes, {n:,} peticiones POST /balance:")
+    for nombre, opciones in (("Sin micro-lotes (lote máximo 1)", ("--lote-maximo", "1", "--cache-entradas", "0")),
+                             ("Con micro-lotes", ())):
+        proceso, puerto = arrancar_servicio(*opciones)
+        try:
+            informar(nombre, *asyncio.run(carga(puerto, "/balance", cuerpos, clientes)))
+            if not opciones:
+                informar("Con micro-lotes, caché caliente", *asyncio.run(carga(puerto, "/balance", cuerpos, clientes)))
+                resumen = asyncio.run(estadisticas(puerto))
+                print(f"  Escenarios por lote: {resumen['escenarios_por_lote']:.1f}, aciertos de caché: {resumen['cache_aciertos']:,}")
+                cuerpos_informe = [b'{"entradas":' + cuerpo + b'}' for cuerpo in cuerpos_balance(200, semilla=1)]
+                informar("POST /informe/pdf (50 clientes)", *asyncio.run(carga(puerto, "/informe/pdf", cuerpos_informe, 50)))
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,74 @@
+# benchmarks/bench_sustratos.py
+# Coste de recalcular el balance de una receta de 15 componentes tras cambiar un caudal:
+# actualización incremental de la mezcla frente a reagregar la receta completa.
+# Comprueba además que la corriente equivalente reproduce la suma de los componentes.
+# Uso: python benchmarks/bench_sustratos.py [repeticiones]
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas import calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.sustratos import BibliotecaSustratos, MezclaSustratos
+from bench_barrido import ESCENARIO_BASE
+
+
+def balance_mezcla(mezcla):
+    inputs_calc = dict(ESCENARIO_BASE)
+    inputs_calc.update(mezcla.entradas_balance())
+    inputs_calc['area_superficial_digestor_m2'] = calcular_dimensiones_digestor(
+        inputs_calc['caudal_sustrato_kg_dia'], inputs_calc['trh_dias'])['area_superficial_digestor_m2']
+    return realizar_calculos_balance(inputs_calc)
+
+
+def comprobar_equivalencia(biblioteca, mezcla):
+    resultado = balance_mezcla(mezcla)
+    sv = ch4 = calor = 0.0
+    for nombre, caudal in mezcla.caudales.items():
+        datos = biblioteca.datos(nombre)
+        componente = dict(ESCENARIO_BASE, caudal_sustrato_kg_dia=caudal, area_superficial_digestor_m2=0.0,
+                          **{clave: datos[clave] for clave in ('st_porcentaje', 'sv_de_st_porcentaje', 'bmp_nm3_ch4_kg_sv',
+                                                              'temp_sustrato_entrada_c', 'cp_sustrato_kj_kg_c')})
+        parcial = realizar_calculos_balance(componente)
+        sv += parcial['sv_alimentado_kg_dia']
+        ch4 += parcial['ch4_producido_nm3_dia']
+        calor += parcial['calor_calentar_sustrato_mj_dia']
+    for clave, esperado in (('sv_alimentado_kg_dia', sv), ('ch4_producido_nm3_dia', ch4), ('calor_calentar_sustrato_mj_dia', calor)):
+        if not math.isclose(resultado[clave], esperado, rel_tol=1e-9):
+            raise SystemExit(f"La mezcla no reproduce la suma de componentes en '{clave}'")
+
+
+def main(repeticiones=2000):
+    biblioteca = BibliotecaSustratos()
+    rng = np.random.default_rng(0)
+    for i in range(len(biblioteca), 15):
+        biblioteca.agregar(f"Sustrato {i}", "Otros", rng.uniform(3, 40), rng.uniform(60, 95), rng.uniform(0.2, 0.6))
+    receta = {nombre: float(rng.uniform(500, 20000)) for nombre in biblioteca.nombres[:15]}
+    mezcla = MezclaSustratos(biblioteca, receta)
+    comprobar_equivalencia(biblioteca, mezcla)
+
+    nombres = list(receta)
+    t0 = time.perf_counter()
+    for i in range(repeticiones):
+        mezcla.fijar_caudal(nombres[i % 15], 1000.0 + i)
+        balance_mezcla(mezcla)
+    t_incremental = (time.perf_counter() - t0) / repeticiones
+
+    t0 = time.perf_counter()
+    for i in range(repeticiones):
+        receta[nombres[i % 15]] = 1000.0 + i
+        balance_mezcla(MezclaSustratos(biblioteca, receta))
+    t_completo = (time.perf_counter() - t0) / repeticiones
+
+    comprobar_equivalencia(biblioteca, mezcla)
+    print("Receta de 15 componentes, cambio de un caudal + balance:")
+    print(f"  Incremental        : {t_incremental * 1e6:8.1f} µs por recálculo")
+    print(f"  Reagregación total : {t_completo * 1e6:8.1f} µs por recálculo")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,59 @@
+# benchmarks/bench_upgrading.py
+# Escenarios/s de la rama de upgrading a biometano en el motor vectorizado (todas las
+# tecnologías a la vez), comprobación contra las funciones escalares en una muestra y
+# resumen por tecnología del escenario de referencia.
+# Uso: python benchmarks/bench_upgrading.py [n_escenarios]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_biogas import calcular_escenarios_lote
+from balance_biogas.calculos import TECNOLOGIAS_UPGRADING
+from balance_biogas.informes import preparar_escenario
+from bench_barrido import ESCENARIO_BASE
+
+
+def generar_escenarios(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    entradas = {clave: np.full(n, float(valor)) for clave, valor in ESCENARIO_BASE.items()}
+    entradas.update(
+        caudal_sustrato_kg_dia=rng.uniform(2000.0, 50000.0, n),
+        bmp_nm3_ch4_kg_sv=rng.uniform(0.2, 0.5, n),
+        ch4_en_biogas_porcentaje=rng.uniform(50.0, 65.0, n),
+        uso_biogas_opcion_idx=np.full(n, 2.0),
+        upgrading_tecnologia_idx=rng.integers(0, len(TECNOLOGIAS_UPGRADING), n).astype(float),
+        presion_inyeccion_red_bar=rng.choice([1.1, 4.0, 16.0, 40.0], n),
+    )
+    return entradas
+
+
+def main(n=1000000):
+    entradas = generar_escenarios(n)
+    t0 = time.perf_counter()
+    lote = calcular_escenarios_lote(entradas)
+    t_lote = time.perf_counter() - t0
+    print(f"{n:,} escenarios de upgrading: {t_lote:.3f} s ({n / t_lote:,.0f} escenarios/s)")
+
+    for i in np.random.default_rng(1).integers(0, n, 1000):
+        _, results, _ = preparar_escenario({clave: float(valores[i]) for clave, valores in entradas.items()})
+        for clave, valor in results.items():
+            if lote[clave][i] != valor:
+                raise SystemExit(f"Discrepancia en '{clave}' (escenario {i}): {lote[clave][i]!r} != {valor!r}")
+    print("  Muestra de 1,000 escenarios idéntica a las funciones escalares")
+
+    referencia = calcular_escenarios_lote(dict(ESCENARIO_BASE, uso_biogas_opcion_idx=2,
+                                               upgrading_tecnologia_idx=np.arange(len(TECNOLOGIAS_UPGRADING))))
+    print("  Escenario de referencia (16 bar a en red):")
+    for j, (nombre, *_) in enumerate(TECNOLOGIAS_UPGRADING):
+        print(f"    {nombre:<16} {referencia['biometano_producido_nm3_dia'][j]:8,.1f} Nm³/día biometano, "
+              f"recuperación {referencia['recuperacion_ch4_porcentaje'][j]:5.1f} %, "
+              f"electricidad neta {referencia['electricidad_neta_exportable_kwh_dia'][j]:9,.1f} kWh/día, "
+              f"calor neto {referencia['calor_neto_disponible_mj_dia'][j]:9,.1f} MJ/día")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,314 @@
+# benchmarks/suite_regresion.py
+# Suite reproducible de rendimiento y de resultados de las rutas críticas de cálculo y exportación.
+#
+# - Rendimiento: para cada caso (función y número de escenarios) mide escenarios/s, latencia por
+#   llamada (p50, p95, p99) y memoria pico de una pasada (tracemalloc), y lo compara con la línea
+#   base guardada en linea_base.json. Una caída de rendimiento o un aumento de memoria por encima
+#   de la tolerancia termina con código 1. La línea base depende de la máquina; en máquinas con
+#   tiempos ruidosos (p. ej. CI compartida) --solo-avisar las deja como avisos.
+# - La línea base solo se regenera (--guardar-linea-base) si las medidas nuevas no son una
+#   regresión frente a la guardada: así una regresión no se puede absorber reescribiendo la
+#   línea base. Para aceptar una regresión intencionada hay que pedirlo con --aceptar-regresiones.
+# - Resultados: compara el motor escalar y el vectorizado con los valores de referencia de
+#   valores_referencia.json (ramas CHP, caldera y upgrading, con eficiencia fija y modelos
+#   cinéticos), y el vectorizado con el escalar sobre escenarios aleatorios. Cualquier motor más
+#   rápido tiene que dar los mismos números. Una diferencia siempre termina con código 1; la
+#   misma comprobación se ejecuta con pytest en tests/test_lote.py.
+#
+# Uso: python benchmarks/suite_regresion.py [--rapido] [--tolerancia 0.3] [--solo-avisar]
+#                                            [--guardar-linea-base [--aceptar-regresiones]]
+#                                            [--solo-resultados] [--salida resultados.json]
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from balance_biogas.calculos import calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.exportacion import generar_excel_bytes, generar_pdf_bytes, sanitize_text_for_fpdf
+from balance_biogas.informes import VALORES_POR_DEFECTO, preparar_escenario
+from balance_biogas.lote import VALORES_BALANCE_POR_DEFECTO, calcular_escenarios_lote, realizar_calculos_balance_lote
+from bench_barrido import ESCENARIO_BASE
+from bench_lote import bucle_escalar, generar_escenarios
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RUTA_LINEA_BASE = os.path.join(DIRECTORIO, "linea_base.json")
+RUTA_REFERENCIA = os.path.join(DIRECTORIO, "valores_referencia.json")
+
+TOLERANCIA_RENDIMIENTO = 0.30
+TOLERANCIA_MEMORIA = 0.20
+MARGEN_MEMORIA_MB = 1.0
+TOLERANCIA_RELATIVA_RESULTADOS = 1e-9
+TOLERANCIA_ABSOLUTA_RESULTADOS = 1e-9
+SEGUNDOS_MINIMOS = 0.5
+PASADAS_MINIMAS = 3
+PASADAS_MAXIMAS = 50
+ESCENARIOS_ALEATORIOS = 5000
+
+PROYECTO = {'nombre': "Planta de referencia", 'analista': "Suite de regresión", 'fecha': "2026-01-01"}
+TEXTOS_SANEADO = (
+    "Biogás Total Producido (Nm³/día)", "CH₄ en biogás (%)", "Temperatura de operación: 38 °C",
+    "Energía térmica → digestor", "Análisis «preliminar» — Equipo de Diseño", "Ñandú ≤ 5 m² · ∆T",
+)
+
+
+# --- CASOS DE RENDIMIENTO ---
+# Cada preparación devuelve (función, lista de argumentos de una pasada sobre n escenarios,
+# escenarios por llamada). Las funciones escalares se llaman una vez por escenario; las
+# vectorizadas, una vez con los n escenarios.
+def _entradas_escalares(n):
+    escenarios = generar_escenarios(n)
+    columnas = {clave: valores.tolist() for clave, valores in escenarios.items()}
+    return [{clave: valores[i] for clave, valores in columnas.items()} for i in range(n)]
+
+
+def preparar_dimensiones(n):
+    return calcular_dimensiones_digestor, [(e['caudal_sustrato_kg_dia'], e['trh_dias']) for e in _entradas_escalares(n)], 1
+
+
+def preparar_balance_escalar(n):
+    entradas = _entradas_escalares(n)
+    for e in entradas:
+        e['area_superficial_digestor_m2'] = calcular_dimensiones_digestor(e['caudal_sustrato_kg_dia'], e['trh_dias'])['area_superficial_digestor_m2']
+    return realizar_calculos_balance, [(e,) for e in entradas], 1
+
+
+def preparar_balance_lote(n):
+    entradas = generar_escenarios(n)
+    entradas['area_superficial_digestor_m2'] = calcular_escenarios_lote(entradas)['area_superficial_digestor_m2']
+    return realizar_calculos_balance_lote, [(entradas,)], n
+
+
+def preparar_saneado(n):
+    return sanitize_text_for_fpdf, [(f"{TEXTOS_SANEADO[i % len(TEXTOS_SANEADO)]} {i}",) for i in range(n)], 1
+
+
+def _argumentos_informe(n):
+    rng = np.random.default_rng(0)
+    argumentos = []
+    for i in range(n):
+        entradas, results, dim_digestor = preparar_escenario(dict(
+            ESCENARIO_BASE, caudal_sustrato_kg_dia=float(rng.uniform(2000, 50000)), uso_biogas_opcion_idx=i % 3,
+            upgrading_tecnologia_idx=(i // 3) % 4, caldera_eficiencia_porcentaje=90.0))
+        argumentos.append((entradas, results, dim_digestor, PROYECTO))
+    return argumentos
+
+
+def preparar_excel(n):
+    return generar_excel_bytes, _argumentos_informe(n), 1
+
+
+def preparar_pdf(n):
+    return generar_pdf_bytes, _argumentos_informe(n), 1
+
+
+# nombre: (preparación, números de escenarios; el primero es el de --rapido)
+CASOS = {
+    'calcular_dimensiones_digestor': (preparar_dimensiones, (1000, 100000)),
+    'realizar_calculos_balance': (preparar_balance_escalar, (1000, 20000)),
+    'realizar_calculos_balance_lote': (preparar_balance_lote, (1000, 100000, 1000000)),
+    'sanitize_text_for_fpdf': (preparar_saneado, (1000, 100000)),
+    'generar_excel_bytes': (preparar_excel, (20, 200)),
+    'generar_pdf_bytes': (preparar_pdf, (20, 200)),
+}
+
+
+def medir_caso(funcion, argumentos, escenarios_por_llamada):
+    """Latencias por llamada repitiendo la pasada hasta SEGUNDOS_MINIMOS (entre PASADAS_MINIMAS y
+    PASADAS_MAXIMAS), escenarios/s de la pasada más rápida (la menos afectada por el resto de la
+    máquina) y memoria pico de una pasada conservando los resultados."""
+    funcion(*argumentos[0])
+    latencias = []
+    pasadas = []
+    while len(pasadas) < PASADAS_MINIMAS or (math.fsum(pasadas) < SEGUNDOS_MINIMOS and len(pasadas) < PASADAS_MAXIMAS):
+        for args in argumentos:
+            t0 = time.perf_counter()
+            funcion(*args)
+            latencias.append(time.perf_counter() - t0)
+        pasadas.append(math.fsum(latencias[-len(argumentos):]))
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    resultados = [funcion(*args) for args in argumentos]
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultados
+    latencias_us = np.array(latencias) * 1e6
+    return {
+        'escenarios_por_s': len(argumentos) * escenarios_por_llamada / min(pasadas),
+        'p50_us': float(np.percentile(latencias_us, 50)),
+        'p95_us': float(np.percentile(latencias_us, 95)),
+        'p99_us': float(np.percentile(latencias_us, 99)),
+        'pico_memoria_mb': (pico - base) / 2**20,
+        'pasadas': len(pasadas),
+    }
+
+
+def ejecutar_rendimiento(rapido=False):
+    medidas = {}
+    for nombre, (preparar, tamanos) in CASOS.items():
+        for n in tamanos[:1] if rapido else tamanos:
+            medidas[f"{nombre}[{n}]"] = medir_caso(*preparar(n))
+    return medidas
+
+
+def comparar_con_linea_base(medidas, linea_base, tolerancia, tolerancia_memoria):
+    """Lista de regresiones (texto) de las medidas frente a la línea base."""
+    regresiones = []
+    for caso, medida in medidas.items():
+        base = linea_base.get(caso)
+        if base is None:
+            continue
+        if medida['escenarios_por_s'] < base['escenarios_por_s'] * (1 - tolerancia):
+            regresiones.append(f"{caso}: {medida['escenarios_por_s']:,.0f} escenarios/s frente a {base['escenarios_por_s']:,.0f} de la línea base")
+        if medida['p50_us'] > base['p50_us'] * (1 + tolerancia):
+            regresiones.append(f"{caso}: latencia p50 {medida['p50_us']:,.2f} µs frente a {base['p50_us']:,.2f} µs de la línea base")
+        if medida['pico_memoria_mb'] > base['pico_memoria_mb'] * (1 + tolerancia_memoria) + MARGEN_MEMORIA_MB:
+            regresiones.append(f"{caso}: memoria pico {medida['pico_memoria_mb']:,.1f} MB frente a {base['pico_memoria_mb']:,.1f} MB de la línea base")
+    return regresiones
+
+
+# --- VALORES DE REFERENCIA ---
+# Un caso por rama de uso del biogás (y por tecnología de upgrading), con eficiencia fija y con
+# los modelos cinéticos, incluido uno con déficit térmico y eléctrico.
+CASOS_REFERENCIA = {
+    'chp': dict(ESCENARIO_BASE),
+    'chp_primer_orden_2_etapas': dict(ESCENARIO_BASE, modelo_cinetico_idx=1, constante_hidrolisis_1_dia=0.2, n_etapas_digestor=2),
+    'caldera': dict(ESCENARIO_BASE, uso_biogas_opcion_idx=1, caldera_eficiencia_porcentaje=90.0),
+    'caldera_chen_hashimoto': dict(ESCENARIO_BASE, uso_biogas_opcion_idx=1, caldera_eficiencia_porcentaje=85.0,
+                                   modelo_cinetico_idx=2, constante_chen_hashimoto=0.7, temp_op_digestor_c=52.0),
+    **{f"upgrading_{i}": dict(ESCENARIO_BASE, uso_biogas_opcion_idx=2, upgrading_tecnologia_idx=i) for i in range(4)},
+    'upgrading_deficit': dict(ESCENARIO_BASE, uso_biogas_opcion_idx=2, upgrading_tecnologia_idx=3, presion_inyeccion_red_bar=40.0,
+                              bmp_nm3_ch4_kg_sv=0.15, temp_ambiente_promedio_c=-5.0, u_digestor_w_m2_k=2.5),
+}
+
+
+def calcular_referencia_escalar(entradas):
+    _, results, dim_digestor = preparar_escenario(entradas)
+    return dict(results, **dim_digestor)
+
+
+def calcular_referencia_lote(casos):
+    """Todos los casos en un solo lote, con las entradas que falten con su valor por defecto."""
+    claves = sorted({clave for entradas in casos.values() for clave in entradas})
+    valores_por_defecto = dict(VALORES_POR_DEFECTO, **VALORES_BALANCE_POR_DEFECTO)
+    results = calcular_escenarios_lote({
+        clave: np.array([entradas.get(clave, valores_por_defecto.get(clave, 0.0)) for entradas in casos.values()], dtype=float)
+        for clave in claves})
+    return {nombre: {clave: float(valores[i]) for clave, valores in results.items()} for i, nombre in enumerate(casos)}
+
+
+def _diferencias(nombre, obtenidos, esperados):
+    diferencias = []
+    for clave, esperado in esperados.items():
+        if clave not in obtenidos:
+            diferencias.append(f"{nombre}: falta '{clave}'")
+        elif not (math.isclose(obtenidos[clave], esperado, rel_tol=TOLERANCIA_RELATIVA_RESULTADOS, abs_tol=TOLERANCIA_ABSOLUTA_RESULTADOS)
+                  or (math.isnan(obtenidos[clave]) and math.isnan(esperado))):
+            diferencias.append(f"{nombre}: '{clave}' = {obtenidos[clave]!r}, referencia {esperado!r}")
+    return diferencias
+
+
+def comprobar_resultados(referencia):
+    """Diferencias (texto) de los motores escalar y vectorizado frente a la referencia, y del
+    vectorizado frente al escalar en escenarios aleatorios."""
+    diferencias = []
+    casos = {nombre: caso['entradas'] for nombre, caso in referencia['casos'].items()}
+    lote = calcular_referencia_lote(casos)
+    for nombre, caso in referencia['casos'].items():
+        diferencias += _diferencias(f"{nombre} (escalar)", calcular_referencia_escalar(caso['entradas']), caso['resultados'])
+        diferencias += _diferencias(f"{nombre} (vectorizado)", lote[nombre], caso['resultados'])
+    escenarios = generar_escenarios(ESCENARIOS_ALEATORIOS, semilla=1)
+    with np.errstate(all='ignore'):
+        vectorizado = calcular_escenarios_lote(escenarios)
+    for i, fila in enumerate(bucle_escalar(escenarios)):
+        distintas = _diferencias(f"aleatorio {i}", {clave: float(valores[i]) for clave, valores in vectorizado.items()}, fila)
+        if distintas:
+            diferencias += distintas
+            break
+    return diferencias
+
+
+def guardar_json(ruta, datos):
+    with open(ruta, "w", encoding="utf-8") as fichero:
+        json.dump(datos, fichero, ensure_ascii=False, indent=1)
+        fichero.write("\n")
+
+
+def entorno():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'plataforma': platform.platform(),
+            'procesador': platform.processor() or platform.machine(), 'fecha': datetime.date.today().isoformat()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suite de rendimiento y de resultados de referencia.")
+    parser.add_argument("--rapido", action="store_true", help="Solo el número de escenarios más pequeño de cada caso")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_RENDIMIENTO,
+                        help=f"Caída de rendimiento admitida (por defecto {TOLERANCIA_RENDIMIENTO * 100:.0f}%%)")
+    parser.add_argument("--tolerancia-memoria", type=float, default=TOLERANCIA_MEMORIA,
+                        help=f"Aumento de memoria pico admitido (por defecto {TOLERANCIA_MEMORIA * 100:.0f}%%)")
+    parser.add_argument("--solo-avisar", action="store_true",
+                        help="Las regresiones de rendimiento o memoria solo se avisan, sin hacer fallar la ejecución "
+                             "(máquinas con tiempos ruidosos)")
+    parser.add_argument("--guardar-linea-base", action="store_true",
+                        help="Guarda las medidas como nueva línea base (se rechaza si hay regresiones frente a la actual)")
+    parser.add_argument("--aceptar-regresiones", action="store_true",
+                        help="Con --guardar-linea-base, guarda la línea base aunque haya regresiones (cambio intencionado)")
+    parser.add_argument("--guardar-referencia", action="store_true",
+                        help="Regenera los valores de referencia con el motor escalar actual (solo si el cambio de resultados es intencionado)")
+    parser.add_argument("--solo-resultados", action="store_true", help="Comprueba los resultados sin medir el rendimiento")
+    parser.add_argument("--salida", help="Guarda las medidas en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    if args.guardar_referencia:
+        guardar_json(RUTA_REFERENCIA, {'casos': {nombre: {'entradas': entradas, 'resultados': calcular_referencia_escalar(entradas)}
+                                                 for nombre, entradas in CASOS_REFERENCIA.items()}})
+        print(f"Valores de referencia guardados en {RUTA_REFERENCIA}")
+    with open(RUTA_REFERENCIA, encoding="utf-8") as fichero:
+        diferencias = comprobar_resultados(json.load(fichero))
+    print(f"Resultados frente a la referencia: {'OK' if not diferencias else f'{len(diferencias)} diferencia(s)'}")
+    for diferencia in diferencias[:20]:
+        print(f"  {diferencia}")
+    if args.solo_resultados:
+        return 1 if diferencias else 0
+
+    medidas = ejecutar_rendimiento(args.rapido)
+    linea_base = {}
+    if os.path.exists(RUTA_LINEA_BASE):
+        with open(RUTA_LINEA_BASE, encoding="utf-8") as fichero:
+            linea_base = json.load(fichero)['casos']
+    print(f"\n{'Caso':<42}{'escenarios/s':>14}{'p50 µs':>11}{'p95 µs':>11}{'p99 µs':>11}{'memoria MB':>12}{'vs base':>9}")
+    for caso, medida in medidas.items():
+        relativo = f"{medida['escenarios_por_s'] / linea_base[caso]['escenarios_por_s']:.2f}x" if caso in linea_base else "-"
+        print(f"{caso:<42}{medida['escenarios_por_s']:>14,.0f}{medida['p50_us']:>11,.2f}{medida['p95_us']:>11,.2f}"
+              f"{medida['p99_us']:>11,.2f}{medida['pico_memoria_mb']:>12,.2f}{relativo:>9}")
+    if args.salida:
+        guardar_json(args.salida, {'entorno': entorno(), 'casos': medidas})
+    regresiones = comparar_con_linea_base(medidas, linea_base, args.tolerancia, args.tolerancia_memoria)
+    if args.guardar_linea_base:
+        if regresiones and not args.aceptar_regresiones:
+            print("\nLínea base NO guardada: las medidas son una regresión frente a la actual "
+                  "(use --aceptar-regresiones si el cambio es intencionado).")
+        else:
+            guardar_json(RUTA_LINEA_BASE, {'entorno': entorno(), 'casos': dict(linea_base, **medidas)})
+            print(f"\nLínea base guardada en {RUTA_LINEA_BASE}")
+            for regresion in regresiones:
+                print(f"REGRESIÓN ACEPTADA {regresion}")
+            return 1 if diferencias else 0
+    elif not linea_base:
+        print("\nSin línea base: ejecute con --guardar-linea-base para crearla.")
+    for regresion in regresiones:
+        print(f"{'AVISO' if args.solo_avisar else 'REGRESIÓN'} {regresion}")
+    return 1 if diferencias or (regresiones and not args.solo_avisar) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,93 +1,146 @@
 # streamlit_biogas_balance.py
 import streamlit as st
-import math
 import datetime
-from io import BytesIO
-
-# --- LIBRERÍAS DE EXPORTACIÓN ---
-OPENPYXL_AVAILABLE = False
-FPDF_AVAILABLE = False
-try:
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    pass
-
-try:
-    from fpdf import FPDF
-    FPDF_AVAILABLE = True
-except ImportError:
-    pass
-
-# --- FUNCIONES DE CÁLCULO (sin cambios) ---
-def calcular_dimensiones_digestor(caudal_sustrato_kg_dia, trh_dias, densidad_sustrato_kg_m3=1000):
-    volumen_sustrato_diario_m3 = caudal_sustrato_kg_dia / densidad_sustrato_kg_m3
-    volumen_digestor_m3 = volumen_sustrato_diario_m3 * trh_dias
-    diametro_digestor_m = altura_digestor_m = area_superficial_digestor_m2 = 0.0
-    if volumen_digestor_m3 > 0:
-        diametro_digestor_m = (4 * volumen_digestor_m3 / math.pi)**(1/3)
-        altura_digestor_m = diametro_digestor_m
-        area_superficial_digestor_m2 = 1.5 * math.pi * (diametro_digestor_m**2)
-    return {
-        "volumen_digestor_m3": volumen_digestor_m3,
-        "diametro_digestor_m": diametro_digestor_m,
-        "altura_digestor_m": altura_digestor_m,
-        "area_superficial_digestor_m2": area_superficial_digestor_m2
-    }
-
-def realizar_calculos_balance(inputs_calc):
-    results = {}
-    caudal_sustrato_kg_dia = inputs_calc['caudal_sustrato_kg_dia']
-    st_porcentaje = inputs_calc['st_porcentaje']
-    sv_de_st_porcentaje = inputs_calc['sv_de_st_porcentaje']
-    bmp_nm3_ch4_kg_sv = inputs_calc['bmp_nm3_ch4_kg_sv']
-    eficiencia_digestion_porcentaje = inputs_calc['eficiencia_digestion_porcentaje']
-    ch4_en_biogas_porcentaje = inputs_calc['ch4_en_biogas_porcentaje']
-    cp_sustrato_kj_kg_c = inputs_calc['cp_sustrato_kj_kg_c']
-    temp_op_digestor_c = inputs_calc['temp_op_digestor_c']
-    temp_sustrato_entrada_c = inputs_calc['temp_sustrato_entrada_c']
-    u_digestor_w_m2_k = inputs_calc['u_digestor_w_m2_k']
-    area_superficial_digestor_m2 = inputs_calc['area_superficial_digestor_m2']
-    temp_ambiente_promedio_c = inputs_calc['temp_ambiente_promedio_c']
-    uso_biogas_opcion_idx = inputs_calc['uso_biogas_opcion_idx']
-    chp_eficiencia_electrica_porcentaje = inputs_calc.get('chp_eficiencia_electrica_porcentaje', 0)
-    chp_eficiencia_termica_porcentaje = inputs_calc.get('chp_eficiencia_termica_porcentaje', 0)
-    caldera_eficiencia_porcentaje = inputs_calc.get('caldera_eficiencia_porcentaje', 0)
-    consumo_electrico_aux_kwh_ton_sustrato = inputs_calc['consumo_electrico_aux_kwh_ton_sustrato']
-
-    results['sv_alimentado_kg_dia'] = caudal_sustrato_kg_dia * (st_porcentaje / 100) * (sv_de_st_porcentaje / 100)
-    results['ch4_producido_nm3_dia'] = results['sv_alimentado_kg_dia'] * bmp_nm3_ch4_kg_sv * (eficiencia_digestion_porcentaje / 100)
-    results['biogas_producido_nm3_dia'] = 0
-    if ch4_en_biogas_porcentaje > 0:
-        results['biogas_producido_nm3_dia'] = results['ch4_producido_nm3_dia'] / (ch4_en_biogas_porcentaje / 100)
-    pci_ch4_mj_nm3 = 35.8
-    results['pci_biogas_mj_nm3'] = pci_ch4_mj_nm3 * (ch4_en_biogas_porcentaje / 100)
-    results['energia_bruta_biogas_mj_dia'] = results['biogas_producido_nm3_dia'] * results['pci_biogas_mj_nm3']
-    results['energia_bruta_biogas_kwh_dia'] = results['energia_bruta_biogas_mj_dia'] / 3.6
-    results['calor_calentar_sustrato_mj_dia'] = (caudal_sustrato_kg_dia * cp_sustrato_kj_kg_c * (temp_op_digestor_c - temp_sustrato_entrada_c)) / 1000
-    delta_t_digestor_ambiente = temp_op_digestor_c - temp_ambiente_promedio_c
-    results['perdidas_calor_digestor_mj_dia'] = 0.0
-    if delta_t_digestor_ambiente > 0 and area_superficial_digestor_m2 > 0:
-        results['perdidas_calor_digestor_mj_dia'] = (u_digestor_w_m2_k * area_superficial_digestor_m2 * delta_t_digestor_ambiente * 3600 * 24) / 1000000
-    results['demanda_termica_total_digestor_mj_dia'] = results['calor_calentar_sustrato_mj_dia'] + results['perdidas_calor_digestor_mj_dia']
-    results['demanda_termica_total_digestor_kwh_dia'] = results['demanda_termica_total_digestor_mj_dia'] / 3.6
-    results['electricidad_generada_bruta_kwh_dia'] = 0.0
-    results['calor_util_generado_mj_dia'] = 0.0
-    if uso_biogas_opcion_idx == 0: # CHP
-        results['electricidad_generada_bruta_kwh_dia'] = results['energia_bruta_biogas_kwh_dia'] * (chp_eficiencia_electrica_porcentaje / 100)
-        results['calor_util_generado_mj_dia'] = results['energia_bruta_biogas_mj_dia'] * (chp_eficiencia_termica_porcentaje / 100)
-    elif uso_biogas_opcion_idx == 1: # Caldera
-        results['calor_util_generado_mj_dia'] = results['energia_bruta_biogas_mj_dia'] * (caldera_eficiencia_porcentaje / 100)
-    results['consumo_electrico_aux_total_kwh_dia'] = (caudal_sustrato_kg_dia / 1000) * consumo_electrico_aux_kwh_ton_sustrato
-    results['electricidad_neta_exportable_kwh_dia'] = results['electricidad_generada_bruta_kwh_dia'] - results['consumo_electrico_aux_total_kwh_dia']
-    results['calor_neto_disponible_mj_dia'] = results['calor_util_generado_mj_dia'] - results['demanda_termica_total_digestor_mj_dia']
-    results['calor_neto_disponible_kwh_dia'] = results['calor_neto_disponible_mj_dia'] / 3.6
-    return results
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# --- NÚCLEO DE CÁLCULO Y EXPORTACIÓN (paquete balance_biogas, sin dependencia de Streamlit) ---
+from balance_biogas.calculos import (
+    CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO, CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA, MODELOS_CINETICOS,
+    PRESION_INYECCION_RED_POR_DEFECTO_BAR, TECNOLOGIAS_UPGRADING, calcular_dimensiones_digestor, fraccion_degradada_cinetica,
+    realizar_calculos_balance,
+)
+from balance_biogas.lote import comparar_tecnologias_upgrading, fraccion_degradada_cinetica_lote
+from balance_biogas.exportacion import openpyxl_disponible, fpdf_disponible
+from balance_biogas.barrido import (
+    analisis_arana, analisis_tornado, evaluar_barrido_rejilla, evaluar_muestras, muestreo_hipercubo_latino, resumir_salidas,
+    variaciones_simetricas,
+)
+from balance_biogas.montecarlo import construir_distribucion, simular_montecarlo
+from balance_biogas.serie_temporal import leer_series_por_bloques, simular_serie
+from balance_biogas.sustratos import BibliotecaSustratos, MezclaSustratos
+from balance_biogas.optimizacion import OBJETIVOS, optimizar_mezcla, scipy_disponible
+from balance_biogas.almacen import AlmacenEscenarios
+from balance_biogas.cartera import CarteraPlantas, leer_plantas
+from balance_biogas import instrumentacion
+from balance_biogas.instrumentacion import contar, etapa, tramo
+
+# --- CACHÉ DE RESULTADOS Y EXPORTACIONES ENTRE EJECUCIONES ---
+# Cada cambio de widget vuelve a ejecutar el script completo. Los cálculos y los informes se
+# memorizan por valor de sus entradas en cachés acotadas (LRU con caducidad), compartidas entre
+# sesiones; los informes solo se generan cuando el usuario pulsa el botón de descarga. Por debajo,
+# el almacén de escenarios (SQLite) conserva los informes ya renderizados entre reinicios.
+CACHE_MAX_ENTRADAS_CALCULO = 256
+CACHE_MAX_ENTRADAS_EXPORTACION = 32
+CACHE_TTL_SEGUNDOS = 3600
+
+# Las funciones cacheadas cuentan sus propios fallos: su cuerpo solo se ejecuta cuando
+# st.cache_data no tiene el resultado.
+def calcular_dimensiones_sin_cache(caudal_sustrato_kg_dia, trh_dias):
+    contar("cache_fallos", funcion="dimensiones")
+    return calcular_dimensiones_digestor(caudal_sustrato_kg_dia, trh_dias)
+
+def realizar_calculos_balance_sin_cache(inputs_balance):
+    contar("cache_fallos", funcion="balance")
+    return realizar_calculos_balance(inputs_balance)
+
+calcular_dimensiones_cacheado = st.cache_data(
+    max_entries=CACHE_MAX_ENTRADAS_CALCULO, ttl=CACHE_TTL_SEGUNDOS, show_spinner=False)(calcular_dimensiones_sin_cache)
+realizar_calculos_balance_cacheado = st.cache_data(
+    max_entries=CACHE_MAX_ENTRADAS_CALCULO, ttl=CACHE_TTL_SEGUNDOS, show_spinner=False)(realizar_calculos_balance_sin_cache)
+
+@st.cache_resource
+def obtener_almacen():
+    return AlmacenEscenarios()
+
+@st.cache_resource
+def obtener_cartera(nombre):
+    return CarteraPlantas.abrir(obtener_almacen(), nombre)
+
+def generar_informe_almacenado(formato, inputs_balance, results, dim_digestor, project_info):
+    contar("cache_fallos", funcion=f"exportacion_{formato}")
+    return obtener_almacen().informe(inputs_balance, project_info, formato, results, dim_digestor)
+
+generar_informe_cacheado = st.cache_data(
+    max_entries=CACHE_MAX_ENTRADAS_EXPORTACION, ttl=CACHE_TTL_SEGUNDOS, show_spinner=False)(generar_informe_almacenado)
+
+def llamar_cacheado(nombre, funcion_cacheada, *args):
+    """Llama a una función cacheada contando la consulta; los fallos los cuenta la propia función,
+    así que los aciertos de la caché son cache_consultas - cache_fallos."""
+    contar("cache_consultas", funcion=nombre)
+    with tramo(f"ui.{nombre}"):
+        return funcion_cacheada(*args)
+
+def descargar(nombre, funcion_cacheada, *args):
+    """Contenido de una descarga (se llama al pulsar el botón), con los bytes servidos."""
+    contenido = llamar_cacheado(nombre, funcion_cacheada, *args)
+    contar("bytes_descargados", len(contenido), formato=nombre.rsplit('_', 1)[-1])
+    return contenido
+
+@st.cache_resource
+def obtener_biblioteca_sustratos():
+    return BibliotecaSustratos()
+
+# --- PARÁMETROS DISPONIBLES PARA SENSIBILIDAD Y BARRIDOS ---
+PARAMETROS_SENSIBILIDAD = {
+    "BMP (Nm³ CH₄/kg SV)": 'bmp_nm3_ch4_kg_sv',
+    "Sólidos Totales (%)": 'st_porcentaje',
+    "SV como % de ST": 'sv_de_st_porcentaje',
+    "Eficiencia de digestión (%)": 'eficiencia_digestion_porcentaje',
+    "TRH (días)": 'trh_dias',
+    "U digestor (W/m²K)": 'u_digestor_w_m2_k',
+    "Caudal de sustrato (kg/día)": 'caudal_sustrato_kg_dia',
+    "Temperatura ambiente (°C)": 'temp_ambiente_promedio_c',
+    "Temperatura entrada sustrato (°C)": 'temp_sustrato_entrada_c',
+    "CH₄ en biogás (%)": 'ch4_en_biogas_porcentaje',
+    "Consumo eléctrico aux. (kWh/ton)": 'consumo_electrico_aux_kwh_ton_sustrato',
+    "Eficiencia eléctrica CHP (%)": 'chp_eficiencia_electrica_porcentaje',
+    "Eficiencia térmica CHP (%)": 'chp_eficiencia_termica_porcentaje',
+    "Eficiencia caldera (%)": 'caldera_eficiencia_porcentaje',
+    "Presión de inyección en red (bar a)": 'presion_inyeccion_red_bar',
+    "Constante de hidrólisis a 35 °C (1/día)": 'constante_hidrolisis_1_dia',
+    "Constante K de Chen-Hashimoto": 'constante_chen_hashimoto',
+}
+SALIDAS_SENSIBILIDAD = {
+    "Electricidad neta exportable (kWh/día)": 'electricidad_neta_exportable_kwh_dia',
+    "Calor neto disponible (MJ/día)": 'calor_neto_disponible_mj_dia',
+}
+RESULTADOS_COMPARACION = {
+    "Volumen del digestor (m³)": 'volumen_digestor_m3',
+    "Eficiencia de digestión (%)": 'eficiencia_digestion_efectiva_porcentaje',
+    "Biogás producido (Nm³/día)": 'biogas_producido_nm3_dia',
+    "Demanda térmica del digestor (MJ/día)": 'demanda_termica_total_digestor_mj_dia',
+    "Electricidad bruta (kWh/día)": 'electricidad_generada_bruta_kwh_dia',
+    "Biometano (Nm³/día)": 'biometano_producido_nm3_dia',
+    "Consumo eléctrico auxiliar (kWh/día)": 'consumo_electrico_aux_total_kwh_dia',
+    "Electricidad neta exportable (kWh/día)": 'electricidad_neta_exportable_kwh_dia',
+    "Calor neto disponible (MJ/día)": 'calor_neto_disponible_mj_dia',
+}
+AGREGADOS_CARTERA = {
+    "Biogás (Nm³/día)": 'biogas_producido_nm3_dia',
+    "Electricidad exportada (kWh/día)": 'electricidad_exportada_kwh_dia',
+    "Consumo eléctrico auxiliar (kWh/día)": 'consumo_electrico_aux_total_kwh_dia',
+    "Déficit eléctrico (kWh/día)": 'deficit_electrico_kwh_dia',
+    "Déficit térmico (MJ/día)": 'deficit_termico_mj_dia',
+    "Biometano (Nm³/día)": 'biometano_producido_nm3_dia',
+    "Plantas con déficit térmico": 'plantas_deficit_termico',
+}
+MAX_PUNTOS_BARRIDO = 2_000_000
+DISTRIBUCIONES_MONTECARLO = {"Normal": 'normal', "Triangular": 'triangular', "Uniforme": 'uniforme'}
 
 # --- INTERFAZ DE STREAMLIT ---
 st.set_page_config(page_title="Balance Energético Biogás", layout="wide", page_icon="🔥")
 
+# Panel de rendimiento: el conmutador se dibuja al final de la barra lateral, pero su valor
+# (en session_state) se necesita antes para medir esta ejecución desde el principio.
+panel_rendimiento = st.session_state.get("panel_rendimiento_main", False)
+instrumentacion.activar(panel_rendimiento or instrumentacion.ACTIVA_POR_ENTORNO)
+traza_ejecucion = instrumentacion.nueva_traza()
+etapa("ui.entradas")
+
 st.title("🔥 Balance Energético Planta de Biogás")
 st.markdown("Esta aplicación realiza un balance de energía preliminar para una planta de biogás en fase de diseño.")
 st.markdown("---")
@@ -111,19 +164,52 @@ input_col1, input_col2 = st.columns(2)
 
 with input_col1:
     with st.expander("1. Características del Sustrato", expanded=True):
-        sustrato_nombre_input = st.text_input("Nombre/Tipo de sustrato", "Residuos Agroindustriales", key="sustrato_nombre_main_area")
-        caudal_sustrato_kg_dia = st.number_input("Caudal de sustrato (kg/día)", min_value=0.0, value=10000.0, step=100.0, format="%.2f", key="caudal_main")
-        st_porcentaje = st.number_input("Sólidos Totales (ST) en sustrato (%)", min_value=0.0, max_value=100.0, value=20.0, step=0.1, format="%.1f", key="st_main")
-        sv_de_st_porcentaje = st.number_input("Sólidos Volátiles (SV) como % de ST (%)", min_value=0.0, max_value=100.0, value=80.0, step=0.1, format="%.1f", key="sv_main")
-        temp_sustrato_entrada_c = st.number_input("Temperatura de entrada del sustrato (°C)", value=15.0, step=0.5, format="%.1f", key="temp_in_main")
-        cp_sustrato_kj_kg_c = 4.186 # Se mantiene como constante
-
-        bmp_fuente_opciones = ["Valor de laboratorio", "Estimación de literatura"]
-        bmp_fuente_seleccionada_texto = st.selectbox("Fuente del BMP", bmp_fuente_opciones, help="Seleccione cómo se obtiene el Potencial Bioquímico de Metano.", key="bmp_source_main")
-        if "Valor de laboratorio" in bmp_fuente_seleccionada_texto:
-            bmp_nm3_ch4_kg_sv = st.number_input("BMP (Nm³ CH₄ / kg SV añadido)", min_value=0.0, value=0.35, step=0.01, format="%.2f", key="bmp_lab_main")
+        modo_sustrato_opciones = ["Sustrato único", "Mezcla de co-digestión"]
+        modo_sustrato_texto = st.radio("Definición del sustrato", modo_sustrato_opciones, horizontal=True, key="modo_sustrato_main")
+        if modo_sustrato_texto == "Sustrato único":
+            sustrato_nombre_input = st.text_input("Nombre/Tipo de sustrato", "Residuos Agroindustriales", key="sustrato_nombre_main_area")
+            caudal_sustrato_kg_dia = st.number_input("Caudal de sustrato (kg/día)", min_value=0.0, value=10000.0, step=100.0, format="%.2f", key="caudal_main")
+            st_porcentaje = st.number_input("Sólidos Totales (ST) en sustrato (%)", min_value=0.0, max_value=100.0, value=20.0, step=0.1, format="%.1f", key="st_main")
+            sv_de_st_porcentaje = st.number_input("Sólidos Volátiles (SV) como % de ST (%)", min_value=0.0, max_value=100.0, value=80.0, step=0.1, format="%.1f", key="sv_main")
+            temp_sustrato_entrada_c = st.number_input("Temperatura de entrada del sustrato (°C)", value=15.0, step=0.5, format="%.1f", key="temp_in_main")
+            cp_sustrato_kj_kg_c = 4.186 # Se mantiene como constante
+
+            bmp_fuente_opciones = ["Valor de laboratorio", "Estimación de literatura"]
+            bmp_fuente_seleccionada_texto = st.selectbox("Fuente del BMP", bmp_fuente_opciones, help="Seleccione cómo se obtiene el Potencial Bioquímico de Metano.", key="bmp_source_main")
+            if "Valor de laboratorio" in bmp_fuente_seleccionada_texto:
+                bmp_nm3_ch4_kg_sv = st.number_input("BMP (Nm³ CH₄ / kg SV añadido)", min_value=0.0, value=0.35, step=0.01, format="%.2f", key="bmp_lab_main")
+            else:
+                bmp_nm3_ch4_kg_sv = st.number_input("BMP estimado de literatura (Nm³ CH₄ / kg SV añadido)", min_value=0.0, value=0.30, step=0.01, format="%.2f", key="bmp_lit_main")
         else:
-            bmp_nm3_ch4_kg_sv = st.number_input("BMP estimado de literatura (Nm³ CH₄ / kg SV añadido)", min_value=0.0, value=0.30, step=0.01, format="%.2f", key="bmp_lit_main")
+            biblioteca_sustratos = obtener_biblioteca_sustratos()
+            categoria_sel = st.selectbox("Filtrar biblioteca por categoría", ["Todas"] + biblioteca_sustratos.lista_categorias(), key="categoria_sustrato_main")
+            opciones_sustrato = biblioteca_sustratos.nombres if categoria_sel == "Todas" else biblioteca_sustratos.por_categoria(categoria_sel)
+            if 'mezcla_sustratos' not in st.session_state:
+                st.session_state.mezcla_sustratos = MezclaSustratos(biblioteca_sustratos)
+            # Los componentes ya presentes en la receta siguen siendo seleccionables aunque se filtre otra categoría.
+            opciones_sustrato = sorted(set(opciones_sustrato) | set(st.session_state.mezcla_sustratos.caudales) | {"Purín de cerdo", "Ensilado de maíz"})
+            tabla_mezcla = st.data_editor(
+                pd.DataFrame({"Sustrato": ["Purín de cerdo", "Ensilado de maíz"], "Caudal (kg/día)": [8000.0, 2000.0]}),
+                num_rows="dynamic", width="stretch", key="tabla_mezcla_main",
+                column_config={
+                    "Sustrato": st.column_config.SelectboxColumn(options=opciones_sustrato, required=True),
+                    "Caudal (kg/día)": st.column_config.NumberColumn(min_value=0.0, step=100.0, format="%.2f"),
+                })
+            caudales_mezcla = tabla_mezcla.dropna().groupby("Sustrato")["Caudal (kg/día)"].sum().to_dict()
+            # La mezcla vive en la sesión: en cada ejecución solo se actualizan los componentes cambiados.
+            st.session_state.mezcla_sustratos.sincronizar(caudales_mezcla)
+            corriente_mezcla = st.session_state.mezcla_sustratos.entradas_balance()
+            sustrato_nombre_input = corriente_mezcla['sustrato_nombre']
+            caudal_sustrato_kg_dia = corriente_mezcla['caudal_sustrato_kg_dia']
+            st_porcentaje = corriente_mezcla['st_porcentaje']
+            sv_de_st_porcentaje = corriente_mezcla['sv_de_st_porcentaje']
+            temp_sustrato_entrada_c = corriente_mezcla['temp_sustrato_entrada_c']
+            cp_sustrato_kj_kg_c = corriente_mezcla['cp_sustrato_kj_kg_c']
+            bmp_nm3_ch4_kg_sv = corriente_mezcla['bmp_nm3_ch4_kg_sv']
+            bmp_fuente_seleccionada_texto = "Biblioteca de sustratos (mezcla)"
+            st.caption(f"Corriente equivalente: {caudal_sustrato_kg_dia:.2f} kg/día, ST {st_porcentaje:.1f}%, "
+                       f"SV {sv_de_st_porcentaje:.1f}% de ST, BMP {bmp_nm3_ch4_kg_sv:.3f} Nm³ CH₄/kg SV, "
+                       f"entrada a {temp_sustrato_entrada_c:.1f}°C")
 
     with st.expander("3. Utilización del Biogás", expanded=True):
         uso_biogas_opciones_lista = ["Cogeneración (CHP)", "Caldera", "Upgrading a Biometano"]
@@ -133,12 +219,22 @@ with input_col1:
         chp_eficiencia_electrica_porcentaje = 0.0
         chp_eficiencia_termica_porcentaje = 0.0
         caldera_eficiencia_porcentaje = 0.0
+        upgrading_tecnologia_idx = 0
+        presion_inyeccion_red_bar = PRESION_INYECCION_RED_POR_DEFECTO_BAR
 
         if uso_biogas_opcion_idx == 0: # CHP
             chp_eficiencia_electrica_porcentaje = st.number_input("Eficiencia eléctrica del CHP (%)", min_value=0.0, max_value=100.0, value=35.0, step=0.1, format="%.1f", key="chp_elec_eff_main")
             chp_eficiencia_termica_porcentaje = st.number_input("Eficiencia térmica recuperable del CHP (%)", min_value=0.0, max_value=100.0, value=45.0, step=0.1, format="%.1f", key="chp_therm_eff_main")
         elif uso_biogas_opcion_idx == 1: # Caldera
             caldera_eficiencia_porcentaje = st.number_input("Eficiencia de la caldera de biogás (%)", min_value=0.0, max_value=100.0, value=85.0, step=0.1, format="%.1f", key="boiler_eff_main")
+        else: # Upgrading
+            nombres_tecnologias_upgrading = [tecnologia[0] for tecnologia in TECNOLOGIAS_UPGRADING]
+            upgrading_tecnologia_texto = st.selectbox("Tecnología de upgrading", nombres_tecnologias_upgrading, key="upgrading_tec_main")
+            upgrading_tecnologia_idx = nombres_tecnologias_upgrading.index(upgrading_tecnologia_texto)
+            presion_inyeccion_red_bar = st.number_input("Presión de inyección en red (bar a)", min_value=1.0, max_value=100.0, value=PRESION_INYECCION_RED_POR_DEFECTO_BAR, step=0.5, format="%.1f", key="presion_red_main")
+            _, perdida_sel, consumo_sel, calor_sel, pureza_sel, presion_sel = TECNOLOGIAS_UPGRADING[upgrading_tecnologia_idx]
+            st.caption(f"Pérdida de CH₄ {perdida_sel}% · {consumo_sel} kWh eléctricos y {calor_sel} kWh térmicos por Nm³ de biogás · "
+                       f"biometano al {pureza_sel}% CH₄ a {presion_sel} bar a")
 
 
 with input_col2:
@@ -148,8 +244,28 @@ with input_col2:
         temp_op_digestor_c = temp_op_digestor_opciones_dict[temp_op_digestor_texto_sel]
         st.caption(f"Temperatura de operación seleccionada: {temp_op_digestor_c}°C")
 
-        eficiencia_digestion_porcentaje = st.number_input("Eficiencia de digestión estimada (%)", min_value=0.0, max_value=100.0, value=75.0, step=0.5, format="%.1f", key="eff_digest_main")
+        modelo_cinetico_texto = st.selectbox("Modelo de degradación", MODELOS_CINETICOS, key="modelo_cinetico_main",
+                                             help="Eficiencia fija: el rendimiento no depende del TRH. Primer orden y Chen-Hashimoto calculan la fracción del BMP degradada según TRH, temperatura y etapas.")
+        modelo_cinetico_idx = MODELOS_CINETICOS.index(modelo_cinetico_texto)
+        constante_hidrolisis_1_dia = CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA
+        constante_chen_hashimoto = CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO
+        n_etapas_digestor = 1
+        eficiencia_digestion_porcentaje = st.number_input("Eficiencia de digestión estimada (%)", min_value=0.0, max_value=100.0, value=75.0, step=0.5, format="%.1f", key="eff_digest_main",
+                                                          disabled=modelo_cinetico_idx != 0)
+        if modelo_cinetico_idx == 1:
+            constante_hidrolisis_1_dia = st.number_input("Constante de hidrólisis a 35 °C (1/día)", min_value=0.001, value=CONSTANTE_HIDROLISIS_POR_DEFECTO_1_DIA, step=0.01, format="%.3f", key="k_hidrolisis_main",
+                                                         help="Ej: Purines y estiércoles: 0.1-0.3; Cultivos energéticos: 0.1-0.2; Residuos alimentarios: 0.3-0.7")
+        elif modelo_cinetico_idx == 2:
+            constante_chen_hashimoto = st.number_input("Constante K de Chen-Hashimoto (-)", min_value=0.01, value=CONSTANTE_CHEN_HASHIMOTO_POR_DEFECTO, step=0.05, format="%.2f", key="k_chen_main",
+                                                       help="Ej: Purín de vacuno: 0.6-1.0; Purín de cerdo: 0.5-0.9 (aumenta con la concentración de SV)")
+        if modelo_cinetico_idx != 0:
+            n_etapas_digestor = st.number_input("Digestores en serie (etapas)", min_value=1, max_value=5, value=1, step=1, key="etapas_main",
+                                                help="El TRH total se reparte por igual entre las etapas")
         trh_dias = st.number_input("Tiempo de Retención Hidráulica (TRH) (días)", min_value=1.0, value=30.0, step=1.0, format="%.1f", key="trh_main")
+        if modelo_cinetico_idx != 0:
+            eficiencia_cinetica_porcentaje = 100 * fraccion_degradada_cinetica(
+                modelo_cinetico_idx, trh_dias, temp_op_digestor_c, constante_hidrolisis_1_dia, constante_chen_hashimoto, n_etapas_digestor)
+            st.caption(f"Eficiencia de digestión calculada ({modelo_cinetico_texto}, {n_etapas_digestor} etapa(s)): {eficiencia_cinetica_porcentaje:.1f}%")
         ch4_en_biogas_porcentaje = st.number_input("Contenido de Metano (CH₄) estimado en biogás (%)", min_value=0.0, max_value=100.0, value=60.0, step=0.1, format="%.1f", key="ch4_perc_main")
 
         st.markdown("###### Pérdidas Térmicas del Digestor")
@@ -171,7 +287,8 @@ if calcular_button:
     st.session_state.show_results = True
 
 if st.session_state.show_results:
-    dim_digestor = calcular_dimensiones_digestor(caudal_sustrato_kg_dia, trh_dias)
+    etapa("ui.resultados")
+    dim_digestor = llamar_cacheado("dimensiones", calcular_dimensiones_cacheado, caudal_sustrato_kg_dia, trh_dias)
     inputs_balance = {
         'sustrato_nombre': sustrato_nombre_input,
         'caudal_sustrato_kg_dia': caudal_sustrato_kg_dia,
@@ -194,9 +311,17 @@ if st.session_state.show_results:
         'chp_eficiencia_termica_porcentaje': chp_eficiencia_termica_porcentaje,
         'caldera_eficiencia_porcentaje': caldera_eficiencia_porcentaje,
         'consumo_electrico_aux_kwh_ton_sustrato': consumo_electrico_aux_kwh_ton_sustrato,
+        'upgrading_tecnologia_idx': upgrading_tecnologia_idx,
+        'upgrading_tecnologia_texto': TECNOLOGIAS_UPGRADING[upgrading_tecnologia_idx][0],
+        'presion_inyeccion_red_bar': presion_inyeccion_red_bar,
+        'modelo_cinetico_idx': modelo_cinetico_idx,
+        'modelo_cinetico_texto': modelo_cinetico_texto,
+        'constante_hidrolisis_1_dia': constante_hidrolisis_1_dia,
+        'constante_chen_hashimoto': constante_chen_hashimoto,
+        'n_etapas_digestor': n_etapas_digestor,
         'trh_dias': trh_dias
     }
-    results = realizar_calculos_balance(inputs_balance)
+    results = llamar_cacheado("balance", realizar_calculos_balance_cacheado, inputs_balance)
 
     st.header("Resultados del Balance")
     st.markdown(f"Resultados para el proyecto: **{project_name}**")
@@ -212,6 +337,7 @@ if st.session_state.show_results:
         st.subheader("Producción de Biogás")
         st.metric("Biogás Total Producido", f"{results.get('biogas_producido_nm3_dia', 0.0):.2f} Nm³/día")
         st.write(f"Metano (CH₄) producido: {results.get('ch4_producido_nm3_dia',0.0):.2f} Nm³/día")
+        st.write(f"Eficiencia de digestión ({modelo_cinetico_texto}): {results.get('eficiencia_digestion_efectiva_porcentaje',0.0):.1f}%")
         st.write(f"PCI del biogás: {results.get('pci_biogas_mj_nm3',0.0):.2f} MJ/Nm³")
         st.write(f"Energía Bruta en Biogás: {results.get('energia_bruta_biogas_mj_dia',0.0):.2f} MJ/día ({results.get('energia_bruta_biogas_kwh_dia',0.0):.2f} kWh/día)")
     with col_res3:
@@ -231,9 +357,39 @@ if st.session_state.show_results:
         elif uso_biogas_opcion_idx == 1:
             st.metric("Calor Útil Generado (Caldera)", f"{results.get('calor_util_generado_mj_dia',0.0):.2f} MJ/día")
         else:
-            st.info("El biogás se destina a upgrading. Consumos y producción de biometano no detallados aquí.")
+            st.metric(f"Biometano Producido ({inputs_balance['upgrading_tecnologia_texto']})", f"{results.get('biometano_producido_nm3_dia',0.0):.2f} Nm³/día",
+                      f"{results.get('energia_biometano_kwh_dia',0.0):.2f} kWh/día", delta_color="off")
+            st.write(f"Recuperación de CH₄: {results.get('recuperacion_ch4_porcentaje',0.0):.1f}% "
+                     f"(pérdida de {results.get('ch4_perdido_upgrading_nm3_dia',0.0):.2f} Nm³ CH₄/día)")
+            st.write(f"Demanda de calor del upgrading: {results.get('demanda_calor_upgrading_mj_dia',0.0):.2f} MJ/día")
     with col_prod_res2:
         st.metric("Consumo Eléctrico Auxiliar Estimado", f"{results.get('consumo_electrico_aux_total_kwh_dia',0.0):.2f} kWh/día")
+        if uso_biogas_opcion_idx == 2:
+            st.metric("Consumo Eléctrico del Upgrading", f"{results.get('consumo_electrico_upgrading_kwh_dia',0.0):.2f} kWh/día")
+            st.metric("Compresión a Red", f"{results.get('consumo_electrico_compresion_kwh_dia',0.0):.2f} kWh/día")
+
+    if modelo_cinetico_idx != 0:
+        # Curva de rendimiento frente al TRH para 1 a 3 etapas, en forma cerrada y vectorizada.
+        with st.expander("Eficiencia de digestión frente al TRH", expanded=False):
+            trh_curva = np.linspace(1.0, max(90.0, 2 * trh_dias), 180)
+            etapas_curva = np.arange(1, 4)
+            eficiencia_curva = 100 * fraccion_degradada_cinetica_lote(
+                modelo_cinetico_idx, trh_curva[:, None], temp_op_digestor_c, constante_hidrolisis_1_dia, constante_chen_hashimoto, etapas_curva[None, :])
+            st.line_chart(pd.DataFrame(eficiencia_curva, index=pd.Index(trh_curva, name="TRH (días)"),
+                                       columns=[f"{n} etapa(s)" for n in etapas_curva]))
+
+    if uso_biogas_opcion_idx == 2:
+        # Las cuatro tecnologías con los mismos datos de proyecto, en una sola llamada al motor vectorizado.
+        comparacion_upgrading = comparar_tecnologias_upgrading(inputs_balance)
+        with st.expander("Comparación de tecnologías de upgrading", expanded=False):
+            st.dataframe(pd.DataFrame({
+                "Recuperación CH₄ (%)": comparacion_upgrading['recuperacion_ch4_porcentaje'],
+                "Biometano (Nm³/día)": comparacion_upgrading['biometano_producido_nm3_dia'],
+                "Electricidad upgrading + compresión (kWh/día)": comparacion_upgrading['consumo_electrico_upgrading_kwh_dia'] + comparacion_upgrading['consumo_electrico_compresion_kwh_dia'],
+                "Calor upgrading (MJ/día)": comparacion_upgrading['demanda_calor_upgrading_mj_dia'],
+                "Electricidad neta (kWh/día)": comparacion_upgrading['electricidad_neta_exportable_kwh_dia'],
+                "Calor neto (MJ/día)": comparacion_upgrading['calor_neto_disponible_mj_dia'],
+            }, index=[tecnologia[0] for tecnologia in TECNOLOGIAS_UPGRADING]).style.format("{:,.2f}"), width="stretch")
 
     st.markdown("---")
     st.subheader("BALANCE NETO DE ENERGÍA")
@@ -245,7 +401,7 @@ if st.session_state.show_results:
             if results.get('electricidad_neta_exportable_kwh_dia',0.0) < 0:
                 st.error("¡ATENCIÓN! Déficit eléctrico.")
         else:
-            st.metric("ELECTRICIDAD NETA (Consumo)", f"{-results.get('consumo_electrico_aux_total_kwh_dia',0.0):.2f} kWh/día")
+            st.metric("ELECTRICIDAD NETA (Consumo)", f"{results.get('electricidad_neta_exportable_kwh_dia',0.0):.2f} kWh/día")
     with col_neto_res2:
         st.markdown("#### Balance Térmico")
         st.metric("CALOR NETO DISPONIBLE/DÉFICIT", f"{results.get('calor_neto_disponible_mj_dia',0.0):.2f} MJ/día", f"{results.get('calor_neto_disponible_kwh_dia',0.0):.2f} kWh/día")
@@ -253,193 +409,369 @@ if st.session_state.show_results:
             st.error(f"¡ATENCIÓN! Déficit térmico. Se necesitan {abs(results.get('calor_neto_disponible_mj_dia',0.0)):.2f} MJ/día adicionales.")
         elif results.get('calor_neto_disponible_mj_dia',0.0) > 0 and (uso_biogas_opcion_idx == 0 or uso_biogas_opcion_idx ==1):
             st.success("Calor excedentario disponible para otros usos.")
-    
+
+    # --- ANÁLISIS DE SENSIBILIDAD Y BARRIDOS DE PARÁMETROS ---
+    etapa("ui.analisis")
+    st.markdown("---")
+    st.subheader("Análisis de Sensibilidad")
+    with st.expander("Gráficos tornado y araña", expanded=False):
+        salida_sens_texto = st.selectbox("Resultado analizado", list(SALIDAS_SENSIBILIDAD), key="salida_sens_main")
+        salida_sens = SALIDAS_SENSIBILIDAD[salida_sens_texto]
+        parametros_sens_texto = st.multiselect(
+            "Parámetros a variar", list(PARAMETROS_SENSIBILIDAD), key="parametros_sens_main",
+            default=["BMP (Nm³ CH₄/kg SV)", "Sólidos Totales (%)", "Eficiencia de digestión (%)", "TRH (días)", "U digestor (W/m²K)"])
+        variacion_sens_porcentaje = st.slider("Variación respecto al caso base (± %)", 5, 50, 20, step=5, key="variacion_sens_main")
+        if parametros_sens_texto:
+            fraccion = variacion_sens_porcentaje / 100
+            claves_sens = [PARAMETROS_SENSIBILIDAD[texto] for texto in parametros_sens_texto]
+            etiquetas_sens = dict(zip(claves_sens, parametros_sens_texto))
+            filas_tornado = analisis_tornado(inputs_balance, variaciones_simetricas(inputs_balance, claves_sens, fraccion), salida=salida_sens)
+            st.markdown(f"**Tornado** (variación de {salida_sens_texto} respecto al caso base)")
+            st.bar_chart(pd.DataFrame({
+                f"-{variacion_sens_porcentaje}%": [fila['salida_bajo'] - fila['salida_base'] for fila in filas_tornado],
+                f"+{variacion_sens_porcentaje}%": [fila['salida_alto'] - fila['salida_base'] for fila in filas_tornado],
+            }, index=[etiquetas_sens[fila['parametro']] for fila in filas_tornado]), horizontal=True, stack=False)
+            variaciones_relativas = np.linspace(-fraccion, fraccion, 11)
+            curvas_arana = analisis_arana(inputs_balance, claves_sens, variaciones_relativas, salida=salida_sens)
+            st.markdown(f"**Araña** ({salida_sens_texto} frente a la variación de cada parámetro, %)")
+            st.line_chart(pd.DataFrame(
+                {etiquetas_sens[clave]: valores for clave, valores in curvas_arana.items()},
+                index=pd.Index(np.round(variaciones_relativas * 100, 1), name="Variación (%)")))
+
+    with st.expander("Barrido de parámetros (rejilla o hipercubo latino)", expanded=False):
+        metodo_barrido = st.radio("Método", ["Rejilla (producto cartesiano)", "Hipercubo latino"], horizontal=True, key="metodo_barrido_main")
+        tabla_barrido = st.data_editor(
+            pd.DataFrame({
+                "Parámetro": ["BMP (Nm³ CH₄/kg SV)", "Sólidos Totales (%)", "Eficiencia de digestión (%)", "TRH (días)", "U digestor (W/m²K)"],
+                "Mínimo": [bmp_nm3_ch4_kg_sv * 0.8, st_porcentaje * 0.8, eficiencia_digestion_porcentaje * 0.8, trh_dias * 0.8, u_digestor_w_m2_k * 0.8],
+                "Máximo": [bmp_nm3_ch4_kg_sv * 1.2, st_porcentaje * 1.2, eficiencia_digestion_porcentaje * 1.2, trh_dias * 1.2, u_digestor_w_m2_k * 1.2],
+                "Puntos": [10, 10, 10, 10, 10],
+            }),
+            num_rows="dynamic", width="stretch", key="tabla_barrido_main",
+            column_config={"Parámetro": st.column_config.SelectboxColumn(options=list(PARAMETROS_SENSIBILIDAD), required=True)})
+        tabla_barrido = tabla_barrido.dropna(subset=["Parámetro", "Mínimo", "Máximo"])
+        if metodo_barrido == "Hipercubo latino":
+            n_muestras_barrido = st.number_input("Número de muestras", min_value=100, max_value=MAX_PUNTOS_BARRIDO, value=100000, step=1000, key="n_muestras_main")
+        else:
+            n_muestras_barrido = int(np.prod(tabla_barrido["Puntos"].fillna(1).clip(lower=1).astype(int))) if len(tabla_barrido) else 0
+            st.caption(f"Puntos de la rejilla: {n_muestras_barrido:,}")
+        if st.button("Ejecutar barrido", key="ejecutar_barrido_main"):
+            if tabla_barrido.empty:
+                st.warning("Defina al menos un parámetro para el barrido.")
+            elif n_muestras_barrido > MAX_PUNTOS_BARRIDO:
+                st.error(f"El barrido supera el máximo de {MAX_PUNTOS_BARRIDO:,} puntos.")
+            else:
+                claves_barrido = [PARAMETROS_SENSIBILIDAD[texto] for texto in tabla_barrido["Parámetro"]]
+                if metodo_barrido == "Hipercubo latino":
+                    muestras_barrido = muestreo_hipercubo_latino(
+                        dict(zip(claves_barrido, zip(tabla_barrido["Mínimo"], tabla_barrido["Máximo"]))), n_muestras_barrido, semilla=0)
+                    salidas_barrido = evaluar_muestras(inputs_balance, muestras_barrido)
+                else:
+                    salidas_barrido = evaluar_barrido_rejilla(inputs_balance, {
+                        clave: np.linspace(fila["Mínimo"], fila["Máximo"], max(int(fila["Puntos"] or 1), 1))
+                        for clave, (_, fila) in zip(claves_barrido, tabla_barrido.iterrows())})
+                resumen_barrido = resumir_salidas(salidas_barrido)
+                st.dataframe(pd.DataFrame({
+                    texto: {"Mínimo": resumen_barrido[clave]['minimo'], "P10": resumen_barrido[clave]['P10'],
+                            "P50": resumen_barrido[clave]['P50'], "P90": resumen_barrido[clave]['P90'],
+                            "Máximo": resumen_barrido[clave]['maximo'], "Casos con déficit (%)": 100 * resumen_barrido[clave]['fraccion_deficit']}
+                    for texto, clave in SALIDAS_SENSIBILIDAD.items()}).T.style.format("{:.2f}"), width="stretch")
+                st.caption(f"Escenarios evaluados: {n_muestras_barrido:,}")
+
+    with st.expander("Incertidumbre (Monte Carlo)", expanded=False):
+        st.caption("Normal: media = 'Más probable / Media', desviación = 'Desviación', recortada a [Mínimo, Máximo] si se indican. "
+                   "Triangular: Mínimo, Más probable, Máximo. Uniforme: Mínimo, Máximo.")
+        tabla_montecarlo = st.data_editor(
+            pd.DataFrame({
+                "Parámetro": ["BMP (Nm³ CH₄/kg SV)", "Eficiencia de digestión (%)", "U digestor (W/m²K)"],
+                "Distribución": ["Triangular", "Normal", "Uniforme"],
+                "Mínimo": [bmp_nm3_ch4_kg_sv * 0.8, 0.0, u_digestor_w_m2_k * 0.8],
+                "Más probable / Media": [bmp_nm3_ch4_kg_sv, eficiencia_digestion_porcentaje, u_digestor_w_m2_k],
+                "Máximo": [bmp_nm3_ch4_kg_sv * 1.1, 100.0, u_digestor_w_m2_k * 2.0],
+                "Desviación": [0.0, eficiencia_digestion_porcentaje * 0.1, 0.0],
+            }),
+            num_rows="dynamic", width="stretch", key="tabla_montecarlo_main",
+            column_config={
+                "Parámetro": st.column_config.SelectboxColumn(options=list(PARAMETROS_SENSIBILIDAD), required=True),
+                "Distribución": st.column_config.SelectboxColumn(options=list(DISTRIBUCIONES_MONTECARLO), required=True),
+            })
+        # Mínimo y Máximo vacíos se quedan en NaN: una normal sin límites no se recorta.
+        tabla_montecarlo = tabla_montecarlo.dropna(subset=["Parámetro", "Distribución"]).fillna(
+            {"Más probable / Media": 0.0, "Desviación": 0.0})
+        col_mc1, col_mc2, col_mc3 = st.columns(3)
+        with col_mc1:
+            n_muestras_montecarlo = st.number_input("Número máximo de muestras", min_value=1000, max_value=MAX_PUNTOS_BARRIDO, value=200000, step=10000, key="n_muestras_mc_main")
+        with col_mc2:
+            semilla_montecarlo = st.number_input("Semilla", min_value=0, value=0, step=1, key="semilla_mc_main")
+        with col_mc3:
+            parada_temprana = st.checkbox("Parar al converger los percentiles", value=True, key="parada_mc_main")
+        if st.button("Ejecutar Monte Carlo", key="ejecutar_mc_main"):
+            if tabla_montecarlo.empty:
+                st.warning("Defina al menos un parámetro incierto.")
+            else:
+                try:
+                    distribuciones = {
+                        PARAMETROS_SENSIBILIDAD[fila["Parámetro"]]: construir_distribucion(
+                            DISTRIBUCIONES_MONTECARLO[fila["Distribución"]], fila["Mínimo"], fila["Más probable / Media"],
+                            fila["Máximo"], fila["Desviación"])
+                        for _, fila in tabla_montecarlo.iterrows()}
+                    resumen_mc = simular_montecarlo(
+                        inputs_balance, distribuciones, int(n_muestras_montecarlo), semilla=int(semilla_montecarlo),
+                        tolerancia_convergencia=0.002 if parada_temprana else None)
+                except ValueError as error:
+                    st.error(f"Distribución no válida: {error}")
+                else:
+                    st.dataframe(pd.DataFrame({
+                        texto: {
+                            "P10": resumen_mc['salidas'][clave]['P10'], "P50": resumen_mc['salidas'][clave]['P50'],
+                            "P90": resumen_mc['salidas'][clave]['P90'], "Media": resumen_mc['salidas'][clave]['media'],
+                            "Probabilidad de déficit (%)": 100 * resumen_mc['salidas'][clave]['probabilidad_deficit'],
+                        } for texto, clave in SALIDAS_SENSIBILIDAD.items()}).T.style.format("{:.2f}"), width="stretch")
+                    col_mcr1, col_mcr2, col_mcr3 = st.columns(3)
+                    col_mcr1.metric("Probabilidad de déficit térmico", f"{100 * resumen_mc['probabilidad_deficit_termico']:.2f} %")
+                    col_mcr2.metric("Probabilidad de déficit eléctrico", f"{100 * resumen_mc['probabilidad_deficit_electrico']:.2f} %",
+                                    help="Solo en las muestras con cogeneración: con caldera o upgrading la electricidad neta es siempre un consumo.")
+                    col_mcr3.metric("Probabilidad de déficit térmico o eléctrico", f"{100 * resumen_mc['probabilidad_deficit_termico_o_electrico']:.2f} %")
+                    st.caption(f"Muestras evaluadas: {resumen_mc['n_muestras']:,}" + (" (percentiles convergidos)" if resumen_mc['convergido'] else ""))
+
+    with st.expander("Simulación horaria con series de temperatura", expanded=False):
+        st.caption("Fichero CSV o Parquet con una fila por hora y las columnas 'marca_tiempo' y 'temp_ambiente_c'; "
+                   "opcionalmente 'temp_sustrato_entrada_c' y 'caudal_sustrato_kg_dia' (caudal horario expresado en kg/día). "
+                   "El digestor se dimensiona con el caudal y el TRH del diseño.")
+        fichero_serie = st.file_uploader("Serie horaria", type=["csv", "parquet"], key="serie_horaria_main")
+        if fichero_serie is not None:
+            try:
+                resumen_serie = simular_serie(inputs_balance, leer_series_por_bloques(fichero_serie))
+            except (KeyError, ValueError) as error:
+                st.error(f"No se pudo leer la serie horaria: {error}")
+            else:
+                if not resumen_serie['n_horas']:
+                    st.warning("La serie horaria está vacía.")
+                else:
+                    col_serie1, col_serie2, col_serie3 = st.columns(3)
+                    col_serie1.metric("Horas simuladas", f"{resumen_serie['n_horas']:,}")
+                    col_serie2.metric("Horas con déficit térmico", f"{int(resumen_serie['horas_deficit_termico'][0]):,}")
+                    hora_deficit_maximo = resumen_serie['hora_deficit_termico_maximo'][0]
+                    col_serie3.metric("Déficit térmico máximo", f"{resumen_serie['deficit_termico_maximo_mj_h'][0]:.2f} MJ/h",
+                                      None if np.isnat(hora_deficit_maximo) else str(hora_deficit_maximo), delta_color="off")
+                    st.markdown("**Balance térmico mensual (MJ/mes)**")
+                    st.line_chart(pd.DataFrame({
+                        "Calor útil generado": resumen_serie['mensual']['calor_util_generado_mj'][0],
+                        "Demanda térmica digestor": resumen_serie['mensual']['demanda_termica_total_digestor_mj'][0],
+                        "Déficit térmico": resumen_serie['mensual']['deficit_termico_mj'][0],
+                    }, index=pd.Index(resumen_serie['meses'].astype('datetime64[ns]'), name="Mes")))
+                    st.markdown("**Totales anuales**")
+                    st.dataframe(pd.DataFrame({
+                        "Electricidad neta (kWh)": resumen_serie['anual']['electricidad_neta_exportable_kwh'][0],
+                        "Calor neto (MJ)": resumen_serie['anual']['calor_neto_disponible_mj'][0],
+                        "Déficit térmico (MJ)": resumen_serie['anual']['deficit_termico_mj'][0],
+                    }, index=pd.Index(resumen_serie['anios'].astype(str), name="Año")).style.format("{:,.0f}"), width="stretch")
+
+    with st.expander("Optimización de la receta de co-digestión", expanded=False):
+        if not scipy_disponible():
+            st.warning("Optimización no disponible (falta 'scipy').")
+        else:
+            st.caption("Caudal de cada sustrato y TRH que maximizan el objetivo con el resto de parámetros del proyecto "
+                       "(temperaturas, U, uso del biogás, eficiencias y consumos auxiliares).")
+            biblioteca_opt = obtener_biblioteca_sustratos()
+            tabla_disponibilidad = st.data_editor(
+                pd.DataFrame({"Sustrato": biblioteca_opt.nombres,
+                              "Mínimo (kg/día)": 0.0, "Máximo (kg/día)": float(caudal_sustrato_kg_dia)}),
+                column_config={"Sustrato": st.column_config.SelectboxColumn("Sustrato", options=biblioteca_opt.nombres, required=True)},
+                num_rows="dynamic", width="stretch", key="tabla_disponibilidad_main")
+            col_opt1, col_opt2, col_opt3 = st.columns(3)
+            objetivo_opt = col_opt1.selectbox("Maximizar", list(OBJETIVOS), key="objetivo_opt_main",
+                                              format_func={'electricidad': "Electricidad neta exportable", 'calor': "Calor neto disponible"}.get)
+            st_max_opt = col_opt2.number_input("ST máximo de la mezcla (%)", min_value=1.0, max_value=100.0, value=12.0, step=0.5, key="st_max_opt_main")
+            volumen_max_opt = col_opt3.number_input("Volumen máximo del digestor (m³, 0 = sin límite)", min_value=0.0,
+                                                    value=float(round(dim_digestor['volumen_digestor_m3'], 1)), key="volumen_max_opt_main")
+            trh_rango_opt = st.slider("TRH candidatos (días)", 10, 90, (max(10, int(trh_dias) - 10), min(90, int(trh_dias) + 10)), key="trh_rango_opt_main")
+            paso_trh_opt = st.number_input("Paso de TRH (días)", min_value=1, max_value=30, value=5, key="paso_trh_opt_main")
+            if st.button("Optimizar receta", key="optimizar_receta_main"):
+                disponibilidad = {
+                    fila["Sustrato"]: (fila["Mínimo (kg/día)"], fila["Máximo (kg/día)"])
+                    for _, fila in tabla_disponibilidad.dropna().iterrows() if fila["Máximo (kg/día)"] > 0
+                }
+                if not disponibilidad:
+                    st.warning("Indique al menos un sustrato con disponibilidad máxima mayor que cero.")
+                else:
+                    optimo = optimizar_mezcla(
+                        inputs_balance, biblioteca_opt, disponibilidad, objetivo=objetivo_opt,
+                        trh_opciones=range(trh_rango_opt[0], trh_rango_opt[1] + 1, int(paso_trh_opt)),
+                        st_max_porcentaje=st_max_opt, volumen_max_m3=volumen_max_opt or None)
+                    if not optimo['factible']:
+                        st.error("No existe ninguna receta que cumpla las restricciones (revise disponibilidades, ST máximo y volumen).")
+                    else:
+                        res_opt = optimo['resultados']
+                        col_optr1, col_optr2, col_optr3 = st.columns(3)
+                        col_optr1.metric("Electricidad neta exportable", f"{res_opt['electricidad_neta_exportable_kwh_dia']:.2f} kWh/día")
+                        col_optr2.metric("Calor neto disponible", f"{res_opt['calor_neto_disponible_mj_dia']:.2f} MJ/día")
+                        col_optr3.metric("TRH óptimo", f"{optimo['trh_dias']:.0f} días",
+                                         f"Volumen {optimo['dimensiones']['volumen_digestor_m3']:.1f} m³", delta_color="off")
+                        st.dataframe(pd.DataFrame({
+                            "Caudal (kg/día)": optimo['caudales'],
+                            "Fracción (%)": {nombre: 100 * fraccion for nombre, fraccion in optimo['fracciones'].items()},
+                        }).style.format("{:,.1f}"), width="stretch")
+                        st.caption(f"ST de la mezcla: {optimo['entradas_balance']['st_porcentaje']:.2f} % · "
+                                   f"programas lineales resueltos: {optimo['n_programas_lineales']}")
+
+    # --- ESCENARIOS GUARDADOS (ALMACÉN LOCAL) ---
+    etapa("ui.escenarios")
+    project_info_dict = {"nombre": project_name, "analista": analyst_name, "fecha": current_date}
+    almacen = obtener_almacen()
+    st.markdown("---")
+    st.subheader("Escenarios Guardados")
+    col_guardar1, col_guardar2 = st.columns([1, 3])
+    if col_guardar1.button("💾 Guardar escenario", key="guardar_escenario_main"):
+        huella_guardada = almacen.guardar(inputs_balance, project_info_dict, results, dim_digestor)
+        col_guardar2.success(f"Escenario guardado en el proyecto '{project_name}' ({huella_guardada[:12]}).")
+    with st.expander("Buscar y comparar escenarios guardados", expanded=False):
+        col_filtro1, col_filtro2, col_filtro3 = st.columns(3)
+        filtro_proyecto = col_filtro1.text_input("Proyecto", value=project_name, key="filtro_proyecto_main")
+        filtro_analista = col_filtro2.text_input("Analista (vacío = todos)", value="", key="filtro_analista_main")
+        filtro_desde = col_filtro3.date_input("Desde (opcional)", value=None, key="filtro_desde_main")
+        escenarios_guardados = almacen.buscar(proyecto=filtro_proyecto or None, analista=filtro_analista or None,
+                                              desde=filtro_desde.isoformat() if filtro_desde else None)
+        if not escenarios_guardados:
+            st.info("No hay escenarios guardados con estos filtros.")
+        else:
+            etiquetas_guardados = {
+                f"{guardado['proyecto']} · {guardado['analista']} · {guardado['fecha']} · {guardado['hash'][:8]}": guardado['hash']
+                for guardado in escenarios_guardados}
+            seleccion_guardados = st.multiselect("Escenarios a comparar con el actual", list(etiquetas_guardados),
+                                                 default=list(etiquetas_guardados)[:3], key="comparar_escenarios_main")
+            comparacion = almacen.comparar([etiquetas_guardados[etiqueta] for etiqueta in seleccion_guardados],
+                                           list(RESULTADOS_COMPARACION.values()))
+            resultados_actuales = dict(results, **dim_digestor)
+            st.dataframe(pd.DataFrame(
+                {"Escenario actual": [resultados_actuales.get(clave) for clave in RESULTADOS_COMPARACION.values()],
+                 **{etiqueta: [comparacion[clave][i] for clave in RESULTADOS_COMPARACION.values()]
+                    for i, etiqueta in enumerate(seleccion_guardados)}},
+                index=list(RESULTADOS_COMPARACION), dtype=float).style.format("{:,.2f}", na_rep="-"), width="stretch")
+            st.caption(f"Escenarios en el almacén: {almacen.estadisticas()['escenarios']:,} · fichero: {almacen.ruta}")
+
+    # --- CARTERA DE PLANTAS (FLOTA) ---
+    # Cada planta es un conjunto de entradas guardado en el almacén; al añadir o cambiar una planta
+    # solo se recalcula esa planta y los totales de la flota se corrigen con la diferencia.
+    etapa("ui.cartera")
+    st.markdown("---")
+    st.subheader("Cartera de Plantas (Flota)")
+    col_cartera1, col_cartera2, col_cartera3 = st.columns([2, 2, 1])
+    nombre_cartera = col_cartera1.text_input("Cartera", value="Flota", key="nombre_cartera_main")
+    grupo_planta = col_cartera2.text_input("Grupo de la planta (región, operador...)", value="", key="grupo_planta_main")
+    cartera = obtener_cartera(nombre_cartera)
+    if col_cartera3.button("➕ Añadir/actualizar planta", key="anadir_planta_main"):
+        with tramo("ui.cartera_actualizar"):
+            cartera.fijar(project_name, inputs_balance, grupo_planta)
+        st.success(f"Planta '{project_name}' guardada en la cartera '{nombre_cartera}'.")
+    with st.expander("Cargar plantas desde fichero", expanded=False):
+        st.caption("Fichero CSV o Parquet con una fila por planta: columna 'planta', opcionalmente 'grupo', y las "
+                   "entradas del balance que cambien respecto al diseño actual (mismos nombres que en la CLI).")
+        fichero_plantas = st.file_uploader("Plantas", type=["csv", "parquet"], key="plantas_cartera_main")
+        if fichero_plantas is not None and st.button("Cargar en la cartera", key="cargar_plantas_main"):
+            plantas_cargadas = 0
+            try:
+                with tramo("ui.cartera_carga"):
+                    for bloque in leer_plantas(fichero_plantas, inputs_balance):
+                        cartera.cargar_plantas(bloque)
+                        plantas_cargadas += len(bloque)
+            except (KeyError, ValueError) as error:
+                st.error(f"No se pudieron cargar las plantas: {error}"
+                         + (f" (se cargaron {plantas_cargadas:,} plantas de los bloques anteriores)" if plantas_cargadas else ""))
+            else:
+                st.success(f"{plantas_cargadas:,} plantas cargadas en la cartera '{nombre_cartera}'.")
+    if not len(cartera):
+        st.info("La cartera está vacía: añada la planta actual o cargue un fichero de plantas.")
+    else:
+        t_cartera = time.perf_counter()
+        totales_cartera = cartera.agregados()
+        columnas_metricas = st.columns(4)
+        columnas_metricas[0].metric("Plantas", f"{totales_cartera['plantas']:,}")
+        columnas_metricas[1].metric("Biogás de la flota", f"{totales_cartera['biogas_producido_nm3_dia']:,.0f} Nm³/día")
+        columnas_metricas[2].metric("Electricidad exportada", f"{totales_cartera['electricidad_exportada_kwh_dia']:,.0f} kWh/día",
+                                    f"Consumo aux. {totales_cartera['consumo_electrico_aux_total_kwh_dia']:,.0f} kWh/día", delta_color="off")
+        columnas_metricas[3].metric("Déficit térmico", f"{totales_cartera['deficit_termico_mj_dia']:,.0f} MJ/día",
+                                    f"{totales_cartera['plantas_deficit_termico']:.0f} plantas", delta_color="off")
+        por_grupo = cartera.agregados_por_grupo()
+        if len(por_grupo) > 1:
+            st.markdown("**Totales por grupo**")
+            st.dataframe(pd.DataFrame(
+                {grupo or "(sin grupo)": {"Plantas": agregados['plantas'],
+                                          **{texto: agregados[clave] for texto, clave in AGREGADOS_CARTERA.items()}}
+                 for grupo, agregados in sorted(por_grupo.items())}).T.style.format("{:,.1f}"), width="stretch")
+        with st.expander(f"Plantas de la cartera ({len(cartera):,})", expanded=False):
+            tabla_cartera = cartera.tabla(list(RESULTADOS_COMPARACION.values()))
+            st.dataframe(pd.DataFrame(
+                {"Planta": tabla_cartera['planta'], "Grupo": tabla_cartera['grupo'],
+                 **{texto: tabla_cartera[clave] for texto, clave in RESULTADOS_COMPARACION.items()}}
+            ).set_index("Planta").style.format("{:,.2f}", subset=list(RESULTADOS_COMPARACION)), width="stretch")
+            col_eliminar1, col_eliminar2 = st.columns([3, 1])
+            planta_eliminar = col_eliminar1.selectbox("Planta a eliminar", cartera.plantas, key="planta_eliminar_main")
+            if col_eliminar2.button("🗑️ Eliminar", key="eliminar_planta_main"):
+                cartera.eliminar(planta_eliminar)
+                st.rerun()
+        st.caption(f"Panel de la flota actualizado en {(time.perf_counter() - t_cartera) * 1e3:.1f} ms · "
+                   f"plantas recalculadas desde que se abrió la cartera: {cartera.n_plantas_recalculadas:,}")
+
     # --- EXPORTACIÓN DE RESULTADOS (SE MANTIENE EN LA BARRA LATERAL) ---
+    etapa("ui.exportacion")
     st.sidebar.markdown("---")
     st.sidebar.header("Exportar Resultados")
-    project_info_dict = {"nombre": project_name, "analista": analyst_name, "fecha": current_date}
     
-    def sanitize_text_for_fpdf(text):
-        if not isinstance(text, str): text = str(text)
-        # Caracteres a reemplazar y sus reemplazos
-        # Esta lista puede necesitar ser extendida
-        replacements = {
-            '€': 'EUR', 'ñ': 'n', 'Ñ': 'N', 'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U', 'ü': 'u', 'Ü': 'U', '¿': '', '¡': '',
-            '°': 'deg', '%': 'porc', '(': '', ')': '', ':': '', '/': '-', # Evitar caracteres que FPDF podría interpretar mal
-            # Es importante que no queden caracteres que no sean latin-1 o cp1252
-        }
-        for original, replacement in replacements.items():
-            text = text.replace(original, replacement)
-        
-        # Forzar codificación a 'latin-1' (o 'cp1252'), reemplazando caracteres no soportados
-        try:
-            return text.encode('latin-1', 'replace').decode('latin-1')
-        except Exception: # Si la sanitización falla, devolver algo seguro
-            return "Texto_No_Soportado"
-
-    def generar_excel_bytes(all_inputs, results_dict, dim_digestor_dict, project_info):
-        if not OPENPYXL_AVAILABLE: 
-            st.sidebar.warning("Exportación a Excel no disponible (falta 'openpyxl').")
-            return None
-        # ... (código de generar_excel_bytes como antes, rellenar todos los add_excel_row)
-        # Asegúrate de que todas las claves necesarias estén en all_inputs y results_dict
-        # y se accedan con .get()
-        # Ejemplo:
-        # add_excel_row(ws, ["Sustrato:", all_inputs.get('sustrato_nombre', 'N/A')])
-        # (Código completo de generar_excel_bytes omitido por brevedad, usar el de la versión anterior)
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Resumen Balance Energético"
-        header_font = Font(bold=True, size=12, color="00FFFFFF")
-        category_font = Font(bold=True)
-        bold_font = Font(bold=True)
-        ws['A1'] = f"Balance Energético Preliminar: {project_info['nombre']}"
-        ws.merge_cells('A1:D1'); ws['A1'].font = Font(bold=True, size=14); ws['A1'].alignment = Alignment(horizontal="center")
-        ws['A2'] = f"Fecha: {project_info['fecha']}"; ws['A3'] = f"Analista: {project_info['analista']}"; ws.append([])
-        def add_excel_row(sheet, data, font=None):
-            sheet.append([str(d) for d in data]) # Convertir todo a string para Excel
-            if font:
-                for cell in sheet[sheet.max_row]: cell.font = font
-        current_row_excel = ws.max_row + 1 
-        add_excel_row(ws, ["PARÁMETROS DE ENTRADA"], font=header_font) 
-        ws.merge_cells(start_row=current_row_excel, start_column=1, end_row=current_row_excel, end_column=3); current_row_excel +=1
-        
-        # Lista completa de parámetros de entrada para Excel
-        input_params_excel = [
-            ("Sustrato:", 'sustrato_nombre'), ("Caudal Sustrato (kg/día):", 'caudal_sustrato_kg_dia'),
-            ("ST (%):", 'st_porcentaje'), ("SV (% de ST):", 'sv_de_st_porcentaje'),
-            ("Fuente BMP:", 'bmp_fuente_texto'), ("BMP (Nm³ CH₄/kg SV):", 'bmp_nm3_ch4_kg_sv'),
-            ("Temp. Op. Digestor (°C):", 'temp_op_digestor_c', lambda v: f"({all_inputs.get('temp_op_digestor_texto','N/A')})"),
-            ("Eficiencia Digestión (%):", 'eficiencia_digestion_porcentaje'),
-            ("%CH₄ en biogás:", 'ch4_en_biogas_porcentaje'),
-            ("Uso Principal Biogás:", 'uso_biogas_texto'),
-        ]
-        if all_inputs.get('uso_biogas_opcion_idx') == 0:
-            input_params_excel.extend([
-                ("Eficiencia Eléctrica CHP (%):", 'chp_eficiencia_electrica_porcentaje'),
-                ("Eficiencia Térmica CHP (%):", 'chp_eficiencia_termica_porcentaje')
-            ])
-        elif all_inputs.get('uso_biogas_opcion_idx') == 1:
-            input_params_excel.append(("Eficiencia Caldera (%):", 'caldera_eficiencia_porcentaje'))
-        
-        for label, key, *extra in input_params_excel:
-            val = all_inputs.get(key, 'N/A')
-            row_data = [label, val]
-            if extra and callable(extra[0]): row_data.append(extra[0](val))
-            add_excel_row(ws, row_data)
-
-        ws.append([]); current_row_excel = ws.max_row
-        add_excel_row(ws, ["RESULTADOS DEL BALANCE (por día)"], font=header_font)
-        ws.merge_cells(start_row=current_row_excel, start_column=1, end_row=current_row_excel, end_column=3); current_row_excel +=1
-        
-        # Rellenar con más resultados
-        add_excel_row(ws, ["BALANCE NETO:"], font=category_font)
-        add_excel_row(ws, ["  Electricidad Neta Exportable (kWh/día):", results_dict.get('electricidad_neta_exportable_kwh_dia',0)], font=bold_font)
-        add_excel_row(ws, ["  Calor Neto Disponible/Déficit (MJ/día):", results_dict.get('calor_neto_disponible_mj_dia',0)], font=bold_font)
-
-        for col_letter in ['A', 'B', 'C']: ws.column_dimensions[col_letter].width = 35 if col_letter == 'A' else 15
-        
-        excel_stream = BytesIO()
-        wb.save(excel_stream)
-        excel_stream.seek(0)
-        return excel_stream.getvalue()
-
-
-    def generar_pdf_bytes(all_inputs, results_dict, dim_digestor_dict, project_info):
-        if not FPDF_AVAILABLE:
-            st.sidebar.warning("Exportación a PDF no disponible (falta 'fpdf2').")
-            return None
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.set_font("Arial", "", 10) # Establecer fuente base
-
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 10, sanitize_text_for_fpdf(f"Balance Energético Preliminar: {project_info['nombre']}"), 0, 1, "C")
-        pdf.set_font("Arial", "", 10)
-        pdf.cell(0, 6, sanitize_text_for_fpdf(f"Fecha: {project_info['fecha']} | Analista: {project_info['analista']}"), 0, 1, "C")
-        pdf.ln(5)
-        
-        def add_pdf_section(title_pdf, data_dict_pdf):
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(0, 8, sanitize_text_for_fpdf(title_pdf), 0, 1, "L")
-            pdf.set_font("Arial", "", 9)
-            for key, value in data_dict_pdf.items():
-                s_key = sanitize_text_for_fpdf(str(key))
-                if isinstance(value, tuple):
-                    s_val0 = sanitize_text_for_fpdf(str(value[0]))
-                    s_val1 = sanitize_text_for_fpdf(str(value[1])) if len(value) > 1 else ''
-                    line = f"  {s_key.ljust(45)}: {s_val0.ljust(15)} {s_val1}"
-                else:
-                    s_val = sanitize_text_for_fpdf(str(value))
-                    line = f"  {s_key.ljust(45)}: {s_val}"
-                pdf.multi_cell(0, 5, line, 0, "L") # Usar 0 para ancho completo menos márgenes
-            pdf.ln(3)
-
-        # ... (contenido de input_data_pdf_content y results_data_pdf_content como antes, usando .get()) ...
-        input_data_pdf_content = {
-            "Sustrato": all_inputs.get('sustrato_nombre', 'N/A'),
-            "Caudal Sustrato (kg/día)": all_inputs.get('caudal_sustrato_kg_dia',0),
-            # ... (muchos más)
-        }
-        add_pdf_section("PARÁMETROS DE ENTRADA", input_data_pdf_content)
-        
-        results_data_pdf_content = {
-             "Dimensiones Digestor:": {
-                "Volumen Estimado (m³)": f"{dim_digestor_dict.get('volumen_digestor_m3',0):.2f}",
-                "Diámetro Estimado (m)": f"{dim_digestor_dict.get('diametro_digestor_m',0):.2f}",
-            },
-            # ... (muchos más)
-            "BALANCE NETO:": {
-                "ELECTRICIDAD NETA EXPORTABLE (kWh/día)": f"{results_dict.get('electricidad_neta_exportable_kwh_dia',0):.2f}" if all_inputs.get('uso_biogas_opcion_idx') == 0 else f"{-results_dict.get('consumo_electrico_aux_total_kwh_dia',0):.2f} (Consumo)",
-                "CALOR NETO DISPONIBLE/DÉFICIT (MJ/día)": f"{results_dict.get('calor_neto_disponible_mj_dia',0):.2f}",
-            }
-        }
-        pdf.set_font("Arial", "B", 12)
-        pdf.cell(0, 10, sanitize_text_for_fpdf("RESULTADOS DEL BALANCE (por día)"), 0, 1, "L")
-        for section_title, data_items in results_data_pdf_content.items():
-            pdf.set_font("Arial", "BU", 10)
-            pdf.cell(0, 6, sanitize_text_for_fpdf(section_title), 0, 1, "L")
-            pdf.set_font("Arial", "", 9)
-            for key, value in data_items.items():
-                s_key = sanitize_text_for_fpdf(str(key))
-                s_val = sanitize_text_for_fpdf(str(value))
-                line = f"  {s_key.ljust(50)}: {s_val}"
-                pdf.multi_cell(0, 5, line, 0, "L")
-            pdf.ln(2)
-
-        pdf.ln(5); pdf.set_font("Arial", "B", 10); pdf.cell(0, 6, sanitize_text_for_fpdf("Notas Importantes:"), 0, 1, "L")
-        pdf.set_font("Arial", "I", 9)
-        pdf.multi_cell(0, 5, sanitize_text_for_fpdf(
-            "- Este es un balance PRELIMINAR basado en estimaciones y supuestos.\n"
-            "- Los valores de BMP, eficiencias y pérdidas pueden variar significativamente.\n"
-            "- Se recomienda un análisis detallado con datos específicos del proyecto y de proveedores."
-            ), 0, "L")
-        
-        # Corrección del error FPDF: pdf.output(dest='S') ya devuelve bytes.
-        pdf_bytes_output = pdf.output(dest='S')
-        if isinstance(pdf_bytes_output, str): # Por si alguna versión antigua devuelve str
-            return pdf_bytes_output.encode('latin-1')
-        return pdf_bytes_output # Debería ser bytes o bytearray
-
-    excel_data = generar_excel_bytes(inputs_balance, results, dim_digestor, project_info_dict)
-    if excel_data:
+    # data recibe un callable: el informe se construye (o se toma de la caché) solo al descargar.
+    if openpyxl_disponible():
         st.sidebar.download_button(
-            label="📥 Descargar Resultados en Excel", data=excel_data,
+            label="📥 Descargar Resultados en Excel",
+            data=partial(descargar, "exportacion_xlsx", generar_informe_cacheado, "xlsx", inputs_balance, results, dim_digestor, project_info_dict),
             file_name=f"{project_name.replace(' ', '_')}_Balance_Energia_{current_date}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            on_click="ignore"
         )
+    else:
+        st.sidebar.warning("Exportación a Excel no disponible (falta 'openpyxl').")
 
-    pdf_data = generar_pdf_bytes(inputs_balance, results, dim_digestor, project_info_dict)
-    if pdf_data:
+    if fpdf_disponible():
         st.sidebar.download_button(
-            label="📄 Descargar Resultados en PDF", data=pdf_data,
+            label="📄 Descargar Resultados en PDF",
+            data=partial(descargar, "exportacion_pdf", generar_informe_cacheado, "pdf", inputs_balance, results, dim_digestor, project_info_dict),
             file_name=f"{project_name.replace(' ', '_')}_Balance_Energia_{current_date}.pdf",
-            mime="application/pdf"
+            mime="application/pdf",
+            on_click="ignore"
         )
+    else:
+        st.sidebar.warning("Exportación a PDF no disponible (falta 'fpdf2').")
 else:
     st.info("ℹ️ Configure los parámetros y presione 'RESULTADOS BALANCE ENERGÍA' para ver el análisis.")
 
+etapa()
+
 st.sidebar.markdown("---")
 st.sidebar.info("Desarrollado como herramienta preliminar.")
+
+# --- PANEL DE RENDIMIENTO (DESARROLLO) ---
+st.sidebar.toggle("Panel de rendimiento (desarrollo)", key="panel_rendimiento_main",
+                  help="Mide el tiempo de cada etapa de esta ejecución, los aciertos de caché y los bytes exportados.")
+if panel_rendimiento:
+    with st.sidebar.expander("Rendimiento de esta ejecución", expanded=True):
+        eventos = traza_ejecucion.eventos
+        st.caption(f"Tiempo total medido: {sum(duracion for _, _, duracion, profundidad in eventos if profundidad == 0) * 1e3:.1f} ms")
+        st.dataframe(pd.DataFrame({
+            "Tramo": ["· " * profundidad + nombre for nombre, _, _, profundidad in eventos],
+            "Inicio (ms)": [(inicio - traza_ejecucion.inicio) * 1e3 for _, inicio, _, _ in eventos],
+            "Duración (ms)": [duracion * 1e3 for _, _, duracion, _ in eventos],
+        }).sort_values("Inicio (ms)").style.format({"Inicio (ms)": "{:.1f}", "Duración (ms)": "{:.2f}"}), hide_index=True, width="stretch")
+        if traza_ejecucion.contadores:
+            st.dataframe(pd.DataFrame({
+                "Contador": [nombre + "".join(f" {clave}={valor}" for clave, valor in etiquetas)
+                             for nombre, etiquetas in traza_ejecucion.contadores],
+                "Valor": list(traza_ejecucion.contadores.values()),
+            }), hide_index=True, width="stretch")
+    with st.sidebar.expander("Agregados del proceso", expanded=False):
+        agregados = instrumentacion.instantanea()
+        st.dataframe(pd.DataFrame({
+            "Llamadas": {nombre: estadistica['n'] for nombre, estadistica in agregados['tramos'].items()},
+            "Total (ms)": {nombre: estadistica['total_s'] * 1e3 for nombre, estadistica in agregados['tramos'].items()},
+            "Máximo (ms)": {nombre: estadistica['max_s'] * 1e3 for nombre, estadistica in agregados['tramos'].items()},
+        }).style.format({"Total (ms)": "{:.1f}", "Máximo (ms)": "{:.2f}"}), width="stretch")
+        st.download_button("Descargar métricas (Prometheus)", data=instrumentacion.texto_prometheus,
+                           file_name="balance_biogas.prom", mime="text/plain", on_click="ignore")
@@ -0,0 +1,25 @@
+# tests/conftest.py
+# Los tests importan el paquete desde la raíz del repositorio y reutilizan los generadores de
+# escenarios y los valores de referencia de benchmarks/ (sin depender de la velocidad de la máquina).
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+
+from bench_barrido import ESCENARIO_BASE  # noqa: E402
+
+
+@pytest.fixture
+def escenario_base():
+    return dict(ESCENARIO_BASE)
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    from balance_biogas.almacen import AlmacenEscenarios
+    with AlmacenEscenarios(str(tmp_path / "escenarios.sqlite")) as almacen:
+        yield almacen
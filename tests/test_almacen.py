@@ -0,0 +1,91 @@
+# tests/test_almacen.py
+# Almacén de escenarios: ida y vuelta de entradas y resultados, búsqueda, comparación,
+# informes guardados y poda.
+import pytest
+
+from balance_biogas import almacen as modulo_almacen
+from balance_biogas.almacen import AlmacenEscenarios
+from balance_biogas.exportacion import fpdf_disponible, openpyxl_disponible
+from balance_biogas.informes import preparar_escenario
+
+PROYECTO = {'nombre': "Planta Norte", 'analista': "Ana", 'fecha': "2026-03-15"}
+
+
+def test_guardar_y_cargar(almacen, escenario_base):
+    huella = almacen.guardar(escenario_base, PROYECTO)
+    assert almacen.guardar(dict(reversed(escenario_base.items())), PROYECTO) == huella
+    guardado = almacen.cargar(huella)
+    _, resultados, dimensiones = preparar_escenario(escenario_base)
+    assert guardado['entradas'] == {clave: float(valor) for clave, valor in escenario_base.items()}
+    assert guardado['resultados'] == resultados
+    assert guardado['dimensiones'] == dimensiones
+    assert almacen.estadisticas()['guardados'] == 1
+    with pytest.raises(KeyError):
+        almacen.cargar("0" * 64)
+
+
+def test_resultados_persisten_entre_aperturas(tmp_path, escenario_base):
+    ruta = str(tmp_path / "escenarios.sqlite")
+    with AlmacenEscenarios(ruta) as almacen:
+        huella, resultados, dimensiones = almacen.resultados(escenario_base)
+    with AlmacenEscenarios(ruta) as almacen:
+        assert almacen.resultados(escenario_base) == (huella, resultados, dimensiones)
+
+
+def test_buscar_y_comparar(almacen, escenario_base):
+    huellas = []
+    for i, (proyecto, analista, fecha) in enumerate([("A", "Ana", "2026-01-10"), ("A", "Luis", "2026-02-10"), ("B", "Ana", "2026-03-10")]):
+        huellas.append(almacen.guardar(dict(escenario_base, caudal_sustrato_kg_dia=1000.0 * (i + 1)),
+                                       {'nombre': proyecto, 'analista': analista, 'fecha': fecha}))
+    assert [fila['hash'] for fila in almacen.buscar(proyecto="A")] == [huellas[1], huellas[0]]
+    assert [fila['hash'] for fila in almacen.buscar(analista="Ana", desde="2026-02-01")] == [huellas[2]]
+    assert [fila['hash'] for fila in almacen.buscar(hasta="2026-01-31")] == [huellas[0]]
+    comparacion = almacen.comparar(huellas, ['biogas_producido_nm3_dia', 'volumen_digestor_m3'])
+    assert comparacion['volumen_digestor_m3'] == pytest.approx([30.0, 60.0, 90.0])
+    assert comparacion['biogas_producido_nm3_dia'][2] == pytest.approx(3 * comparacion['biogas_producido_nm3_dia'][0])
+
+
+def test_plantas_de_una_cartera(almacen, escenario_base):
+    almacen.guardar_planta("Flota", "P1", escenario_base, "Norte")
+    almacen.guardar_planta("Flota", "P1", dict(escenario_base, trh_dias=20.0), "Sur")
+    almacen.guardar_planta("Otra", "P2", escenario_base)
+    [planta] = almacen.plantas("Flota")
+    assert (planta['planta'], planta['grupo'], planta['entradas']['trh_dias']) == ("P1", "Sur", 20.0)
+    assert almacen.carteras() == ["Flota", "Otra"]
+    almacen.eliminar_planta("Flota", "P1")
+    assert almacen.plantas("Flota") == []
+
+
+@pytest.mark.skipif(not fpdf_disponible(), reason="fpdf2 no instalado")
+def test_informes_guardados_y_poda(almacen, escenario_base):
+    primero = almacen.informe(escenario_base, PROYECTO, 'pdf')
+    assert primero.startswith(b"%PDF")
+    assert almacen.informe(escenario_base, PROYECTO, 'pdf') == primero
+    assert almacen.estadisticas()['informes'] == 1
+    almacen.max_bytes_informes = len(primero) + 1
+    almacen.informe(dict(escenario_base, trh_dias=25.0), PROYECTO, 'pdf')
+    estadisticas = almacen.estadisticas()
+    assert estadisticas['informes'] == 1 and estadisticas['bytes_informes'] <= almacen.max_bytes_informes
+    with pytest.raises(ValueError):
+        almacen.informe(escenario_base, PROYECTO, 'docx')
+
+
+def test_cambio_de_version_no_reutiliza_lo_guardado(almacen, escenario_base, monkeypatch):
+    huella, resultados, _ = almacen.resultados(escenario_base)
+    almacen.guardar_planta("Flota", "P1", escenario_base)
+    assert almacen.plantas("Flota")[0]['vigente']
+    monkeypatch.setattr(modulo_almacen, 'VERSION_MODELO', modulo_almacen.VERSION_MODELO + 1)
+    nueva, resultados_nuevos, _ = almacen.resultados(escenario_base)
+    assert nueva != huella and resultados_nuevos == resultados
+    assert almacen.estadisticas()['escenarios'] == 2
+    assert not almacen.plantas("Flota")[0]['vigente']
+
+
+@pytest.mark.skipif(not openpyxl_disponible(), reason="openpyxl no instalado")
+def test_cambio_de_version_de_informes_los_regenera(almacen, escenario_base, monkeypatch):
+    almacen.informe(escenario_base, PROYECTO, 'xlsx')
+    almacen.informe(escenario_base, PROYECTO, 'xlsx')
+    assert almacen.estadisticas()['informes'] == 1
+    monkeypatch.setattr(modulo_almacen, 'VERSION_INFORMES', modulo_almacen.VERSION_INFORMES + 1)
+    almacen.informe(escenario_base, PROYECTO, 'xlsx')
+    assert almacen.estadisticas()['informes'] == 2
@@ -0,0 +1,134 @@
+# tests/test_barrido_montecarlo.py
+# Barridos y Monte Carlo: resultados independientes del tamaño de bloque y del número de
+# procesos, y reproducibles con la misma semilla.
+import numpy as np
+import pytest
+
+from balance_biogas.barrido import (
+    _entradas_base, analisis_tornado, evaluar_barrido_rejilla, evaluar_muestras, iterar_barrido_rejilla, muestreo_hipercubo_latino,
+    resumir_salidas, variaciones_simetricas,
+)
+from balance_biogas.calculos import calcular_dimensiones_digestor, realizar_calculos_balance
+from balance_biogas.lote import calcular_escenarios_lote
+from balance_biogas.montecarlo import _muestrear, construir_distribucion, simular_montecarlo
+
+REJILLA = {'bmp_nm3_ch4_kg_sv': np.linspace(0.2, 0.5, 7), 'trh_dias': np.linspace(15.0, 60.0, 5),
+           'temp_ambiente_promedio_c': np.linspace(-5.0, 25.0, 4)}
+RANGOS = {'bmp_nm3_ch4_kg_sv': (0.2, 0.5), 'u_digestor_w_m2_k': (0.3, 3.0)}
+DISTRIBUCIONES = {'bmp_nm3_ch4_kg_sv': ('normal', 0.35, 0.05, 0.1, 0.6), 'eficiencia_digestion_porcentaje': ('triangular', 60.0, 75.0, 85.0),
+                  'temp_ambiente_promedio_c': ('uniforme', -5.0, 25.0)}
+
+
+def test_rejilla_igual_que_escalar(escenario_base):
+    resultados = evaluar_barrido_rejilla(escenario_base, REJILLA)
+    assert resultados['electricidad_neta_exportable_kwh_dia'].shape == (7, 5, 4)
+    i, j, k = 3, 1, 2
+    entradas = dict(escenario_base, bmp_nm3_ch4_kg_sv=REJILLA['bmp_nm3_ch4_kg_sv'][i], trh_dias=REJILLA['trh_dias'][j],
+                    temp_ambiente_promedio_c=REJILLA['temp_ambiente_promedio_c'][k])
+    entradas['area_superficial_digestor_m2'] = calcular_dimensiones_digestor(
+        entradas['caudal_sustrato_kg_dia'], entradas['trh_dias'])['area_superficial_digestor_m2']
+    esperado = realizar_calculos_balance(entradas)
+    for salida, valores in resultados.items():
+        assert valores[i, j, k] == pytest.approx(esperado[salida], rel=1e-12)
+
+
+def test_rejilla_independiente_de_bloques_y_procesos(escenario_base):
+    referencia = evaluar_barrido_rejilla(escenario_base, REJILLA)
+    for opciones in ({'tamano_bloque': 11}, {'tamano_bloque': 16, 'procesos': 2}):
+        resultados = evaluar_barrido_rejilla(escenario_base, REJILLA, **opciones)
+        for salida in referencia:
+            np.testing.assert_array_equal(resultados[salida], referencia[salida])
+
+
+def test_iterar_rejilla_igual_que_evaluar(escenario_base):
+    referencia = evaluar_barrido_rejilla(escenario_base, REJILLA)
+    bloques = list(iterar_barrido_rejilla(escenario_base, REJILLA, tamano_bloque=11))
+    assert [inicio for inicio, _, _ in bloques] == list(range(0, 140, 11))
+    ejes = np.meshgrid(*REJILLA.values(), indexing='ij')
+    for nombre, eje in zip(REJILLA, ejes):
+        np.testing.assert_array_equal(np.concatenate([barridas[nombre] for _, barridas, _ in bloques]), eje.ravel())
+    for salida in referencia:
+        np.testing.assert_array_equal(np.concatenate([valores[salida] for _, _, valores in bloques]), referencia[salida].ravel())
+
+
+def test_hipercubo_latino_reproducible_y_estratificado(escenario_base):
+    muestras = muestreo_hipercubo_latino(RANGOS, 50, semilla=3)
+    for nombre, valores in muestreo_hipercubo_latino(RANGOS, 50, semilla=3).items():
+        np.testing.assert_array_equal(valores, muestras[nombre])
+    minimo, maximo = RANGOS['bmp_nm3_ch4_kg_sv']
+    estratos = np.floor((muestras['bmp_nm3_ch4_kg_sv'] - minimo) / (maximo - minimo) * 50)
+    assert sorted(estratos) == list(range(50))
+    resultados = evaluar_muestras(escenario_base, muestras, tamano_bloque=7)
+    for salida, valores in evaluar_muestras(escenario_base, muestras).items():
+        np.testing.assert_array_equal(resultados[salida], valores)
+
+
+def test_montecarlo_reproducible_con_la_misma_semilla(escenario_base):
+    primera = simular_montecarlo(escenario_base, DISTRIBUCIONES, n_muestras=20000, semilla=7, tamano_bloque=4096)
+    segunda = simular_montecarlo(escenario_base, DISTRIBUCIONES, n_muestras=20000, semilla=7, tamano_bloque=4096)
+    assert primera == segunda
+    otra = simular_montecarlo(escenario_base, DISTRIBUCIONES, n_muestras=20000, semilla=8, tamano_bloque=4096)
+    assert otra['salidas'] != primera['salidas']
+
+
+def test_montecarlo_percentiles_cerca_de_los_exactos(escenario_base):
+    resumen = simular_montecarlo(escenario_base, DISTRIBUCIONES, n_muestras=20000, semilla=7, tamano_bloque=4096)
+    rng = np.random.default_rng(7)
+    muestras = []
+    for inicio in range(0, 20000, 4096):
+        n = min(4096, 20000 - inicio)
+        entradas = dict(_entradas_base(escenario_base), **{nombre: _muestrear(rng, d, n) for nombre, d in DISTRIBUCIONES.items()})
+        muestras.append(calcular_escenarios_lote(entradas)['calor_neto_disponible_mj_dia'])
+    exactos = np.concatenate(muestras)
+    salida = resumen['salidas']['calor_neto_disponible_mj_dia']
+    anchura = exactos.max() - exactos.min()
+    for q in (10, 50, 90):
+        assert abs(salida[f'P{q}'] - np.percentile(exactos, q)) <= anchura * 1e-3
+    assert salida['media'] == pytest.approx(exactos.mean(), rel=1e-9)
+
+
+def test_resumen_de_un_barrido():
+    resumen = resumir_salidas({'salida': np.arange(-10.0, 90.0).reshape(10, 10)})['salida']
+    assert (resumen['minimo'], resumen['maximo'], resumen['fraccion_deficit']) == (-10.0, 89.0, 0.1)
+    assert resumen['P50'] == pytest.approx(39.5)
+
+
+def test_tornado_con_variaciones_simetricas(escenario_base):
+    variaciones = variaciones_simetricas(escenario_base, ['bmp_nm3_ch4_kg_sv', 'trh_dias'], 0.2)
+    assert variaciones['trh_dias'] == pytest.approx((24.0, 36.0))
+    filas = analisis_tornado(escenario_base, variaciones)
+    assert {fila['parametro'] for fila in filas} == {'bmp_nm3_ch4_kg_sv', 'trh_dias'}
+
+
+@pytest.mark.parametrize("tipo, esperada", [
+    ('normal', ('normal', 2.0, 0.5, 1.0, 3.0)), ('triangular', ('triangular', 1.0, 2.0, 3.0)), ('uniforme', ('uniforme', 1.0, 3.0))])
+def test_construir_distribucion(tipo, esperada):
+    assert construir_distribucion(tipo, 1.0, 2.0, 3.0, 0.5) == esperada
+
+
+def test_normal_sin_limites_no_se_recorta():
+    assert construir_distribucion('normal', mas_probable=2.0, desviacion=0.5) == ('normal', 2.0, 0.5)
+    assert construir_distribucion('normal', float('nan'), 2.0, float('nan'), 0.5) == ('normal', 2.0, 0.5)
+    assert construir_distribucion('normal', None, 2.0, 3.0, 0.5) == ('normal', 2.0, 0.5, -np.inf, 3.0)
+    muestra = _muestrear(np.random.default_rng(0), construir_distribucion('normal', 1.0, 2.0, None, 0.5), 10000)
+    assert muestra.min() == 1.0 and muestra.max() > 3.0 and muestra.mean() == pytest.approx(2.0, abs=0.05)
+    with pytest.raises(ValueError):
+        construir_distribucion('triangular', None, 2.0, 3.0)
+
+
+def test_distribucion_desconocida():
+    with pytest.raises(ValueError):
+        construir_distribucion('lognormal', 1.0, 2.0, 3.0)
+
+
+def test_deficit_electrico_solo_con_cogeneracion(escenario_base):
+    caldera = dict(escenario_base, uso_biogas_opcion_idx=1, caldera_eficiencia_porcentaje=90.0)
+    resumen = simular_montecarlo(caldera, DISTRIBUCIONES, n_muestras=5000, semilla=1)
+    assert resumen['salidas']['electricidad_neta_exportable_kwh_dia']['probabilidad_deficit'] == 1.0
+    assert resumen['probabilidad_deficit_electrico'] == 0.0
+    assert resumen['probabilidad_deficit_termico_o_electrico'] == resumen['probabilidad_deficit_termico'] < 1.0
+
+    chp = dict(escenario_base, consumo_electrico_aux_kwh_ton_sustrato=150.0)
+    resumen = simular_montecarlo(chp, DISTRIBUCIONES, n_muestras=5000, semilla=1)
+    assert resumen['probabilidad_deficit_electrico'] == resumen['salidas']['electricidad_neta_exportable_kwh_dia']['probabilidad_deficit'] > 0
+    assert resumen['probabilidad_deficit_termico_o_electrico'] >= max(resumen['probabilidad_deficit_termico'], resumen['probabilidad_deficit_electrico'])
@@ -0,0 +1,161 @@
+# tests/test_cartera.py
+# Cartera de plantas: los agregados incrementales deben coincidir con sumar la flota desde cero.
+import io
+
+import numpy as np
+import pytest
+
+from balance_biogas import almacen as modulo_almacen
+from balance_biogas.calculos import calcular_dimensiones_digestor
+from balance_biogas.cartera import AGREGADOS, CarteraPlantas, contribuciones, leer_plantas
+from balance_biogas.informes import preparar_escenario
+from bench_lote import generar_escenarios
+
+
+def _plantas(n, semilla=5):
+    escenarios = generar_escenarios(n, semilla=semilla)
+    escenarios['caudal_sustrato_kg_dia'] += 1000.0
+    return [(f"P{i:03d}", {clave: float(valores[i]) for clave, valores in escenarios.items()}, f"R{i % 3}") for i in range(n)]
+
+
+def _suma_escalar(cartera, grupo=None):
+    total = np.zeros(len(AGREGADOS))
+    for planta, fila in zip(cartera.plantas, cartera.tabla()['grupo']):
+        if grupo is None or fila == grupo:
+            _, results, dim_digestor = preparar_escenario(cartera.entradas(planta))
+            total += contribuciones(dict(results, **dim_digestor), cartera.entradas(planta)['uso_biogas_opcion_idx'])
+    return dict(zip(AGREGADOS, total))
+
+
+def _comprobar(agregados, esperados):
+    for clave in AGREGADOS:
+        assert agregados[clave] == pytest.approx(esperados[clave], rel=1e-9, abs=1e-6), clave
+
+
+def test_carga_igual_que_escalar():
+    cartera = CarteraPlantas("Flota")
+    cartera.cargar_plantas(_plantas(60))
+    _comprobar(cartera.agregados(), _suma_escalar(cartera))
+    _comprobar(cartera.agregados("R1"), _suma_escalar(cartera, "R1"))
+    assert cartera.agregados()['plantas'] == 60
+
+
+def test_actualizaciones_incrementales_igual_que_recalcular():
+    cartera = CarteraPlantas("Flota")
+    cartera.cargar_plantas(_plantas(60))
+    rng = np.random.default_rng(0)
+    recalculadas = cartera.n_plantas_recalculadas
+    for j in range(200):
+        cartera.actualizar(f"P{rng.integers(60):03d}", bmp_nm3_ch4_kg_sv=float(rng.uniform(0.2, 0.5)))
+    assert cartera.n_plantas_recalculadas == recalculadas + 200
+    cartera.actualizar("P000", grupo="R9")
+    cartera.eliminar("P001")
+    cartera.anadir("NUEVA", _plantas(1, semilla=9)[0][1], "R9")
+    incrementales = {None: cartera.agregados(), **{grupo: cartera.agregados(grupo) for grupo in ("R0", "R1", "R2", "R9")}}
+    cartera.recalcular()
+    for grupo, agregados in incrementales.items():
+        _comprobar(agregados, cartera.agregados(grupo))
+    _comprobar(incrementales[None], _suma_escalar(cartera))
+    assert incrementales["R9"]['plantas'] == 2
+
+
+def test_reabrir_desde_el_almacen_sin_recalcular(almacen):
+    cartera = CarteraPlantas("Flota", almacen)
+    cartera.cargar_plantas(_plantas(30))
+    cartera.actualizar("P003", caudal_sustrato_kg_dia=20000.0)
+    cartera.eliminar("P004")
+    reabierta = CarteraPlantas.abrir(almacen, "Flota")
+    assert reabierta.n_plantas_recalculadas == 0
+    assert sorted(reabierta.plantas) == sorted(cartera.plantas)
+    _comprobar(reabierta.agregados(), cartera.agregados())
+
+
+def test_reabrir_con_otra_version_del_modelo_recalcula(almacen, monkeypatch):
+    cartera = CarteraPlantas("Flota", almacen)
+    cartera.cargar_plantas(_plantas(20))
+    monkeypatch.setattr(modulo_almacen, 'VERSION_MODELO', modulo_almacen.VERSION_MODELO + 1)
+    reabierta = CarteraPlantas.abrir(almacen, "Flota")
+    assert reabierta.n_plantas_recalculadas == 20
+    assert sorted(reabierta.plantas) == sorted(cartera.plantas)
+    _comprobar(reabierta.agregados(), cartera.agregados())
+    assert all(fila['vigente'] for fila in almacen.plantas("Flota"))
+    assert CarteraPlantas.abrir(almacen, "Flota").n_plantas_recalculadas == 0
+
+
+def test_plantas_repetidas_o_no_evaluables(escenario_base):
+    cartera = CarteraPlantas("Flota")
+    cartera.anadir("A", escenario_base)
+    with pytest.raises(ValueError, match="repetidas"):
+        cartera.cargar_plantas([("A", escenario_base, "")])
+    with pytest.raises(ValueError, match="ya está"):
+        cartera.anadir("A", escenario_base)
+    with pytest.raises(ValueError, match="'B' no evaluable"):
+        cartera.anadir("B", {'caudal_sustrato_kg_dia': 1000.0})
+    assert len(cartera) == 1
+
+
+def test_fijar_anade_o_actualiza(escenario_base):
+    cartera = CarteraPlantas("Flota")
+    cartera.fijar("A", escenario_base, "Norte")
+    cartera.fijar("A", dict(escenario_base, bmp_nm3_ch4_kg_sv=0.3), "Sur")
+    assert len(cartera) == 1 and cartera.n_plantas_recalculadas == 2
+    assert list(cartera.agregados_por_grupo()) == ["Sur"]
+
+
+def test_actualizar_caudal_recalcula_el_area(escenario_base):
+    base = dict(escenario_base, area_superficial_digestor_m2=calcular_dimensiones_digestor(
+        escenario_base['caudal_sustrato_kg_dia'], escenario_base['trh_dias'])['area_superficial_digestor_m2'])
+    cartera = CarteraPlantas("Flota")
+    cartera.anadir("A", base)
+    cartera.actualizar("A", caudal_sustrato_kg_dia=50000.0)
+    area = calcular_dimensiones_digestor(50000.0, base['trh_dias'])['area_superficial_digestor_m2']
+    _, resultados, dimensiones = preparar_escenario(dict(escenario_base, caudal_sustrato_kg_dia=50000.0))
+    assert cartera.resultados("A")['area_superficial_digestor_m2'] == pytest.approx(area)
+    for clave, valor in dict(resultados, **dimensiones).items():
+        assert cartera.resultados("A")[clave] == pytest.approx(valor, rel=1e-12), clave
+    cartera.actualizar("A", trh_dias=40.0, area_superficial_digestor_m2=123.0)
+    assert cartera.entradas("A")['area_superficial_digestor_m2'] == 123.0
+    cartera.actualizar("A", bmp_nm3_ch4_kg_sv=0.3)
+    assert cartera.entradas("A")['area_superficial_digestor_m2'] == 123.0
+
+
+def test_leer_plantas_de_un_csv(escenario_base):
+    fichero = io.BytesIO(b"planta,grupo,bmp_nm3_ch4_kg_sv,otra\nA,Norte,0.3,x\nB,,0.4,y\n")
+    fichero.name = "plantas.csv"
+    bloques = list(leer_plantas(fichero, escenario_base, filas_por_bloque=1))
+    assert [len(bloque) for bloque in bloques] == [1, 1]
+    plantas = [planta for bloque in bloques for planta in bloque]
+    assert [(planta, grupo, entradas['bmp_nm3_ch4_kg_sv']) for planta, entradas, grupo in plantas] == [("A", "Norte", 0.3), ("B", "", 0.4)]
+    assert 'otra' not in plantas[0][1] and plantas[1][1]['trh_dias'] == escenario_base['trh_dias']
+    base = dict(escenario_base, area_superficial_digestor_m2=500.0)
+    fichero = io.BytesIO(b"planta,trh_dias,area_superficial_digestor_m2\nA,20,\nB,,700\nC,,\n")
+    fichero.name = "plantas.csv"
+    [bloque] = leer_plantas(fichero, base)
+    a, b, c = (entradas for _, entradas, _ in bloque)
+    assert 'area_superficial_digestor_m2' not in a and a['trh_dias'] == 20.0
+    assert b['area_superficial_digestor_m2'] == 700.0 and b['trh_dias'] == base['trh_dias']
+    assert c == base
+    sin_planta = io.BytesIO(b"grupo\nNorte\n")
+    sin_planta.name = "plantas.csv"
+    with pytest.raises(KeyError):
+        list(leer_plantas(sin_planta, escenario_base))
+
+
+def test_deficit_electrico_solo_de_cogeneracion(escenario_base):
+    # En caldera y upgrading la electricidad neta es -consumo auxiliar: no es un déficit de la
+    # flota. Todas las plantas tienen neta < 0 con una eficiencia eléctrica mínima.
+    base = dict(escenario_base, chp_eficiencia_electrica_porcentaje=1.0)
+    cartera = CarteraPlantas("Mixta")
+    cartera.cargar_plantas([("CHP", dict(base, uso_biogas_opcion_idx=0), ""), ("Caldera", dict(base, uso_biogas_opcion_idx=1), ""),
+                            ("Upgrading", dict(base, uso_biogas_opcion_idx=2), "")])
+    tabla = cartera.tabla()
+    assert (np.asarray(tabla['electricidad_neta_exportable_kwh_dia']) < 0).all()
+    agregados = cartera.agregados()
+    neta_chp = cartera.resultados("CHP")['electricidad_neta_exportable_kwh_dia']
+    assert agregados['plantas_deficit_electrico'] == 1
+    assert agregados['deficit_electrico_kwh_dia'] == pytest.approx(-neta_chp)
+    _comprobar(agregados, _suma_escalar(cartera))
+    cartera.actualizar("Caldera", uso_biogas_opcion_idx=0)
+    assert cartera.agregados()['plantas_deficit_electrico'] == 2
+    cartera.recalcular()
+    _comprobar(cartera.agregados(), _suma_escalar(cartera))
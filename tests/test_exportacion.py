@@ -0,0 +1,90 @@
+# tests/test_exportacion.py
+# Informe Excel: el fichero generado se vuelve a abrir con openpyxl y se comprueban la hoja,
+# las etiquetas, los valores numéricos, los estilos y las celdas combinadas, y se compara con el
+# mismo contenido escrito celda a celda por openpyxl en modo write-only.
+from io import BytesIO
+
+import pytest
+
+from balance_biogas.exportacion import (
+    ANCHOS_COLUMNA_EXCEL, TITULO_HOJA_EXCEL, _estilos_excel, _filas_excel, generar_excel_bytes, openpyxl_disponible,
+)
+from balance_biogas.informes import preparar_escenario
+
+pytestmark = pytest.mark.skipif(not openpyxl_disponible(), reason="openpyxl no instalado")
+
+PROYECTO = {'nombre': "Planta Norte", 'analista': "Ana", 'fecha': "2026-03-15"}
+
+
+def _hoja(entradas):
+    from openpyxl import load_workbook
+    entradas, resultados, dimensiones = preparar_escenario(entradas)
+    libro = load_workbook(BytesIO(generar_excel_bytes(entradas, resultados, dimensiones, PROYECTO)))
+    assert libro.sheetnames == [TITULO_HOJA_EXCEL]
+    hoja = libro[TITULO_HOJA_EXCEL]
+    return entradas, resultados, hoja, {fila[0].value: fila for fila in hoja.iter_rows() if fila[0].value is not None}
+
+
+def test_excel_valores_y_formato(escenario_base):
+    entradas, resultados, hoja, filas = _hoja(dict(escenario_base, uso_biogas_opcion_idx=0, sustrato_nombre="Purín"))
+    assert hoja['A1'].value == "Balance Energético Preliminar: Planta Norte"
+    assert hoja['A1'].font.b and hoja['A1'].font.sz == 14 and hoja['A1'].alignment.horizontal == "center"
+    assert "A1:D1" in {str(rango) for rango in hoja.merged_cells.ranges}
+    assert hoja.column_dimensions['A'].width == 35
+    assert filas["Caudal Sustrato (kg/día):"][1].value == entradas['caudal_sustrato_kg_dia']
+    assert filas["Eficiencia Eléctrica CHP (%):"][1].value == entradas['chp_eficiencia_electrica_porcentaje']
+    assert filas["Sustrato:"][1].value == "Purín"
+    assert filas["Fuente BMP:"][1].value == "N/A"
+    celda = filas["  Metano Producido (Nm³/día):"][1]
+    assert celda.data_type == 'n' and celda.value == pytest.approx(resultados['ch4_producido_nm3_dia'])
+    neta = filas["  Electricidad Neta Exportable (kWh/día):"]
+    assert neta[0].font.b and neta[1].value == pytest.approx(resultados['electricidad_neta_exportable_kwh_dia'])
+    assert "UPGRADING A BIOMETANO:" not in filas
+
+
+def test_excel_upgrading_y_valores_no_finitos(escenario_base):
+    _, resultados, _, filas = _hoja(dict(escenario_base, uso_biogas_opcion_idx=2, sustrato_nombre="Purín\x01"))
+    assert filas["Sustrato:"][1].value == "Purín"
+    assert filas["  Biometano Producido (Nm³/día):"][1].value == pytest.approx(resultados['biometano_producido_nm3_dia'])
+    _, _, _, filas = _hoja(dict(escenario_base, caudal_sustrato_kg_dia=float('nan')))
+    assert filas["Caudal Sustrato (kg/día):"][1].value == "nan"
+
+
+def _excel_openpyxl(entradas, resultados):
+    """Referencia: las mismas filas escritas con ws.append y WriteOnlyCell, sin plantilla."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    filas, celdas_combinadas = _filas_excel(entradas, resultados, PROYECTO)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(TITULO_HOJA_EXCEL)
+    for columna, ancho in ANCHOS_COLUMNA_EXCEL.items():
+        hoja.column_dimensions[columna].width = ancho
+    for data, estilo in filas:
+        celdas = []
+        for valor in data:
+            celda = WriteOnlyCell(hoja, value=valor)
+            if estilo is not None:
+                celda.font, alineacion = _estilos_excel()[estilo]
+                if alineacion is not None:
+                    celda.alignment = alineacion
+            celdas.append(celda)
+        hoja.append(celdas)
+    for rango in celdas_combinadas:
+        hoja.merged_cells.add(rango)
+    salida = BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+@pytest.mark.parametrize("uso", [0, 1, 2])
+def test_excel_igual_que_openpyxl_write_only(escenario_base, uso):
+    from openpyxl import load_workbook
+    entradas, resultados, dimensiones = preparar_escenario(dict(escenario_base, uso_biogas_opcion_idx=uso, sustrato_nombre="Purín"))
+    hojas = [load_workbook(BytesIO(contenido))[TITULO_HOJA_EXCEL] for contenido in (
+        generar_excel_bytes(entradas, resultados, dimensiones, PROYECTO), _excel_openpyxl(entradas, resultados))]
+    # openpyxl escribe los float con menos cifras que repr: se comparan con 12 cifras significativas.
+    celdas = [[[(float(f"{c.value:.12g}") if isinstance(c.value, float) else c.value, c.font.b, c.font.sz, c.font.color and c.font.color.rgb, c.alignment.horizontal) for c in fila]
+               for fila in hoja.iter_rows()] for hoja in hojas]
+    assert celdas[0] == celdas[1]
+    assert {str(rango) for rango in hojas[0].merged_cells.ranges} == {str(rango) for rango in hojas[1].merged_cells.ranges}
+    assert [hojas[0].column_dimensions[c].width for c in "ABC"] == [hojas[1].column_dimensions[c].width for c in "ABC"]
@@ -0,0 +1,50 @@
+# tests/test_lote.py
+# El motor vectorizado debe dar los mismos números que las funciones escalares, y ambos los
+# valores de referencia de benchmarks/valores_referencia.json.
+import json
+import math
+
+import numpy as np
+import pytest
+
+from balance_biogas.calculos import TECNOLOGIAS_UPGRADING, calcular_dimensiones_digestor
+from balance_biogas.informes import preparar_escenario
+from balance_biogas.lote import calcular_escenarios_lote, comparar_tecnologias_upgrading
+from bench_lote import bucle_escalar, generar_escenarios
+from suite_regresion import RUTA_REFERENCIA, comprobar_resultados
+
+
+def test_valores_de_referencia():
+    with open(RUTA_REFERENCIA, encoding="utf-8") as fichero:
+        assert comprobar_resultados(json.load(fichero)) == []
+
+
+@pytest.mark.parametrize("semilla", [0, 1, 2])
+def test_lote_igual_que_escalar(semilla):
+    escenarios = generar_escenarios(500, semilla=semilla)
+    with np.errstate(all='ignore'):
+        lote = calcular_escenarios_lote(escenarios)
+    for i, fila in enumerate(bucle_escalar(escenarios)):
+        for clave, valor in fila.items():
+            obtenido = float(np.broadcast_to(lote[clave], (500,))[i])
+            assert obtenido == pytest.approx(valor, rel=1e-12, abs=1e-12, nan_ok=True), (i, clave)
+
+
+def test_claves_de_resultados_en_el_mismo_orden():
+    escenarios = generar_escenarios(3)
+    assert list(calcular_escenarios_lote(escenarios)) == list(bucle_escalar(escenarios)[0])
+
+
+def test_dimensiones_del_digestor():
+    dim_digestor = calcular_dimensiones_digestor(10000.0, 30.0)
+    assert dim_digestor['volumen_digestor_m3'] == pytest.approx(300.0)
+    diametro, altura = dim_digestor['diametro_digestor_m'], dim_digestor['altura_digestor_m']
+    assert math.pi * diametro ** 2 / 4 * altura == pytest.approx(300.0)
+
+
+def test_comparar_tecnologias_upgrading(escenario_base):
+    entradas, _, _ = preparar_escenario(dict(escenario_base, uso_biogas_opcion_idx=2))
+    comparacion = comparar_tecnologias_upgrading(entradas)
+    for i in range(len(TECNOLOGIAS_UPGRADING)):
+        _, esperados, _ = preparar_escenario(dict(entradas, upgrading_tecnologia_idx=i, upgrading_tecnologia_texto="x"))
+        assert comparacion['biometano_producido_nm3_dia'][i] == pytest.approx(esperados['biometano_producido_nm3_dia'], rel=1e-12)
@@ -0,0 +1,21 @@
+# tests/test_serie_temporal.py
+# Serie horaria: la hora de déficit térmico máximo solo se da si hay horas con déficit.
+import numpy as np
+
+from balance_biogas.serie_temporal import COLUMNA_TIEMPO, simular_serie
+
+
+def _serie():
+    marcas = np.arange('2025-01-01T00', '2025-01-11T00', dtype='datetime64[h]')
+    temperaturas = np.full(marcas.size, 10.0)
+    temperaturas[100] = -15.0
+    return {COLUMNA_TIEMPO: marcas, 'temp_ambiente_c': temperaturas}
+
+
+def test_hora_deficit_maximo_solo_con_deficit(escenario_base):
+    resumen = simular_serie(dict(escenario_base, uso_biogas_opcion_idx=0), _serie(), horas_por_bloque=48)
+    assert resumen['horas_deficit_termico'][0] == 0 and resumen['deficit_termico_maximo_mj_h'][0] == 0.0
+    assert np.isnat(resumen['hora_deficit_termico_maximo'][0])
+    resumen = simular_serie(dict(escenario_base, uso_biogas_opcion_idx=2), _serie(), horas_por_bloque=48)
+    assert resumen['horas_deficit_termico'][0] > 0 and resumen['deficit_termico_maximo_mj_h'][0] > 0
+    assert resumen['hora_deficit_termico_maximo'][0] == np.datetime64('2025-01-05T04', 'h')
@@ -0,0 +1,113 @@
+# tests/test_servicio.py
+# Servicio HTTP: validación de las peticiones y respuestas iguales a las del motor escalar.
+import asyncio
+import json
+
+import pytest
+
+from balance_biogas.informes import preparar_escenario
+from balance_biogas import instrumentacion
+from balance_biogas.servicio import ErrorPeticion, ServicioBalance, validar_escenario, validar_peticion_informe
+
+
+def peticiones(*lista):
+    """Arranca el servicio en un puerto libre y devuelve (estado, cuerpo) de cada (método, ruta, cuerpo)."""
+    async def ejecutar():
+        servicio = ServicioBalance(espera_lote_s=0)
+        servidor = await servicio.iniciar("127.0.0.1", 0)
+        puerto = servidor.sockets[0].getsockname()[1]
+        respuestas = []
+        try:
+            for metodo, ruta, cuerpo in lista:
+                datos = cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode()
+                reader, writer = await asyncio.open_connection("127.0.0.1", puerto)
+                writer.write(f"{metodo} {ruta} HTTP/1.1\r\nContent-Length: {len(datos)}\r\nConnection: close\r\n\r\n".encode() + datos)
+                await writer.drain()
+                respuesta = await reader.read()
+                writer.close()
+                cabecera, _, contenido = respuesta.partition(b"\r\n\r\n")
+                respuestas.append((int(cabecera.split()[1]), contenido))
+        finally:
+            await servicio.cerrar()
+        return respuestas
+    return asyncio.run(ejecutar())
+
+
+def test_balance_igual_que_escalar(escenario_base):
+    [(estado, contenido)] = peticiones(("POST", "/balance", escenario_base))
+    assert estado == 200
+    respuesta = json.loads(contenido)
+    _, resultados, dimensiones = preparar_escenario(escenario_base)
+    assert respuesta['dimensiones'] == pytest.approx(dimensiones, rel=1e-12)
+    assert respuesta['resultados'] == pytest.approx(resultados, rel=1e-12)
+
+
+@pytest.mark.parametrize("cambio, mensaje", [
+    ({'trh_dias': None, 'quitar': 'trh_dias'}, "Faltan entradas obligatorias: trh_dias"),
+    ({'st_porcentaje': "veinte"}, "'st_porcentaje' debe ser numérica"),
+    ({'st_porcentaje': True}, "'st_porcentaje' debe ser numérica"),
+    ({'densidad_sustrato_kg_m3': None}, "'densidad_sustrato_kg_m3' debe ser numérica"),
+    ({'st_porcentaje': float('nan')}, "'st_porcentaje' debe ser un número finito"),
+    ({'trh_dias': float('inf')}, "'trh_dias' debe ser un número finito"),
+])
+def test_escenarios_no_validos(escenario_base, cambio, mensaje):
+    entradas = dict(escenario_base, **cambio)
+    entradas.pop(entradas.pop('quitar', None), None)
+    with pytest.raises(ErrorPeticion, match=mensaje):
+        validar_escenario(entradas)
+    [(estado, contenido)] = peticiones(("POST", "/balance", entradas))
+    assert estado == 400 and mensaje in json.loads(contenido)['error']
+
+
+def test_peticiones_mal_formadas(escenario_base):
+    respuestas = peticiones(
+        ("POST", "/balance", b"{no es json"),
+        ("POST", "/balance", [escenario_base, "texto"]),
+        ("GET", "/balance", b""),
+        ("POST", "/desconocida", {}),
+        ("POST", "/dimensiones", {'caudal_sustrato_kg_dia': 1000.0}),
+        ("POST", "/informe/pdf", [escenario_base]),
+        ("POST", "/dimensiones", b'{"caudal_sustrato_kg_dia": NaN, "trh_dias": 20}'),
+        ("POST", "/balance", dict(escenario_base, densidad_sustrato_kg_m3=0.0)),
+    )
+    assert [estado for estado, _ in respuestas] == [400, 400, 405, 404, 400, 400, 400, 400]
+    assert all('error' in json.loads(contenido) for _, contenido in respuestas)
+    assert "no finitos" in json.loads(respuestas[-1][1])['error']
+
+
+@pytest.mark.parametrize("proyecto, mensaje", [
+    ("Planta Norte", "'proyecto' debe ser un objeto JSON"),
+    (["Planta Norte"], "'proyecto' debe ser un objeto JSON"),
+    ({'nombre': 3}, "'nombre' del proyecto debe ser un texto"),
+])
+def test_proyecto_no_valido(escenario_base, proyecto, mensaje):
+    peticion = {'entradas': escenario_base, 'proyecto': proyecto}
+    with pytest.raises(ErrorPeticion, match=mensaje):
+        validar_peticion_informe(peticion)
+    [(estado, contenido)] = peticiones(("POST", "/informe/xlsx", peticion))
+    assert estado == 400 and mensaje in json.loads(contenido)['error']
+    _, completo = validar_peticion_informe({'entradas': escenario_base, 'proyecto': {'nombre': "Planta Norte"}})
+    assert completo['nombre'] == "Planta Norte" and completo['analista'] == ""
+
+
+def test_error_interno_se_registra(escenario_base, monkeypatch, caplog):
+    async def fallar(self, metodo, ruta, cuerpo):
+        raise RuntimeError("fallo inesperado")
+    monkeypatch.setattr(ServicioBalance, '_despachar', fallar)
+    monkeypatch.setattr(instrumentacion, '_activa', True)
+    instrumentacion.reiniciar()
+    [(estado, contenido)] = peticiones(("POST", "/balance", escenario_base))
+    assert estado == 500 and json.loads(contenido) == {'error': "Error interno"}
+    assert "Error interno atendiendo POST /balance" in caplog.text and "fallo inesperado" in caplog.text
+    assert {'nombre': 'errores_internos', 'etiquetas': {}, 'valor': 1} in instrumentacion.instantanea()['contadores']
+    instrumentacion.reiniciar()
+
+
+def test_lista_de_escenarios_y_cache(escenario_base):
+    otro = dict(escenario_base, trh_dias=20.0)
+    [(estado, contenido), (estado_repetido, repetido)] = peticiones(
+        ("POST", "/balance", [escenario_base, otro, escenario_base]), ("POST", "/balance", otro))
+    assert estado == estado_repetido == 200
+    primera, segunda, tercera = json.loads(contenido)
+    assert primera == tercera and segunda == json.loads(repetido)
+    assert segunda['dimensiones']['volumen_digestor_m3'] == pytest.approx(200.0)
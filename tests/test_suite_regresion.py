@@ -0,0 +1,47 @@
+# tests/test_suite_regresion.py
+# Puerta de rendimiento de benchmarks/suite_regresion.py con medidas simuladas (no se mide la
+# máquina): una regresión hace fallar la ejecución salvo con --solo-avisar, y no se puede
+# absorber regenerando la línea base sin --aceptar-regresiones.
+import json
+
+import pytest
+
+import suite_regresion
+
+BASE = {'escenarios_por_s': 1000.0, 'p50_us': 1000.0, 'p95_us': 1200.0, 'p99_us': 1400.0, 'pico_memoria_mb': 0.5, 'pasadas': 10}
+
+
+@pytest.fixture
+def suite(tmp_path, monkeypatch):
+    """Ejecuta main() con una línea base temporal y las medidas dadas; devuelve (código, línea base)."""
+    ruta = tmp_path / "linea_base.json"
+    ruta.write_text(json.dumps({'entorno': {}, 'casos': {'caso[1]': BASE}}))
+    monkeypatch.setattr(suite_regresion, 'RUTA_LINEA_BASE', str(ruta))
+    monkeypatch.setattr(suite_regresion, 'comprobar_resultados', lambda referencia: [])
+
+    def ejecutar(medida, *argumentos):
+        monkeypatch.setattr(suite_regresion, 'ejecutar_rendimiento', lambda rapido: {'caso[1]': dict(BASE, **medida)})
+        codigo = suite_regresion.main(list(argumentos))
+        return codigo, json.loads(ruta.read_text())['casos']['caso[1]']
+    return ejecutar
+
+
+def test_sin_regresion_pasa(suite):
+    assert suite({'escenarios_por_s': 900.0, 'p50_us': 1100.0})[0] == 0
+
+
+def test_regresion_falla_salvo_solo_avisar(suite):
+    lenta = {'escenarios_por_s': 125.0, 'p50_us': 8000.0}
+    assert suite(lenta)[0] == 1
+    assert suite(lenta, "--solo-avisar")[0] == 0
+    assert suite({'pico_memoria_mb': 5.0})[0] == 1
+
+
+def test_linea_base_no_absorbe_regresiones(suite):
+    lenta = {'escenarios_por_s': 125.0, 'p50_us': 8000.0}
+    codigo, base = suite(lenta, "--guardar-linea-base")
+    assert codigo == 1 and base == BASE
+    codigo, base = suite(lenta, "--guardar-linea-base", "--aceptar-regresiones")
+    assert codigo == 0 and base['p50_us'] == 8000.0
+    codigo, base = suite({'p50_us': 500.0}, "--guardar-linea-base")
+    assert codigo == 0 and base['p50_us'] == 500.0
@@ -0,0 +1,44 @@
+# tests/test_sustratos.py
+# Las sumas incrementales de una mezcla deben coincidir con reagregarla desde cero.
+import numpy as np
+import pytest
+
+from balance_biogas.sustratos import BibliotecaSustratos, MezclaSustratos
+
+
+def _sumas_desde_cero(mezcla):
+    copia = MezclaSustratos(mezcla.biblioteca, dict(mezcla.caudales))
+    copia.reagregar()
+    return copia.entradas_balance()
+
+
+def test_cambios_incrementales_igual_que_reagregar():
+    biblioteca = BibliotecaSustratos()
+    nombres = list(biblioteca.nombres)
+    mezcla = MezclaSustratos(biblioteca)
+    rng = np.random.default_rng(0)
+    for paso in range(MezclaSustratos.RESINCRONIZAR_CADA - 1):
+        nombre = nombres[rng.integers(len(nombres))]
+        mezcla.fijar_caudal(nombre, 0.0 if rng.random() < 0.2 else rng.uniform(100.0, 20000.0))
+        if paso % 97 == 0 and mezcla.caudales:
+            obtenidas, esperadas = mezcla.entradas_balance(), _sumas_desde_cero(mezcla)
+            assert obtenidas['sustrato_nombre'] == esperadas['sustrato_nombre']
+            for clave, valor in esperadas.items():
+                if clave != 'sustrato_nombre':
+                    assert obtenidas[clave] == pytest.approx(valor, rel=1e-9), clave
+
+
+def test_sincronizar_solo_toca_los_componentes_que_cambian():
+    biblioteca = BibliotecaSustratos()
+    nombres = list(biblioteca.nombres)[:3]
+    mezcla = MezclaSustratos(biblioteca, {nombres[0]: 5000.0, nombres[1]: 2000.0})
+    mezcla.sincronizar({nombres[1]: 2000.0, nombres[2]: 1000.0})
+    assert mezcla.caudales == {nombres[1]: 2000.0, nombres[2]: 1000.0}
+    assert mezcla.entradas_balance()['caudal_sustrato_kg_dia'] == pytest.approx(3000.0)
+    assert mezcla.fracciones() == pytest.approx({nombres[1]: 2 / 3, nombres[2]: 1 / 3})
+
+
+def test_caudal_negativo():
+    biblioteca = BibliotecaSustratos()
+    with pytest.raises(ValueError):
+        MezclaSustratos(biblioteca).fijar_caudal(list(biblioteca.nombres)[0], -1.0)